@@ -6,6 +6,8 @@
 from fastapi import FastAPI
 import tg_bot.modules.sql.antispam_sql as sql1
 import tg_bot.modules.sql.blacklistusers_sql as sql2
+import tg_bot.modules.sql.feds_sql  # noqa: F401, loading it puts the fbanned flags in the index
+from tg_bot.modules.helper_funcs.reputation import REPUTATION, GBANNED, BLACKLISTED, describe
 from telegram import __version__ as v
 
 app = FastAPI()
@@ -18,22 +20,23 @@ def read_root():
 @app.get("/getuser/{user_id}")
 def read_item(user_id: int):
     try:
-        a = sql1.is_user_gbanned(user_id)
+        flags = REPUTATION.flags(user_id)
+        a = bool(flags & GBANNED)
         if a:
             user = sql1.get_gbanned_user(user_id)
             areason = user.reason
         else:
             areason = None
 
-        b = sql2.is_user_blacklisted(user_id)
+        b = bool(flags & BLACKLISTED)
         if b:
             breason = sql2.get_reason(user_id)
         else:
             breason = None
-        return {"status": "ok", "user_id": user_id, "gbanned": a, "gban_reason" : areason, "blacklisted" : b, "blacklist_reason" : breason}
+        return {"status": "ok", "user_id": user_id, "gbanned": a, "gban_reason" : areason, "blacklisted" : b, "blacklist_reason" : breason, "flags": describe(flags)}
     except Exception:
         a = None
         areason = None
         b = None
         breason = None
-        return {"status": "ok", "user_id": user_id, "gbanned": a, "gban_reason" : areason, "blacklisted" : b, "blacklist_reason" : breason}
+        return {"status": "ok", "user_id": user_id, "gbanned": a, "gban_reason" : areason, "blacklisted" : b, "blacklist_reason" : breason, "flags": None}
@@ -0,0 +1,76 @@
+"""
+Times fban_user, get_fban_user and un_fban_user with N bans already in bans_feds, to show
+their latency doesn't grow with the size of the ban table.
+
+Run from the repo root with a config.ini pointed at a scratch database:
+
+    python scripts/bench_fban.py 1000 10000 100000
+
+The seeded bans go into feds named bench-fed-*, they are deleted again when the run ends.
+Run it at 5fe9045^ as well for the numbers from before bans were upserted by key.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tg_bot.modules.sql.feds_sql as sql
+from tg_bot.modules.sql import SESSION
+
+FEDS = 50
+CALLS = 50
+FIRST_USER = 9 * 10 ** 12  # far above any real user id
+
+
+def seed(total: int):
+    rows = [
+        {
+            "fed_id": "bench-fed-{}".format(i % FEDS),
+            "user_id": str(FIRST_USER + i),
+            "first_name": "x",
+            "last_name": None,
+            "user_name": None,
+            "reason": "bench",
+            "time": 0,
+        }
+        for i in range(total)
+    ]
+    for start in range(0, total, 10000):
+        SESSION.execute(sql.BansF.__table__.insert(), rows[start:start + 10000])
+    SESSION.commit()
+    reload()
+
+
+def cleanup():
+    SESSION.query(sql.BansF).filter(sql.BansF.fed_id.like("bench-fed-%")).delete(synchronize_session=False)
+    SESSION.commit()
+    reload()
+
+
+def reload():
+    getattr(sql, "__load_all_feds_banned")()
+
+
+def timed(call) -> float:
+    start = time.perf_counter()
+    for i in range(CALLS):
+        call(FIRST_USER - 1 - i)
+    return (time.perf_counter() - start) / CALLS * 1000
+
+
+def main(sizes):
+    print("{:>8}  {:>10}  {:>10}  {:>10}".format("bans", "fban ms", "get ms", "unfban ms"))
+    for total in sizes:
+        seed(total)
+        try:
+            fban = timed(lambda user_id: sql.fban_user("bench-fed-7", user_id, "y", None, None, "bench", 1))
+            get = timed(lambda user_id: sql.get_fban_user("bench-fed-7", user_id))
+            unfban = timed(lambda user_id: sql.un_fban_user("bench-fed-7", user_id))
+        finally:
+            cleanup()
+        print("{:>8}  {:>10.2f}  {:>10.3f}  {:>10.2f}".format(total, fban, get, unfban))
+
+
+if __name__ == "__main__":
+    main([int(x) for x in sys.argv[1:]] or [1000, 10000, 100000])
@@ -0,0 +1,85 @@
+"""
+Throughput of the antispam rate tracking: RateTracker.hit plus the limit check for every
+message, and TimerWheel add / advance / membership probes, with messages from 50k users.
+
+    python scripts/bench_rate_tracker.py [messages] [users]
+
+rate_tracker.py has no dependencies on the rest of the bot, it's loaded straight from its file
+so this runs without a config or database.
+"""
+import importlib.util
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+spec = importlib.util.spec_from_file_location(
+    "rate_tracker", os.path.join(ROOT, "tg_bot", "modules", "helper_funcs", "rate_tracker.py")
+)
+rate_tracker = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(rate_tracker)
+
+# the defaults of ANTISPAM_LIMIT, ANTISPAM_WINDOW and ANTISPAM_IGNORE_TIME
+LIMIT = 25
+WINDOW = 25
+IGNORE_TIME = 600
+# messages per second of simulated time, the clock moves on with the messages
+RATE = 500
+
+
+def traffic(messages: int, users: int):
+    random.seed(1)
+    events = []
+    for i in range(messages):
+        # twenty flooders send a tenth of the messages, ~2.5 msg/s each, enough to trip the limit
+        if random.random() < 0.1:
+            user_id = random.randrange(20)
+        else:
+            user_id = random.randrange(users)
+        events.append((10 ** 9 + user_id, 10 ** 9 + i / RATE))
+    return events
+
+
+def bench_tracker(events) -> float:
+    tracker = rate_tracker.RateTracker(LIMIT, WINDOW)
+    over = 0
+    start = time.perf_counter()
+    for message_id, (user_id, now) in enumerate(events):
+        if tracker.over(tracker.hit(user_id, now, message_id)):
+            over += 1
+    elapsed = time.perf_counter() - start
+    print("RateTracker hit + check: {:>9,.0f} msg/s  ({} keys, {} over the limit)".format(
+        len(events) / elapsed, len(tracker), over
+    ))
+    return elapsed
+
+
+def bench_wheel(events) -> float:
+    expired = []
+    wheel = rate_tracker.TimerWheel(on_expire=expired.append)
+    tracker = rate_tracker.RateTracker(LIMIT, WINDOW)
+    rates = [tracker.hit(user_id, now) for user_id, now in events]
+    start = time.perf_counter()
+    for (user_id, now), rate in zip(events, rates):
+        # what detect_user does with the wheel for every message
+        wheel.advance(now)
+        if user_id not in wheel and rate >= LIMIT:
+            wheel.add(user_id, IGNORE_TIME, now)
+    elapsed = time.perf_counter() - start
+    print("TimerWheel advance + probe + add: {:>9,.0f} ops/s  ({} ignored, {} expired)".format(
+        len(events) / elapsed, len(wheel), len(expired)
+    ))
+    return elapsed
+
+
+def main(messages: int, users: int):
+    events = traffic(messages, users)
+    print("{:,} messages from up to {:,} users over {:.0f}s".format(messages, users, messages / RATE))
+    bench_tracker(events)
+    bench_wheel(events)
+
+
+if __name__ == "__main__":
+    args = [int(x) for x in sys.argv[1:]]
+    main(args[0] if args else 500000, args[1] if len(args) > 1 else 50000)
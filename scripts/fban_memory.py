@@ -0,0 +1,111 @@
+"""
+Loads N fbans of random users across 200 feds and compares the deep size of the USER_FBANS
+index with the nested string dicts of FEDERATION_BANNED_FULL, plus how long it takes to list
+the feds that banned a user either way.
+
+Run from the repo root with a config.ini pointed at a scratch database:
+
+    python scripts/fban_memory.py 100000
+
+The seeded bans go into feds named bench-fed-*, they are deleted again when the run ends.
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tg_bot.modules.sql.feds_sql as sql
+from tg_bot.modules.sql import SESSION
+
+FEDS = ["bench-fed-{:04d}-1c1e-4b0a-9b61-{:012x}".format(i, i) for i in range(200)]
+FIRST_USER = 9 * 10 ** 12  # far above any real user id
+LOOKUPS = 2000
+
+
+def seed(total: int):
+    random.seed(1)
+    bans = {}
+    while len(bans) < total:
+        user_id = random.randrange(FIRST_USER, FIRST_USER + total)
+        fed_id = random.choice(FEDS)
+        bans[(fed_id, user_id)] = {
+            "fed_id": fed_id,
+            "user_id": str(user_id),
+            "first_name": "user{}".format(user_id),
+            "last_name": None,
+            "user_name": "name{}".format(user_id),
+            "reason": "spam / scam #{}".format(user_id % 97),
+            "time": 1600000000 + user_id % 10 ** 8,
+        }
+    rows = list(bans.values())
+    for start in range(0, total, 10000):
+        SESSION.execute(sql.BansF.__table__.insert(), rows[start:start + 10000])
+    SESSION.commit()
+
+
+def cleanup():
+    SESSION.query(sql.BansF).filter(sql.BansF.fed_id.like("bench-fed-%")).delete(synchronize_session=False)
+    SESSION.commit()
+    getattr(sql, "__load_all_feds_banned")()
+
+
+def deep_size(obj, seen: set) -> int:
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_size(x, seen) for x in obj)
+    return size
+
+
+def scan_feds(user_id):
+    # how get_user_fbanlist answered before USER_FBANS, by walking every fed
+    banlist = sql.FEDERATION_BANNED_FULL
+    return [[fed_id, banlist[fed_id][user_id].get("reason")] for fed_id in banlist if banlist[fed_id].get(user_id)]
+
+
+def mib(size: int) -> str:
+    return "{:.1f} MiB".format(size / 2 ** 20)
+
+
+def main(total: int):
+    seed(total)
+    try:
+        start = time.perf_counter()
+        getattr(sql, "__load_all_feds_banned")()
+        load = time.perf_counter() - start
+
+        full = {fed_id: bans for fed_id, bans in sql.FEDERATION_BANNED_FULL.items() if fed_id.startswith("bench-fed-")}
+        index = {user_id: bans for user_id, bans in sql.USER_FBANS.items() if user_id >= FIRST_USER}
+        # what listing a user's feds needs out of the nested dicts
+        slim = {fed_id: {u: (b["reason"], b["time"]) for u, b in bans.items()} for fed_id, bans in full.items()}
+        seen = set()
+        full_size = deep_size(full, seen)
+        shared_size = deep_size(index, seen)
+
+        start = time.perf_counter()
+        for user_id in range(FIRST_USER, FIRST_USER + LOOKUPS):
+            sql.get_user_fbanlist(user_id)
+        lookup = (time.perf_counter() - start) / LOOKUPS * 10 ** 6
+        start = time.perf_counter()
+        for user_id in range(FIRST_USER, FIRST_USER + LOOKUPS):
+            scan_feds(str(user_id))
+        scan = (time.perf_counter() - start) / LOOKUPS * 10 ** 6
+    finally:
+        cleanup()
+
+    print("{} bans of {} users across {} feds, loaded in {:.2f}s".format(total, len(index), len(full), load))
+    print("FEDERATION_BANNED_FULL (dicts of strings)      {:>10}".format(mib(full_size)))
+    print("same nested dicts holding only (reason, time)  {:>10}".format(mib(deep_size(slim, set()))))
+    print("USER_FBANS standalone                          {:>10}".format(mib(deep_size(index, set()))))
+    print("USER_FBANS extra on top of FULL (shared strs)  {:>10}".format(mib(shared_size)))
+    print("feds of a user: {:.1f} us from USER_FBANS, {:.1f} us scanning every fed".format(lookup, scan))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -5,7 +5,8 @@ import time
 from typing import List
 import spamwatch
 import telegram.ext as tg
-from telegram.ext import Dispatcher, JobQueue, Updater
+from telegram.ext import ContextTypes, Dispatcher, JobQueue, Updater
+from telegram.utils.request import Request
 from telethon import TelegramClient
 from telethon.sessions import MemorySession
 from configparser import ConfigParser
@@ -129,6 +130,30 @@ class KigyoINIT:
         self.BACKUP_PASS =  self.parser.get("BACKUP_PASS", "1234567")
         self.SIBYL_KEY =  self.parser.get("SIBYL_KEY", "5845522410:8s6L3qkzNcCx4AHijttJT82zPgzvAKTkE9E9svE0YfGCchMF017d2JwAkOIgc2E-")
         self.SIBYL_ENDPOINT = self.parser.get("SIBYL_ENDPOINT", "https://psychopass.kaizoku.cyou")
+        self.ADMIN_CACHE_SIZE: int = self.parser.getint("ADMIN_CACHE_SIZE", 4096)
+        self.SW_BAN_TTL: int = self.parser.getint("SW_BAN_TTL", 60 * 60 * 6)
+        self.SW_CLEAN_TTL: int = self.parser.getint("SW_CLEAN_TTL", 60 * 30)
+        self.SW_TIMEOUT: float = self.parser.getfloat("SW_TIMEOUT", 0.5)
+        self.SIBYL_BAN_TTL: int = self.parser.getint("SIBYL_BAN_TTL", 60 * 60 * 6)
+        self.SIBYL_CLEAN_TTL: int = self.parser.getint("SIBYL_CLEAN_TTL", 60 * 30)
+        self.SIBYL_TIMEOUT: float = self.parser.getfloat("SIBYL_TIMEOUT", 1.0)
+        self.FBAN_CONCURRENCY: int = self.parser.getint("FBAN_CONCURRENCY", 8)
+        self.GBAN_CONCURRENCY: int = self.parser.getint("GBAN_CONCURRENCY", 8)
+        self.BROADCAST_CONCURRENCY: int = self.parser.getint("BROADCAST_CONCURRENCY", 8)
+        self.ANTISPAM_LIMIT: int = self.parser.getint("ANTISPAM_LIMIT", 25)
+        self.ANTISPAM_WINDOW: int = self.parser.getint("ANTISPAM_WINDOW", 25)
+        self.ANTISPAM_IGNORE_TIME: int = self.parser.getint("ANTISPAM_IGNORE_TIME", 600)
+        self.ANTISPAM_HARD_STRIKES: int = self.parser.getint("ANTISPAM_HARD_STRIKES", 5)
+        self.ANTISPAM_CHAT_LIMIT: int = self.parser.getint("ANTISPAM_CHAT_LIMIT", 0)
+        self.ANTISPAM_CHAT_IGNORE_TIME: int = self.parser.getint("ANTISPAM_CHAT_IGNORE_TIME", 300)
+        self.OUTBOUND_GLOBAL_RATE: float = self.parser.getfloat("OUTBOUND_GLOBAL_RATE", 30)
+        self.OUTBOUND_GROUP_RATE: float = self.parser.getfloat("OUTBOUND_GROUP_RATE", 20 / 60)
+        self.OUTBOUND_PRIVATE_RATE: float = self.parser.getfloat("OUTBOUND_PRIVATE_RATE", 1)
+        self.OUTBOUND_MAX_WAIT: float = self.parser.getfloat("OUTBOUND_MAX_WAIT", 10)
+        self.API_CACHE_CHAT_TTL: int = self.parser.getint("API_CACHE_CHAT_TTL", 60 * 5)
+        self.API_CACHE_MEMBER_TTL: int = self.parser.getint("API_CACHE_MEMBER_TTL", 60)
+        self.API_CACHE_ADMINS_TTL: int = self.parser.getint("API_CACHE_ADMINS_TTL", 60 * 5)
+        self.API_CACHE_SIZE: int = self.parser.getint("API_CACHE_SIZE", 10000)
 
 
     def init_sw(self):
@@ -174,6 +199,9 @@ DEV_USERS = [OWNER_ID] + [SYS_ADMIN] + get_user_list("devs")
 SUPPORT_USERS = get_user_list("supports")
 WHITELIST_USERS = get_user_list("whitelists")
 SPAMMERS = get_user_list("spammers")
+# the sql modules fill in their own flags as they load
+from tg_bot.modules.helper_funcs.reputation import REPUTATION, SPAMMER
+REPUTATION.load(SPAMMER, SPAMMERS)
 spamwatch_api = KInit.spamwatch_api
 CASH_API_KEY = KInit.CASH_API_KEY
 TIME_API_KEY = KInit.TIME_API_KEY
@@ -192,6 +220,30 @@ GLOBALANNOUNCE = KInit.GLOBALANNOUNCE
 BACKUP_PASS = KInit.BACKUP_PASS
 SIBYL_KEY = KInit.SIBYL_KEY
 SIBYL_ENDPOINT = KInit.SIBYL_ENDPOINT
+ADMIN_CACHE_SIZE = KInit.ADMIN_CACHE_SIZE
+SW_BAN_TTL = KInit.SW_BAN_TTL
+SW_CLEAN_TTL = KInit.SW_CLEAN_TTL
+SW_TIMEOUT = KInit.SW_TIMEOUT
+SIBYL_BAN_TTL = KInit.SIBYL_BAN_TTL
+SIBYL_CLEAN_TTL = KInit.SIBYL_CLEAN_TTL
+SIBYL_TIMEOUT = KInit.SIBYL_TIMEOUT
+FBAN_CONCURRENCY = KInit.FBAN_CONCURRENCY
+GBAN_CONCURRENCY = KInit.GBAN_CONCURRENCY
+BROADCAST_CONCURRENCY = KInit.BROADCAST_CONCURRENCY
+ANTISPAM_LIMIT = KInit.ANTISPAM_LIMIT
+ANTISPAM_WINDOW = KInit.ANTISPAM_WINDOW
+ANTISPAM_IGNORE_TIME = KInit.ANTISPAM_IGNORE_TIME
+ANTISPAM_HARD_STRIKES = KInit.ANTISPAM_HARD_STRIKES
+ANTISPAM_CHAT_LIMIT = KInit.ANTISPAM_CHAT_LIMIT
+ANTISPAM_CHAT_IGNORE_TIME = KInit.ANTISPAM_CHAT_IGNORE_TIME
+OUTBOUND_GLOBAL_RATE = KInit.OUTBOUND_GLOBAL_RATE
+OUTBOUND_GROUP_RATE = KInit.OUTBOUND_GROUP_RATE
+OUTBOUND_PRIVATE_RATE = KInit.OUTBOUND_PRIVATE_RATE
+OUTBOUND_MAX_WAIT = KInit.OUTBOUND_MAX_WAIT
+API_CACHE_CHAT_TTL = KInit.API_CACHE_CHAT_TTL
+API_CACHE_MEMBER_TTL = KInit.API_CACHE_MEMBER_TTL
+API_CACHE_ADMINS_TTL = KInit.API_CACHE_ADMINS_TTL
+API_CACHE_SIZE = KInit.API_CACHE_SIZE
 BOT_ID = TOKEN.split(":")[0]
 
 
@@ -227,8 +279,36 @@ except AttributeError:
 sw = KInit.init_sw()
 
 from tg_bot.modules.sql import SESSION
-
-updater: Updater = tg.Updater(token=TOKEN, base_url=KInit.BOT_API_URL, base_file_url=KInit.BOT_API_FILE_URL, workers=min(32, os.cpu_count() + 4), request_kwargs={"read_timeout": 10, "connect_timeout": 10})
+from tg_bot.modules.helper_funcs.chat_config import ChatConfigContext
+from tg_bot.modules.helper_funcs.outbound import OutboundScheduler, ScheduledBot
+from tg_bot.modules.helper_funcs.api_cache import ApiReadCache
+
+WORKERS = min(32, os.cpu_count() + 4)
+# every api call of the bot goes through this, see helper_funcs/outbound.py
+OUTBOUND = OutboundScheduler(
+    global_rate=OUTBOUND_GLOBAL_RATE,
+    group_rate=OUTBOUND_GROUP_RATE,
+    private_rate=OUTBOUND_PRIVATE_RATE,
+    max_wait=OUTBOUND_MAX_WAIT,
+)
+# getChat, getChatMember and getChatAdministrators are answered from here, see helper_funcs/api_cache.py
+API_CACHE = ApiReadCache({
+    "getChat": (API_CACHE_CHAT_TTL, API_CACHE_SIZE),
+    "getChatMember": (API_CACHE_MEMBER_TTL, API_CACHE_SIZE * 5),
+    "getChatAdministrators": (API_CACHE_ADMINS_TTL, ADMIN_CACHE_SIZE),
+})
+updater: Updater = tg.Updater(
+    bot=ScheduledBot(
+        TOKEN,
+        KInit.BOT_API_URL,
+        base_file_url=KInit.BOT_API_FILE_URL,
+        request=Request(con_pool_size=WORKERS + 4, read_timeout=10, connect_timeout=10),
+        scheduler=OUTBOUND,
+        cache=API_CACHE,
+    ),
+    workers=WORKERS,
+    context_types=ContextTypes(context=ChatConfigContext),
+)
 
 telethn = TelegramClient(MemorySession(), APP_ID, API_HASH)
 dispatcher: Dispatcher = updater.dispatcher
@@ -253,7 +333,7 @@ if CUSTOM_CMD and len(CUSTOM_CMD) >= 1:
 
 
 try:
-    from tg_bot.antispam import antispam_restrict_user, antispam_cek_user, detect_user
+    from tg_bot.antispam import detect_user
     log.info("AntiSpam loaded!")
     antispam_module = True
 except ModuleNotFoundError:
@@ -280,8 +360,7 @@ def spamcheck(func):
             parsing_date = time.mktime(message.date.timetuple())
             if detect_user(user.id, chat.id, message, parsing_date):
                 return False
-            antispam_restrict_user(user.id, parsing_date)
-        elif int(user.id) in SPAMMERS:
+        elif REPUTATION.has(user.id, SPAMMER):
             return False
         elif str(chat.id) in GROUP_BLACKLIST:
             dispatcher.bot.sendMessage(chat.id, "This group is blacklisted, I'm outa here...")
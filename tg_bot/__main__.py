@@ -20,6 +20,7 @@ from telegram.ext.dispatcher import DispatcherHandlerStop
 from telegram.utils.helpers import escape_markdown
 
 from tg_bot import (
+    API_CACHE,
     KInit,
     dispatcher,
     updater,
@@ -670,6 +671,7 @@ def migrate_chats(update: Update, _: CallbackContext):
         return
 
     log.info("Migrating from %s, to %s", str(old_chat), str(new_chat))
+    API_CACHE.forget_chat(old_chat)
     for mod in MIGRATEABLE:
         mod.__migrate__(old_chat, new_chat)
 
@@ -410,7 +410,7 @@ def admincache(update: Update, context: CallbackContext):
     if chat.get_member(user.id).status not in ["administrator", "creator"] and user.id != 1087968824:
         return msg.reply_text("this command can only be used by admins")
 
-    A_CACHE[update.effective_chat.id] = update.effective_chat.get_administrators()
+    A_CACHE.refresh(update.effective_chat.id)
     B_CACHE[update.effective_chat.id] = update.effective_chat.get_member(context.bot.id)
     msg.reply_text("Admin cache updated")
     _admincache[chat.id] = time.time()
@@ -13,7 +13,6 @@ from ujson import loads
 from yaml import load, Loader
 
 from tg_bot import dispatcher, spamcheck
-from .sql.clear_cmd_sql import get_clearcmd
 from .github import getphh
 from .helper_funcs.misc import delete
 from .helper_funcs.decorators import kigcmd
@@ -22,7 +21,6 @@ from .helper_funcs.decorators import kigcmd
 @spamcheck
 def magisk(update: Update, context: CallbackContext):
     message = update.effective_message
-    chat = update.effective_chat
     link = "https://raw.githubusercontent.com/topjohnwu/magisk-files/master/"
     magisk_dict = {
         "*Stable*": "stable.json",
@@ -42,17 +40,16 @@ def magisk(update: Update, context: CallbackContext):
         disable_web_page_preview = True,
     )
 
-    cleartime = get_clearcmd(chat.id, "magisk")
+    cleartime = context.chat_config.clearcmd.get("magisk")
 
     if cleartime:
-        context.dispatcher.run_async(delete, delmsg, cleartime.time)
+        context.dispatcher.run_async(delete, delmsg, cleartime)
 
 @kigcmd(command='checkfw', run_async=True, can_disable=True)
 @spamcheck
 def checkfw(update: Update, context: CallbackContext):
     args = context.args
     message = update.effective_message
-    chat = update.effective_chat
     
     if len(args) == 2:
         temp, csc = args
@@ -89,17 +86,16 @@ def checkfw(update: Update, context: CallbackContext):
         disable_web_page_preview = True,
     )
 
-    cleartime = get_clearcmd(chat.id, "checkfw")
+    cleartime = context.chat_config.clearcmd.get("checkfw")
 
     if cleartime:
-        context.dispatcher.run_async(delete, delmsg, cleartime.time)
+        context.dispatcher.run_async(delete, delmsg, cleartime)
 
 @kigcmd(command='getfw', run_async=True, can_disable=True)
 @spamcheck
 def getfw(update: Update, context: CallbackContext):
     args = context.args
     message = update.effective_message
-    chat = update.effective_chat
     btn = ""
     
     if len(args) == 2:
@@ -147,17 +143,16 @@ def getfw(update: Update, context: CallbackContext):
         disable_web_page_preview = True,
     )
 
-    cleartime = get_clearcmd(chat.id, "getfw")
+    cleartime = context.chat_config.clearcmd.get("getfw")
 
     if cleartime:
-        context.dispatcher.run_async(delete, delmsg, cleartime.time)
+        context.dispatcher.run_async(delete, delmsg, cleartime)
 
 @kigcmd(command='phh', run_async=True, can_disable=True)
 @spamcheck
 def phh(update: Update, context: CallbackContext):
     args = context.args
     message = update.effective_message
-    chat = update.effective_chat
     index = int(args[0]) if len(args) > 0 and args[0].isdigit() else 0
     text = getphh(index)
 
@@ -167,16 +162,15 @@ def phh(update: Update, context: CallbackContext):
         disable_web_page_preview = True,
     )
 
-    cleartime = get_clearcmd(chat.id, "phh")
+    cleartime = context.chat_config.clearcmd.get("phh")
 
     if cleartime:
-        context.dispatcher.run_async(delete, delmsg, cleartime.time)
+        context.dispatcher.run_async(delete, delmsg, cleartime)
 
 @kigcmd(command='miui', run_async=True, can_disable=True)
 @spamcheck
 def miui(update: Update, context: CallbackContext):
     message = update.effective_message
-    chat = update.effective_chat
     device = message.text[len("/miui ") :]
     markup = []
 
@@ -213,16 +207,15 @@ def miui(update: Update, context: CallbackContext):
         disable_web_page_preview = True,
     )
 
-    cleartime = get_clearcmd(chat.id, "miui")
+    cleartime = context.chat_config.clearcmd.get("miui")
 
     if cleartime:
-        context.dispatcher.run_async(delete, delmsg, cleartime.time)
+        context.dispatcher.run_async(delete, delmsg, cleartime)
 
 @kigcmd(command=['ofox', 'orangefox'], run_async=True, can_disable=True)
 @spamcheck
 def orangefox(update: Update, context: CallbackContext):
     message = update.effective_message
-    chat = update.effective_chat
     device = message.text[len("/orangefox ") :]
     btn = ""
 
@@ -273,16 +266,15 @@ def orangefox(update: Update, context: CallbackContext):
         disable_web_page_preview = True,
     )
 
-    cleartime = get_clearcmd(chat.id, "orangefox")
+    cleartime = context.chat_config.clearcmd.get("orangefox")
 
     if cleartime:
-        context.dispatcher.run_async(delete, delmsg, cleartime.time)
+        context.dispatcher.run_async(delete, delmsg, cleartime)
 
 @kigcmd(command='twrp', run_async=True, can_disable=True)
 @spamcheck
 def twrp(update: Update, context: CallbackContext):
     message = update.effective_message
-    chat = update.effective_chat
     device = message.text[len("/twrp ") :]
     btn = ""
 
@@ -313,10 +305,10 @@ def twrp(update: Update, context: CallbackContext):
         disable_web_page_preview = True,
     )
 
-    cleartime = get_clearcmd(chat.id, "twrp")
+    cleartime = context.chat_config.clearcmd.get("twrp")
 
     if cleartime:
-        context.dispatcher.run_async(delete, delmsg, cleartime.time)
+        context.dispatcher.run_async(delete, delmsg, cleartime)
 
 
 __help__ = """
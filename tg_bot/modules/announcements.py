@@ -1,7 +1,6 @@
 import html
 from typing import Optional
 
-from telegram.error import TelegramError
 from .helper_funcs.admin_status import A_CACHE, B_CACHE
 
 from telegram.chatmemberupdated import ChatMemberUpdated
@@ -12,7 +11,7 @@ from telegram.ext import CallbackContext
 from telegram.ext.chatmemberhandler import ChatMemberHandler
 
 import tg_bot.modules.sql.log_channel_sql as logsql
-from tg_bot import OWNER_ID, dispatcher
+from tg_bot import API_CACHE, OWNER_ID, dispatcher
 from tg_bot.modules.log_channel import loggable
 
 import tg_bot.modules.sql.logger_sql as sql
@@ -44,10 +43,10 @@ def chatmemberupdates(update: Update, context: CallbackContext) -> Optional[str]
     bot = context.bot
     chat = update.effective_chat
     message = update.effective_message
-    log_setting = logsql.get_chat_setting(chat.id)
+    log_setting = context.chat_config.log_settings
     if not log_setting:
         logsql.set_chat_setting(logsql.LogChannelSettings(chat.id, True, True, True, True, True))
-        log_setting = logsql.get_chat_setting(chat.id)
+        log_setting = context.chat_config.log_settings
         
     result = extract_status_change(update.chat_member)
     status_change, title_change = result
@@ -392,23 +391,23 @@ def admincacheupdates(update: Update, _: CallbackContext):
         newstat = update.chat_member.new_chat_member.status
     except AttributeError:
         return
-    if (
-        oldstat == "administrator"
-        and newstat != "administrator"
-        or oldstat != "administrator"
-        and newstat == "administrator"
-    ):
-
-        A_CACHE[update.effective_chat.id] = update.effective_chat.get_administrators()
-        # B_CACHE[update.effective_chat.id] = update.effective_chat.get_member(dispatcher.bot.id)
+    # promotions, demotions and admin permission edits; the update carries the new ChatMember
+    admins = oldstat in ("administrator", "creator") or newstat in ("administrator", "creator")
+    API_CACHE.member_changed(update.effective_chat.id, update.chat_member.new_chat_member.user.id, admins)
+    if admins:
+        A_CACHE.update_member(update.effective_chat.id, update.chat_member.new_chat_member)
 
 
 def botstatchanged(update: Update, _: CallbackContext):
+    # what the bot may see of the chat changes with its own status
+    API_CACHE.forget_chat(update.effective_chat.id)
     if update.effective_chat.type != "private":
-        try:
-            B_CACHE[update.effective_chat.id] = update.effective_chat.get_member(dispatcher.bot.id)
-        except TelegramError:
-            pass
+        # the update already carries the bot's new ChatMember, no need to ask the api for it
+        bot_member = update.my_chat_member.new_chat_member
+        if bot_member.status in ("left", "kicked"):
+            B_CACHE.pop(update.effective_chat.id, None)
+        else:
+            B_CACHE[update.effective_chat.id] = bot_member
 
 dispatcher.add_handler(ChatMemberHandler(chatmemberupdates, ChatMemberHandler.CHAT_MEMBER, run_async=True), group=-21)
 dispatcher.add_handler(ChatMemberHandler(mychatmemberupdates, ChatMemberHandler.MY_CHAT_MEMBER, run_async=True), group=-23)
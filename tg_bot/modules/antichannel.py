@@ -62,7 +62,7 @@ def eliminate_channel(update: Update, context: CallbackContext):
     message = update.effective_message
     chat = update.effective_chat
     bot = context.bot
-    if not antichannel_status(chat.id):
+    if not context.chat_config.antichannel:
         return
 
     # ignore approved users
@@ -25,6 +25,10 @@ from .helper_funcs.admin_status import (
 
 FLOOD_GROUP = -5
 
+# bounds for /setfloodtimer, the count is also the size of each user's ring buffer
+FLOOD_TIMER_MAX_COUNT = 100
+FLOOD_TIMER_MAX_SECONDS = 60 * 60
+
 
 def mention_html_chat(chat_id: Union[int, str], name: str) -> str:
     return f'<a href="tg://t.me/{chat_id}">{html.escape(name)}</a>'
@@ -58,12 +62,12 @@ def check_flood(update: Update, context: CallbackContext) -> Optional[str]:
         sql.update_flood(chat.id, None)
         return
 
-    should_ban = sql.update_flood(chat.id, user.id)
+    should_ban = sql.update_flood(chat.id, user.id, msg.date.timestamp())
     if not should_ban:
         return ""
 
     try:
-        getmode, getvalue = sql.get_flood_setting(chat.id)
+        getmode, getvalue = context.chat_config.flood_setting
         if getmode == 1:
             chat.ban_member(user.id)
             execstrings = "Banned"
@@ -112,6 +116,7 @@ def check_flood(update: Update, context: CallbackContext) -> Optional[str]:
             "I can't restrict people here, give me permissions first! Until then, I'll disable anti-flood."
         )
         sql.set_flood(chat.id, 0)
+        sql.set_flood_timer(chat.id, 0, 0)
         return (
             "<b>{}:</b>"
             "\n#INFO"
@@ -143,7 +148,7 @@ def check_channel_flood(update: Update, _: CallbackContext) -> Optional[str]:
         sql.update_flood(chat.id, None)
         return
 
-    should_ban = sql.update_flood(chat.id, user.id)
+    should_ban = sql.update_flood(chat.id, user.id, msg.date.timestamp())
     if not should_ban:
         return ""
 
@@ -169,6 +174,7 @@ def check_channel_flood(update: Update, _: CallbackContext) -> Optional[str]:
             "I can't restrict people here, give me permissions first! Until then, I'll disable anti-flood."
         )
         sql.set_flood(chat.id, 0)
+        sql.set_flood_timer(chat.id, 0, 0)
         return (
             "<b>{}:</b>"
             "\n#INFO"
@@ -283,6 +289,66 @@ def set_flood(update, context) -> Optional[str]:  # sourcery no-metrics
     return ""
 
 
+@kigcmd(command=["setfloodtimer", "floodtimer"], pass_args=True)
+@spamcheck
+@connection_status
+@bot_admin_check(AdminPerms.CAN_RESTRICT_MEMBERS)
+@user_admin_check(AdminPerms.CAN_CHANGE_INFO, allow_mods = True)
+@loggable
+def set_flood_timer(update, context) -> Optional[str]:
+    chat = update.effective_chat  # type: Optional[Chat]
+    message = update.effective_message  # type: Optional[Message]
+    user = update.effective_user  # type: Optional[User]
+    args = context.args
+
+    if len(args) == 1 and args[0].lower() in ["off", "no", "0"]:
+        sql.set_flood_timer(chat.id, 0, 0)
+        message.reply_text("Timed antiflood has been disabled.")
+        return (
+            "<b>{}:</b>"
+            "\n#SETFLOODTIMER"
+            "\n<b>Admin:</b> {}"
+            "\nDisabled timed antiflood.".format(
+                html.escape(chat.title), mention_html(user.id, user.first_name)
+            )
+        )
+
+    seconds = parse_flood_window(args[1]) if len(args) == 2 and args[0].isdigit() else None
+    if not seconds:
+        message.reply_text(
+            "Use `/setfloodtimer <count> <duration>`, e.g. `/setfloodtimer 10 30s`, to act on users "
+            "sending that many messages within that time.\nOr use `/setfloodtimer off` to disable it!",
+            parse_mode="markdown",
+        )
+        return ""
+
+    count = int(args[0])
+    if count <= 3 or count > FLOOD_TIMER_MAX_COUNT:
+        message.reply_text("The message count must be between 4 and {}!".format(FLOOD_TIMER_MAX_COUNT))
+        return ""
+    if seconds > FLOOD_TIMER_MAX_SECONDS:
+        message.reply_text("The duration can be at most {} minutes!".format(FLOOD_TIMER_MAX_SECONDS // 60))
+        return ""
+
+    sql.set_flood_timer(chat.id, count, seconds)
+    message.reply_text("Users sending {} messages within {} seconds will now be acted on!".format(count, seconds))
+    return (
+        "<b>{}:</b>"
+        "\n#SETFLOODTIMER"
+        "\n<b>Admin:</b> {}"
+        "\nSet timed antiflood to <code>{}</code> messages in <code>{}s</code>.".format(
+            html.escape(chat.title), mention_html(user.id, user.first_name), count, seconds
+        )
+    )
+
+
+def parse_flood_window(value: str) -> Optional[int]:
+    match = re.match(r"^(\d+)([smh]?)$", value.lower())
+    if not match:
+        return None
+    return int(match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[match.group(2)]
+
+
 @kigcmd(command="flood")
 @connection_status
 @bot_admin_check(AdminPerms.CAN_RESTRICT_MEMBERS)
@@ -293,16 +359,20 @@ def flood(update: Update, _: CallbackContext):
     msg = update.effective_message
 
     limit = sql.get_flood_limit(chat.id)
+    timer_count, timer_seconds = sql.get_flood_timer(chat.id)
     flood_type = get_flood_type(chat.id)
-    if limit == 0:
+    if limit == 0 and timer_count == 0:
         msg.reply_text("I'm not enforcing any flood control here!")
 
     else:
-        msg.reply_text(
-            "I'm currently restricting members after {} consecutive messages.\nThe current flood mode is:\n  {}".format(
-                limit, flood_type
-            )
-        )
+        text = "I'm currently restricting members after "
+        if limit:
+            text += "{} consecutive messages".format(limit)
+        if limit and timer_count:
+            text += ", or after "
+        if timer_count:
+            text += "{} messages within {} seconds".format(timer_count, timer_seconds)
+        msg.reply_text(text + ".\nThe current flood mode is:\n  {}".format(flood_type))
 
 
 @kigcmd(command=["setfloodmode", "floodmode"], pass_args=True)
@@ -392,10 +462,13 @@ def __migrate__(old_chat_id, new_chat_id):
 
 def __chat_settings__(chat_id, user_id):
     limit = sql.get_flood_limit(chat_id)
-    if limit == 0:
+    timer_count, timer_seconds = sql.get_flood_timer(chat_id)
+    if limit == 0 and timer_count == 0:
         return "Not enforcing to flood control."
-    else:
-        return "Antiflood has been set to`{}`.".format(limit)
+    text = "Antiflood has been set to`{}`.".format(limit)
+    if timer_count:
+        text += " Timed antiflood is `{}` messages in `{}s`.".format(timer_count, timer_seconds)
+    return text
 
 
 from .language import gs
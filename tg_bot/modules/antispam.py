@@ -5,41 +5,47 @@ from datetime import datetime
 from io import BytesIO
 from typing import Optional
 
-from telegram import ParseMode, Update, Chat
-from telegram.error import BadRequest, TelegramError
+from telegram import ParseMode, Update, Chat, Message
+from telegram.error import BadRequest, RetryAfter, TelegramError
 from telegram.ext import CallbackContext, Filters
 from telegram.utils.helpers import mention_html
 
-from .feds import welcome_fed
+from .feds import welcome_fed, bot_cant_ban
 from .helper_funcs.admin_status import user_admin_check, user_is_admin, AdminPerms, u_na_errmsg, bot_is_admin
 from .log_channel import loggable
 from .sql.users_sql import get_user_com_chats
 from .helper_funcs.extraction import extract_user, extract_user_and_text
 from .helper_funcs.misc import send_to_list
+from .helper_funcs.fanout import FanOut, ABORT, FAILED
+from .helper_funcs.reputation import REPUTATION, GBANNED
+from .helper_funcs.verdict_cache import SW_CACHE
 from .helper_funcs.decorators import kigcmd, kigmsg
 from .. import (
     DEV_USERS,
+    GBAN_CONCURRENCY,
     GBAN_LOGS,
     MESSAGE_DUMP,
     MOD_USERS,
-    OWNER_ID,
     SUDO_USERS,
     SUPPORT_USERS,
     WHITELIST_USERS,
     spamcheck,
-    sw,
     dispatcher,
     log,
+    j,
 )
 from .helper_funcs.chat_status import support_plus
 
 import tg_bot.modules.sql.antispam_sql as sql
 
-from spamwatch.errors import SpamWatchError, Error, UnauthorizedError, NotFoundError, Forbidden, TooManyRequests
+from spamwatch.errors import Forbidden
 
 
 GBAN_ENFORCE_GROUP = -1
 
+# chats a gban propagation goes through between two checkpoints
+GBAN_CHECKPOINT_EVERY = 100
+
 GBAN_ERRORS = {
     "User is an administrator of the chat",
     "Chat not found",
@@ -160,7 +166,6 @@ def gban(update: Update, context: CallbackContext):  # sourcery no-metrics
 
     logmsg = message.reply_text("Blowing the dust off the BANHAMMER!")
 
-    start_time = time.time()
     datetime_fmt = "%Y-%m-%dT%H:%M"
     current_time = datetime.utcnow().strftime(datetime_fmt)
 
@@ -199,60 +204,8 @@ def gban(update: Update, context: CallbackContext):  # sourcery no-metrics
         send_to_list(bot, SUDO_USERS + SUPPORT_USERS, log_message, html=True)
 
     sql.gban_user(user_id, user_chat.username or user_chat.first_name, reason)
+    start_gban_propagation(user_id, "gban", log_message, logmsg)
 
-    chats = get_user_com_chats(user_id)
-    gbanned_chats = 0
-
-    for chat in chats:
-        chat_id = int(chat)
-
-        # Check if this group has disabled gbans
-        if not sql.does_chat_gban(chat_id):
-            continue
-
-        try:
-            bot.ban_chat_member(chat_id, user_id)
-            gbanned_chats += 1
-
-        except BadRequest as excp:
-            if excp.message not in GBAN_ERRORS:
-                message.reply_text(f"Could not gban due to: {excp.message}")
-                if GBAN_LOGS:
-                    bot.send_message(
-                        GBAN_LOGS,
-                        f"Could not gban due to {excp.message}",
-                        parse_mode=ParseMode.HTML,
-                    )
-                else:
-                    send_to_list(
-                        bot,
-                        SUDO_USERS + SUPPORT_USERS,
-                        f"Could not gban due to: {excp.message}",
-                    )
-                sql.ungban_user(user_id)
-                return
-        except TelegramError:
-            pass
-
-    if GBAN_LOGS:
-        logmsg.edit_text(
-            log_message + f"\n<b>Chats affected:</b> <code>{gbanned_chats}</code>",
-            parse_mode=ParseMode.HTML,
-        )
-    else:
-        send_to_list(
-            bot,
-            SUDO_USERS + SUPPORT_USERS,
-            f"Gban complete! (User banned in <code>{gbanned_chats}</code> chats)",
-            html=True,
-        )
-
-    end_time = time.time()
-    gban_time = round((end_time - start_time), 2)
-
-    if gban_time > 60:
-        gban_time = round((gban_time / 60), 2)
-    message.reply_text("Done! Gbanned.", parse_mode=ParseMode.HTML)
     try:
         bot.send_message(
             user_id,
@@ -291,9 +244,8 @@ def ungban(update: Update, context: CallbackContext):  # sourcery no-metrics
         message.reply_text("This user is not gbanned!")
         return
 
-    message.reply_text(f"I'll give {user_chat.first_name} a second chance, globally.")
+    progress = message.reply_text(f"I'll give {user_chat.first_name} a second chance, globally.")
 
-    start_time = time.time()
     datetime_fmt = "%Y-%m-%dT%H:%M"
     current_time = datetime.utcnow().strftime(datetime_fmt)
 
@@ -323,57 +275,144 @@ def ungban(update: Update, context: CallbackContext):  # sourcery no-metrics
     else:
         send_to_list(bot, SUDO_USERS + SUPPORT_USERS, log_message, html=True)
 
-    chats = get_user_com_chats(user_id)
-    ungbanned_chats = 0
+    sql.ungban_user(user_id)
+    start_gban_propagation(user_id, "ungban", log_message, progress)
+
+
+def start_gban_propagation(user_id, action: str, log_message: str, progress: Optional[Message] = None):
+    """
+    Carry a gban or ungban out in the user's chats from a background job, the job checkpoints in
+    the database and picks up where it was after a restart
+    """
+    # chats that turned gbans off never see an api call
+    chats = [chat_id for chat_id in get_user_com_chats(user_id) if sql.does_chat_gban(chat_id)]
+    sql.start_gban_propagation(
+        user_id,
+        action,
+        chats,
+        log_message,
+        progress.chat_id if progress else None,
+        progress.message_id if progress else None,
+    )
+    schedule_gban_propagation(user_id)
 
-    for chat in chats:
-        chat_id = int(chat)
 
-        # Check if this group has disabled gbans
-        if not sql.does_chat_gban(chat_id):
-            continue
+def schedule_gban_propagation(user_id, when: float = 0):
+    j.run_once(propagate_gban, when, context=user_id, name="gban propagation of {}".format(user_id))
 
+
+def propagate_gban(context: CallbackContext):
+    bot = context.bot
+    user_id = context.job.context
+    job = sql.get_gban_propagation(user_id)
+    if not job:
+        return
+    gbanning = job["action"] == "gban"
+    chats = job["chats"]
+    done, affected, failed = job["done"], job["affected"], job["failed"]
+
+    def ban(chat_id) -> str:
+        # an ungban came in meanwhile
+        if not sql.is_user_gbanned(user_id):
+            return ABORT
+        if bot_cant_ban(chat_id):
+            return "skipped"
         try:
-            member = bot.get_chat_member(chat_id, user_id)
-            if member.status == "kicked":
-                bot.unban_chat_member(chat_id, user_id)
-                ungbanned_chats += 1
+            bot.ban_chat_member(chat_id, user_id)
+            return "affected"
+        except BadRequest as excp:
+            if excp.message == "User_id_invalid":
+                return ABORT
+            if excp.message not in GBAN_ERRORS:
+                log.warning("Could not gban in {} due to: {}".format(chat_id, excp.message))
+                return FAILED
+            return "skipped"
+        except RetryAfter:
+            raise
+        except TelegramError:
+            return "skipped"
 
+    def unban(chat_id) -> str:
+        if sql.is_user_gbanned(user_id):
+            return ABORT
+        if bot_cant_ban(chat_id):
+            return "skipped"
+        try:
+            # unban_chat_member succeeds whether or not they were banned, so ask first; this is
+            # usually answered from the api cache, and the gban's own ban dropped the stale entry
+            if bot.get_chat_member(chat_id, user_id).status != "kicked":
+                return "not banned"
+            # a plain unban would kick the user out of chats they are still in
+            bot.unban_chat_member(chat_id, user_id, only_if_banned=True)
+            return "affected"
         except BadRequest as excp:
             if excp.message not in UNGBAN_ERRORS:
-                message.reply_text(f"Could not un-gban due to: {excp.message}")
-                if GBAN_LOGS:
-                    bot.send_message(
-                        GBAN_LOGS,
-                        f"Could not un-gban due to: {excp.message}",
-                        parse_mode=ParseMode.HTML,
-                    )
-                else:
-                    bot.send_message(
-                        OWNER_ID, f"Could not un-gban due to: {excp.message}"
-                    )
-                return
+                log.warning("Could not un-gban in {} due to: {}".format(chat_id, excp.message))
+                return FAILED
+            return "skipped"
+        except RetryAfter:
+            raise
+        except TelegramError:
+            return "skipped"
+
+    def edit_progress(text):
+        if not job["progress_message"]:
+            return
+        try:
+            bot.edit_message_text(
+                text,
+                chat_id=job["progress_chat"],
+                message_id=job["progress_message"],
+                parse_mode=ParseMode.HTML,
+                disable_web_page_preview=True,
+            )
         except TelegramError:
             pass
 
-    sql.ungban_user(user_id)
+    def report(fanout: FanOut):
+        edit_progress("{} in progress: {}/{} chats done.".format(
+            "Gban" if gbanning else "Un-gban", done + fanout.done, len(chats)
+        ))
+
+    aborted = False
+    while done < len(chats) and not aborted:
+        chunk = chats[done:done + GBAN_CHECKPOINT_EVERY]
+        fanout = FanOut(ban if gbanning else unban, concurrency=GBAN_CONCURRENCY, on_progress=report)
+        results = fanout.run(chunk)
+        aborted = results[ABORT] > 0
+        done += len(chunk)
+        affected += results["affected"]
+        failed += results[FAILED]
+        if not sql.checkpoint_gban_propagation(user_id, job["started"], done, affected, failed):
+            # replaced by a newer gban/ungban of the same user, that one reports
+            return
 
-    if GBAN_LOGS:
-        log.edit_text(
-            log_message + f"\n<b>Chats affected:</b> {ungbanned_chats}",
-            parse_mode=ParseMode.HTML,
+    sql.finish_gban_propagation(user_id, job["started"])
+    took = time.time() - job["started"] / 1000
+    edit_progress(job["log_message"] + "\n<b>Chats affected:</b> <code>{}</code>".format(affected))
+
+    summary = (
+        "<b>{} propagation {}</b>"
+        "\n<b>User ID:</b> <code>{}</code>"
+        "\n<b>Chats affected:</b> <code>{}</code>/<code>{}</code>"
+        "\n<b>Failed:</b> <code>{}</code>"
+        "\n<b>Took:</b> <code>{:.1f}s</code>".format(
+            "Gban" if gbanning else "Un-gban",
+            "stopped" if aborted else "finished",
+            user_id,
+            affected,
+            len(chats),
+            failed,
+            took,
         )
+    )
+    if GBAN_LOGS:
+        try:
+            bot.send_message(GBAN_LOGS, summary, parse_mode=ParseMode.HTML)
+        except TelegramError:
+            pass
     else:
-        send_to_list(bot, SUDO_USERS + SUPPORT_USERS, "un-gban complete!")
-
-    end_time = time.time()
-    ungban_time = round((end_time - start_time), 2)
-
-    if ungban_time > 60:
-        ungban_time = round((ungban_time / 60), 2)
-        message.reply_text(f"Person has been un-gbanned. Took {ungban_time} min")
-    else:
-        message.reply_text(f"Person has been un-gbanned. Took {ungban_time} sec")
+        send_to_list(bot, SUDO_USERS + SUPPORT_USERS, summary, html=True)
 
 
 @kigcmd(command="gbanlist")
@@ -402,7 +441,7 @@ def gbanlist(update: Update, _):
         )
 
 
-def check_and_ban(update, user_id, should_message=True):
+def check_and_ban(update, user_id, should_message=True, flags=None):
     # from tg_bot import SPB_MODE
     chat = update.effective_chat  # type: Optional[Chat]
     if not bot_is_admin(chat, AdminPerms.CAN_RESTRICT_MEMBERS):
@@ -431,14 +470,7 @@ def check_and_ban(update, user_id, should_message=True):
     #                 log.warning("Spam Protection API is unreachable.")
     #     except BaseException as e:
     #         log.info(f'SpamProtection was disabled due to {e}')
-    try:
-        sw_ban = sw.get_ban(int(user_id))
-    except AttributeError:
-        sw_ban = None
-    except (SpamWatchError, Error, UnauthorizedError, NotFoundError, Forbidden, TooManyRequests, ConnectionError) as e:
-        log.warning(f" SpamWatch Error: {e}")
-        sw_ban = None
-
+    sw_ban = SW_CACHE.get(user_id)
     if sw_ban:
         chat.ban_member(user_id)
         if should_message:
@@ -448,7 +480,9 @@ def check_and_ban(update, user_id, should_message=True):
             )
         return
 
-    if sql.is_user_gbanned(user_id):
+    if flags is None:
+        flags = REPUTATION.flags(user_id)
+    if flags & GBANNED:
         update.effective_chat.ban_member(user_id)
         if should_message:
             text = (
@@ -474,17 +508,19 @@ def enforce_gban(update: Update, context: CallbackContext):
     try:
 
         if user and not user_is_admin(update, user.id, channels = True):
+            flags = REPUTATION.flags(user.id)
             if do_gban:
-                check_and_ban(update, user.id)
-            welcome_fed(context, msg, chat, user.id)
+                check_and_ban(update, user.id, flags=flags)
+            welcome_fed(context, msg, chat, user.id, flags)
             return
 
         if msg.new_chat_members:
             new_members = msg.new_chat_members
             for mem in new_members:
+                flags = REPUTATION.flags(mem.id)
                 if do_gban:
-                    check_and_ban(update, mem.id)
-                welcome_fed(context, msg, chat, mem.id)
+                    check_and_ban(update, mem.id, flags=flags)
+                welcome_fed(context, msg, chat, mem.id, flags)
 
         # if msg.reply_to_message:
         #     user = msg.reply_to_message.from_user
@@ -599,4 +635,9 @@ def get_help(chat):
     return gs(chat, "antispam_help")
 
 
+# propagations a restart cut short carry on from their last checkpoint
+for pending_user_id in sql.get_pending_gban_propagations():
+    schedule_gban_propagation(pending_user_id, 10)
+
+
 __mod_name__ = 'AntiSpam'
@@ -248,6 +248,16 @@ def unapproveall_btn(update: Update, _: CallbackContext):
             query.answer("Only owner of the chat can do this.")
 
 
+def __migrate__(old_chat_id, new_chat_id):
+    sql.migrate_chat(old_chat_id, new_chat_id)
+
+
+def __stats__():
+    return "• {} approved users across {} chats ({:.1f} KiB cached).".format(
+        sql.num_approved(), len(sql.CHAT_APPROVALS), sql.cache_size() / 1024
+    )
+
+
 from .language import gs
 
 
@@ -1,6 +1,5 @@
 from enum import IntEnum
 import html
-import re
 from typing import List
 
 from telegram import ChatPermissions, Update
@@ -109,7 +108,11 @@ def add_blacklist(update, _):
         for trigger in to_blacklist:
             bl, action = extract_bl_and_action(trigger)
             if not sql.add_to_blacklist(chat.id, bl, action.value):
-                return msg.reply_text("The maximum number of blacklists (100) has been reached for this chat.")
+                return msg.reply_text(
+                    "The maximum number of blacklists ({}) has been reached for this chat.".format(
+                        sql.MAX_BLACKLIST_TRIGGERS
+                    )
+                )
             act = action.name
 
         if len(to_blacklist) == 1:
@@ -354,88 +357,84 @@ def del_blacklist(update: Update, context: CallbackContext):  # sourcery no-metr
         return
     if is_approved(chat.id, user.id):
         return
-    getmode, value = sql.get_blacklist_setting(chat.id)
-
-    chat_filters = sql.get_chat_blacklist(chat.id)
-
-    for item in chat_filters:
-        trigger = str(item[0])
-        getmode = (int(item[1]) if int(item[1]) > 0 else getmode)
-
-        pattern = r"( |^|[^\w])" + re.escape(trigger) + r"( |$|[^\w])"
-        if re.search(pattern, to_match, flags=re.IGNORECASE):
-            try:
-                match getmode:
-                    case 0:
-                        return
-                    case 1:
-                        message.delete()
-                    case 2:
-                        message.delete()
-                        warn(
-                            update.effective_user,
-                            update,
-                            ("Using blacklisted trigger: {}".format(trigger)),
-                            message,
-                            update.effective_user,
-                        )
-                        return
-                    case 3:
-                        message.delete()
-                        bot.restrict_chat_member(
-                            chat.id,
-                            update.effective_user.id,
-                            permissions=ChatPermissions(can_send_messages=False),
-                        )
-                        bot.sendMessage(
-                            chat.id,
-                            f"Muted {user.first_name} for using Blacklisted word: {trigger}!",
-                        )
-                        return
-                    case 4:
-                        message.delete()
-                        res = chat.unban_member(update.effective_user.id)
-                        if res:
-                            bot.sendMessage(
-                                chat.id,
-                                f"Kicked {user.first_name} for using Blacklisted word: {trigger}!",
-                            )
-                        return
-                    case 5:
-                        message.delete()
-                        chat.ban_member(user.id)
-                        bot.sendMessage(
-                            chat.id,
-                            f"Banned {user.first_name} for using Blacklisted word: {trigger}",
-                        )
-                        return
-                    case 6:
-                        message.delete()
-                        bantime = extract_time(message, value)
-                        chat.ban_member(user.id, until_date=bantime)
-                        bot.sendMessage(
-                            chat.id,
-                            f"Banned {user.first_name} until '{value}' for using Blacklisted word: {trigger}!",
-                        )
-                        return
-                    case 7:
-                        message.delete()
-                        mutetime = extract_time(message, value)
-                        bot.restrict_chat_member(
-                            chat.id,
-                            user.id,
-                            until_date=mutetime,
-                            permissions=ChatPermissions(can_send_messages=False),
-                        )
-                        bot.sendMessage(
-                            chat.id,
-                            f"Muted {user.first_name} until '{value}' for using Blacklisted word: {trigger}!",
-                        )
-                        return
-            except BadRequest as excp:
-                if excp.message != "Message to delete not found":
-                    log.exception("Error while deleting blacklist message.")
-            break
+    item = sql.match_blacklist(chat.id, to_match)
+    if not item:
+        return
+    getmode, value = context.chat_config.blacklist_settings
+    trigger = str(item[0])
+    getmode = (int(item[1]) if int(item[1]) > 0 else getmode)
+
+    try:
+        match getmode:
+            case 0:
+                return
+            case 1:
+                message.delete()
+            case 2:
+                message.delete()
+                warn(
+                    update.effective_user,
+                    update,
+                    ("Using blacklisted trigger: {}".format(trigger)),
+                    message,
+                    update.effective_user,
+                )
+                return
+            case 3:
+                message.delete()
+                bot.restrict_chat_member(
+                    chat.id,
+                    update.effective_user.id,
+                    permissions=ChatPermissions(can_send_messages=False),
+                )
+                bot.sendMessage(
+                    chat.id,
+                    f"Muted {user.first_name} for using Blacklisted word: {trigger}!",
+                )
+                return
+            case 4:
+                message.delete()
+                res = chat.unban_member(update.effective_user.id)
+                if res:
+                    bot.sendMessage(
+                        chat.id,
+                        f"Kicked {user.first_name} for using Blacklisted word: {trigger}!",
+                    )
+                return
+            case 5:
+                message.delete()
+                chat.ban_member(user.id)
+                bot.sendMessage(
+                    chat.id,
+                    f"Banned {user.first_name} for using Blacklisted word: {trigger}",
+                )
+                return
+            case 6:
+                message.delete()
+                bantime = extract_time(message, value)
+                chat.ban_member(user.id, until_date=bantime)
+                bot.sendMessage(
+                    chat.id,
+                    f"Banned {user.first_name} until '{value}' for using Blacklisted word: {trigger}!",
+                )
+                return
+            case 7:
+                message.delete()
+                mutetime = extract_time(message, value)
+                bot.restrict_chat_member(
+                    chat.id,
+                    user.id,
+                    until_date=mutetime,
+                    permissions=ChatPermissions(can_send_messages=False),
+                )
+                bot.sendMessage(
+                    chat.id,
+                    f"Muted {user.first_name} until '{value}' for using Blacklisted word: {trigger}!",
+                )
+                return
+    except BadRequest as excp:
+        if excp.message != "Message to delete not found":
+            log.exception("Error while deleting blacklist message.")
 
 
 @kigcmd(command=["removeallblacklists", "removeallblocklists", "unblacklistall"], filters=Filters.chat_type.groups)
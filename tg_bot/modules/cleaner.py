@@ -17,6 +17,7 @@ from telegram.ext import (
 
 )
 from .helper_funcs.decorators import kigcmd, kigmsg
+from .helper_funcs.handlers import CommandRouter
 
 from .helper_funcs.admin_status import (
     user_admin_check,
@@ -44,7 +45,9 @@ command_list = [
 
 for handler_list in dispatcher.handlers:
     for handler in dispatcher.handlers[handler_list]:
-        if any(isinstance(handler, cmd_handler) for cmd_handler in CommandHandlerList):
+        if isinstance(handler, CommandRouter):
+            command_list += handler.commands
+        elif any(isinstance(handler, cmd_handler) for cmd_handler in CommandHandlerList):
             command_list += handler.command
 
 @kigmsg((Filters.command & Filters.chat_type.groups), group=BLUE_TEXT_CLEAN_GROUP)
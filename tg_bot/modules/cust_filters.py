@@ -1,4 +1,4 @@
-import re, random
+import random
 from html import escape
 from typing import Optional
 
@@ -301,257 +301,256 @@ def reply_filter(update, context):  # sourcery no-metrics
     if not to_match:
         return
 
-    chat_filters = sql.get_chat_triggers(chat.id)
-    for keyword in chat_filters:
-        pattern = r"( |^|[^\w])" + re.escape(keyword) + r"( |$|[^\w])"
-        if re.search(pattern, to_match, flags=re.IGNORECASE):
-            filt = sql.get_filter(chat.id, keyword)
+    keyword = sql.match_chat_trigger(chat.id, to_match)
+    if not keyword:
+        return
+
+    filt = sql.get_filter(chat.id, keyword)
 
-            if to_match.endswith(("raw", "noformat")) and to_match.lower() == keyword + (" raw" or " noformat"):
-                no_format = True
+    if to_match.endswith(("raw", "noformat")) and to_match.lower() == keyword + (" raw" or " noformat"):
+        no_format = True
+    else:
+        no_format = False
+
+    if filt.reply == "there is should be a new reply":
+        buttons = sql.get_buttons(chat.id, filt.keyword)
+
+        VALID_WELCOME_FORMATTERS = [
+            "first",
+            "last",
+            "fullname",
+            "username",
+            "id",
+            "chatname",
+            "mention",
+            "user",
+            "admin",
+        ]
+        if filt.reply_text:
+
+            if not no_format and "%%%" in filt.reply_text:
+                split = filt.reply_text.split("%%%")
+                if all(split):
+                    text = random.choice(split)
+                else:
+                    text = filt.reply_text
             else:
-                no_format = False
-
-            if filt.reply == "there is should be a new reply":
-                buttons = sql.get_buttons(chat.id, filt.keyword)
-
-                VALID_WELCOME_FORMATTERS = [
-                    "first",
-                    "last",
-                    "fullname",
-                    "username",
-                    "id",
-                    "chatname",
-                    "mention",
-                    "user",
-                    "admin",
-                ]
-                if filt.reply_text:
-
-                    if not no_format and "%%%" in filt.reply_text:
-                        split = filt.reply_text.split("%%%")
-                        if all(split):
-                            text = random.choice(split)
-                        else:
-                            text = filt.reply_text
-                    else:
-                        text = filt.reply_text
-                    if (text.startswith("~!") or text.startswith(" ~!")) and (text.endswith("!~") or text.endswith("!~ ")):
-                        sticker_id = text.replace("~!", "").replace("!~", "").replace(" ", "") # replace space (' ') bcz, got error: Wrong remote file....
-                        try:
-                            context.bot.send_sticker(
-                                chat.id,
-                                sticker_id,
-                                reply_to_message_id=message.message_id,
-                            )
-                            return
-                        except BadRequest as excp:
-                            if (
-                                excp.message
-                                == "Wrong remote file identifier specified: wrong padding in the string"
-                            ):
-                                context.bot.send_message(
-                                    chat.id,
-                                    "Message couldn't be sent, Is the sticker id valid?",
-                                )
-                                return
-                            else:
-                                log.exception("Error in filters: " + excp.message)
-                                return
-
-                    valid_format = escape_invalid_curly_brackets(
-                        markdown_to_html(filt.reply_text), VALID_WELCOME_FORMATTERS
+                text = filt.reply_text
+            if (text.startswith("~!") or text.startswith(" ~!")) and (text.endswith("!~") or text.endswith("!~ ")):
+                sticker_id = text.replace("~!", "").replace("!~", "").replace(" ", "") # replace space (' ') bcz, got error: Wrong remote file....
+                try:
+                    context.bot.send_sticker(
+                        chat.id,
+                        sticker_id,
+                        reply_to_message_id=message.message_id,
                     )
-                    if valid_format:
-                        filtext = valid_format.format(
-                            first=escape(message.from_user.first_name),
-                            last=escape(
-                                message.from_user.last_name
-                                or message.from_user.first_name
-                            ),
-                            fullname=" ".join(
-                                [
-                                    escape(message.from_user.first_name),
-                                    escape(message.from_user.last_name),
-                                ]
-                                if message.from_user.last_name
-                                else [escape(message.from_user.first_name)]
-                            ),
-                            username="@" + escape(message.from_user.username)
-                            if message.from_user.username
-                            else mention_html(
-                                message.from_user.id, message.from_user.first_name
-                            ),
-                            mention=mention_html(
-                                message.from_user.id, message.from_user.first_name
-                            ),
-                            chatname=escape(message.chat.title)
-                            if message.chat.type != "private"
-                            else escape(message.from_user.first_name),
-                            id=message.from_user.id,
-                            user="",
-                            admin="",
+                    return
+                except BadRequest as excp:
+                    if (
+                        excp.message
+                        == "Wrong remote file identifier specified: wrong padding in the string"
+                    ):
+                        context.bot.send_message(
+                            chat.id,
+                            "Message couldn't be sent, Is the sticker id valid?",
                         )
+                        return
                     else:
-                        filtext = ""
-                else:
-                    filtext = ""
-
-                if "{user}" in filt.reply_text:
-                    if user_is_admin(update, user.id):
+                        log.exception("Error in filters: " + excp.message)
                         return
 
-                if "{admin}" in filt.reply_text:
-                    if not user_is_admin(update, user.id):
-                        return
+            valid_format = escape_invalid_curly_brackets(
+                markdown_to_html(filt.reply_text), VALID_WELCOME_FORMATTERS
+            )
+            if valid_format:
+                filtext = valid_format.format(
+                    first=escape(message.from_user.first_name),
+                    last=escape(
+                        message.from_user.last_name
+                        or message.from_user.first_name
+                    ),
+                    fullname=" ".join(
+                        [
+                            escape(message.from_user.first_name),
+                            escape(message.from_user.last_name),
+                        ]
+                        if message.from_user.last_name
+                        else [escape(message.from_user.first_name)]
+                    ),
+                    username="@" + escape(message.from_user.username)
+                    if message.from_user.username
+                    else mention_html(
+                        message.from_user.id, message.from_user.first_name
+                    ),
+                    mention=mention_html(
+                        message.from_user.id, message.from_user.first_name
+                    ),
+                    chatname=escape(message.chat.title)
+                    if message.chat.type != "private"
+                    else escape(message.from_user.first_name),
+                    id=message.from_user.id,
+                    user="",
+                    admin="",
+                )
+            else:
+                filtext = ""
+        else:
+            filtext = ""
 
-                keyb = []
-                if no_format:
-                    parse_mode = None
-                    filtext += revert_buttons(buttons)
-                    keyboard = InlineKeyboardMarkup(keyb)
-                else:
-                    parse_mode = ParseMode.HTML
-                    keyb = build_keyboard_parser(context.bot, chat.id, buttons)
-                    keyboard = InlineKeyboardMarkup(keyb)
+        if "{user}" in filt.reply_text:
+            if user_is_admin(update, user.id):
+                return
+
+        if "{admin}" in filt.reply_text:
+            if not user_is_admin(update, user.id):
+                return
 
-                if filt.file_type in (sql.Types.BUTTON_TEXT, sql.Types.TEXT):
+        keyb = []
+        if no_format:
+            parse_mode = None
+            filtext += revert_buttons(buttons)
+            keyboard = InlineKeyboardMarkup(keyb)
+        else:
+            parse_mode = ParseMode.HTML
+            keyb = build_keyboard_parser(context.bot, chat.id, buttons)
+            keyboard = InlineKeyboardMarkup(keyb)
+
+        if filt.file_type in (sql.Types.BUTTON_TEXT, sql.Types.TEXT):
+            try:
+                context.bot.send_message(
+                    chat.id,
+                    filtext,
+                    reply_to_message_id=message.message_id,
+                    parse_mode=parse_mode,
+                    disable_web_page_preview=True,
+                    reply_markup=keyboard,
+                    allow_sending_without_reply=True
+                )
+            except BadRequest as excp:
+                error_catch = get_exception(excp, filt, chat)
+                if error_catch == "noreply":
                     try:
                         context.bot.send_message(
                             chat.id,
                             filtext,
-                            reply_to_message_id=message.message_id,
-                            parse_mode=parse_mode,
+                            parse_mode=ParseMode.HTML,
                             disable_web_page_preview=True,
                             reply_markup=keyboard,
                             allow_sending_without_reply=True
                         )
                     except BadRequest as excp:
-                        error_catch = get_exception(excp, filt, chat)
-                        if error_catch == "noreply":
-                            try:
-                                context.bot.send_message(
-                                    chat.id,
-                                    filtext,
-                                    parse_mode=ParseMode.HTML,
-                                    disable_web_page_preview=True,
-                                    reply_markup=keyboard,
-                                    allow_sending_without_reply=True
-                                )
-                            except BadRequest as excp:
-                                log.exception("Error in filters: " + excp.message)
-                                send_message(
-                                    update.effective_message,
-                                    get_exception(excp, filt, chat),
-                                )
-                        else:
-                            try:
-                                send_message(
-                                    update.effective_message,
-                                    get_exception(excp, filt, chat),
-                                )
-                            except BadRequest as excp:
-                                log.exception(
-                                    "Failed to send message: " + excp.message
-                                )
-                elif ENUM_FUNC_MAP[filt.file_type] == dispatcher.bot.send_sticker:
-                    ENUM_FUNC_MAP[filt.file_type](
-                        chat.id,
-                        filt.file_id,
-                        reply_to_message_id=message.message_id,
-                        reply_markup=keyboard,
-                        allow_sending_without_reply=True
-                    )
-                else:
-                    ENUM_FUNC_MAP[filt.file_type](
-                        chat.id,
-                        filt.file_id,
-                        caption=filtext,
-                        reply_to_message_id=message.message_id,
-                        parse_mode=parse_mode,
-                        reply_markup=keyboard,
-                        allow_sending_without_reply=True
-                    )
-            elif filt.is_sticker:
-                message.reply_sticker(filt.reply)
-            elif filt.is_document:
-                message.reply_document(filt.reply)
-            elif filt.is_image:
-                message.reply_photo(filt.reply)
-            elif filt.is_audio:
-                message.reply_audio(filt.reply)
-            elif filt.is_voice:
-                message.reply_voice(filt.reply)
-            elif filt.is_video:
-                message.reply_video(filt.reply)
-            elif filt.has_markdown:
-
-                keyb = []
-                buttons = sql.get_buttons(chat.id, filt.keyword)
-                if no_format:
-                    parse_mode = None
-                    filt.reply += revert_buttons(buttons)
-                    keyboard = InlineKeyboardMarkup(keyb)
+                        log.exception("Error in filters: " + excp.message)
+                        send_message(
+                            update.effective_message,
+                            get_exception(excp, filt, chat),
+                        )
                 else:
-                    parse_mode = ParseMode.MARKDOWN
-                    keyb = build_keyboard_parser(context.bot, chat.id, buttons)
-                    keyboard = InlineKeyboardMarkup(keyb)
+                    try:
+                        send_message(
+                            update.effective_message,
+                            get_exception(excp, filt, chat),
+                        )
+                    except BadRequest as excp:
+                        log.exception(
+                            "Failed to send message: " + excp.message
+                        )
+        elif ENUM_FUNC_MAP[filt.file_type] == dispatcher.bot.send_sticker:
+            ENUM_FUNC_MAP[filt.file_type](
+                chat.id,
+                filt.file_id,
+                reply_to_message_id=message.message_id,
+                reply_markup=keyboard,
+                allow_sending_without_reply=True
+            )
+        else:
+            ENUM_FUNC_MAP[filt.file_type](
+                chat.id,
+                filt.file_id,
+                caption=filtext,
+                reply_to_message_id=message.message_id,
+                parse_mode=parse_mode,
+                reply_markup=keyboard,
+                allow_sending_without_reply=True
+            )
+    elif filt.is_sticker:
+        message.reply_sticker(filt.reply)
+    elif filt.is_document:
+        message.reply_document(filt.reply)
+    elif filt.is_image:
+        message.reply_photo(filt.reply)
+    elif filt.is_audio:
+        message.reply_audio(filt.reply)
+    elif filt.is_voice:
+        message.reply_voice(filt.reply)
+    elif filt.is_video:
+        message.reply_video(filt.reply)
+    elif filt.has_markdown:
+
+        keyb = []
+        buttons = sql.get_buttons(chat.id, filt.keyword)
+        if no_format:
+            parse_mode = None
+            filt.reply += revert_buttons(buttons)
+            keyboard = InlineKeyboardMarkup(keyb)
+        else:
+            parse_mode = ParseMode.MARKDOWN
+            keyb = build_keyboard_parser(context.bot, chat.id, buttons)
+            keyboard = InlineKeyboardMarkup(keyb)
 
 
+        try:
+            send_message(
+                update.effective_message,
+                filt.reply,
+                parse_mode=parse_mode,
+                disable_web_page_preview=True,
+                reply_markup=keyboard,
+            )
+        except BadRequest as excp:
+            if excp.message == "Unsupported url protocol":
                 try:
                     send_message(
                         update.effective_message,
+                        "You seem to be trying to use an unsupported url protocol. "
+                        "Telegram doesn't support buttons for some protocols, such as tg://. Please try "
+                        "again...",
+                    )
+                except BadRequest as excp:
+                    log.exception("Error in filters: " + excp.message)
+            elif excp.message == "Reply message not found":
+                try:
+                    context.bot.send_message(
+                        chat.id,
                         filt.reply,
                         parse_mode=parse_mode,
                         disable_web_page_preview=True,
                         reply_markup=keyboard,
                     )
                 except BadRequest as excp:
-                    if excp.message == "Unsupported url protocol":
-                        try:
-                            send_message(
-                                update.effective_message,
-                                "You seem to be trying to use an unsupported url protocol. "
-                                "Telegram doesn't support buttons for some protocols, such as tg://. Please try "
-                                "again...",
-                            )
-                        except BadRequest as excp:
-                            log.exception("Error in filters: " + excp.message)
-                    elif excp.message == "Reply message not found":
-                        try:
-                            context.bot.send_message(
-                                chat.id,
-                                filt.reply,
-                                parse_mode=parse_mode,
-                                disable_web_page_preview=True,
-                                reply_markup=keyboard,
-                            )
-                        except BadRequest as excp:
-                            log.exception("Error in filters: " + excp.message)
-                    else:
-                        try:
-                            send_message(
-                                update.effective_message,
-                                "This message couldn't be sent as it's incorrectly formatted.",
-                            )
-                        except BadRequest as excp:
-                            log.exception("Error in filters: " + excp.message)
-                        log.warning(
-                            "Message %s could not be parsed", str(filt.reply)
-                        )
-                        log.exception(
-                            "Could not parse filter %s in chat %s",
-                            str(filt.keyword),
-                            str(chat.id),
-                        )
-
+                    log.exception("Error in filters: " + excp.message)
             else:
-                    # LEGACY - all new filters will have has_markdown set to True.
                 try:
-                    send_message(update.effective_message, filt.reply)
+                    send_message(
+                        update.effective_message,
+                        "This message couldn't be sent as it's incorrectly formatted.",
+                    )
                 except BadRequest as excp:
                     log.exception("Error in filters: " + excp.message)
-            break
+                log.warning(
+                    "Message %s could not be parsed", str(filt.reply)
+                )
+                log.exception(
+                    "Could not parse filter %s in chat %s",
+                    str(filt.keyword),
+                    str(chat.id),
+                )
+
+    else:
+            # LEGACY - all new filters will have has_markdown set to True.
+        try:
+            send_message(update.effective_message, filt.reply)
+        except BadRequest as excp:
+            log.exception("Error in filters: " + excp.message)
 
 
 @kigcmd(command=["removeallfilters", "stopall"], filters=Filters.chat_type.groups)
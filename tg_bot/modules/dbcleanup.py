@@ -2,7 +2,7 @@ from time import sleep
 
 import tg_bot.modules.sql.antispam_sql as gban_sql
 import tg_bot.modules.sql.users_sql as user_sql
-from tg_bot import DEV_USERS, OWNER_ID
+from tg_bot import API_CACHE, DEV_USERS, OWNER_ID
 from .helper_funcs.chat_status import dev_plus
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
 from telegram.error import BadRequest, Unauthorized
@@ -33,12 +33,19 @@ def get_invalid_chats(update: Update, context: CallbackContext, remove: bool = F
             progress += 5
 
         cid = chat.chat_id
+        if user_sql.is_dead(cid):
+            # a broadcast already found the bot can't reach it
+            kicked_chats += 1
+            chat_list.append(cid)
+            continue
         sleep(0.1)
         try:
-            bot.get_chat(cid, timeout=60)
-        except (BadRequest, Unauthorized):
+            with API_CACHE.fresh():
+                bot.get_chat(cid, timeout=60)
+        except (BadRequest, Unauthorized) as excp:
             kicked_chats += 1
             chat_list.append(cid)
+            user_sql.mark_dead({cid: excp.message})
         except:
             pass
 
@@ -65,7 +72,8 @@ def get_invalid_gban(update: Update, context: CallbackContext, remove: bool = Fa
         user_id = user["user_id"]
         sleep(0.1)
         try:
-            bot.get_chat(user_id)
+            with API_CACHE.fresh():
+                bot.get_chat(user_id)
         except BadRequest:
             ungbanned_users += 1
             ungban_list.append(user_id)
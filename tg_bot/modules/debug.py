@@ -4,8 +4,11 @@ import os
 from telegram import Update
 from telegram.ext import CallbackContext
 
-from .. import API_HASH, APP_ID, BACKUP_PASS, CASH_API_KEY, CF_API_KEY, DB_URI, LASTFM_API_KEY, TIME_API_KEY, TOKEN, dispatcher, spamwatch_api
+from .. import API_HASH, APP_ID, BACKUP_PASS, CASH_API_KEY, CF_API_KEY, DB_URI, LASTFM_API_KEY, TIME_API_KEY, TOKEN, API_CACHE, OUTBOUND, dispatcher, spamwatch_api
+from .helper_funcs.admin_status import A_CACHE
+from .helper_funcs.chat_config import CHAT_CONFIGS
 from .helper_funcs.chat_status import dev_plus
+from .helper_funcs.verdict_cache import SIBYL_CACHE, SW_CACHE
 from .helper_funcs.decorators import kigcmd, register
 
 DEBUG_MODE = False
@@ -149,4 +152,47 @@ def updates_log(update: Update, context: CallbackContext):
         context.bot.send_document(document=f, filename=f.name, chat_id=user.id)
 
 
+@kigcmd(command='cachestats')
+@dev_plus
+def cache_stats(update: Update, _: CallbackContext):
+    text = "<b>Chat config</b> ({} chats cached)\n".format(len(CHAT_CONFIGS))
+    for family, (hits, misses) in sorted(CHAT_CONFIGS.stats().items()):
+        total = hits + misses
+        ratio = hits / total * 100 if total else 0
+        text += "• <code>{}</code>: {} hits, {} misses ({:.1f}%)\n".format(family, hits, misses, ratio)
+    admins = A_CACHE.stats()
+    text += (
+        "\n<b>Admin cache</b> ({chats} chats cached)\n"
+        "• {hits} hits, {misses} misses, {coalesced} coalesced\n"
+        "• {fetches} fetches, avg {avg_fetch_ms:.0f}ms, max {max_fetch_ms:.0f}ms\n"
+    ).format(**admins)
+    text += "\n<b>Bot API reads</b> ({} invalidations)\n".format(API_CACHE.invalidations)
+    for endpoint, stats in API_CACHE.stats().items():
+        text += (
+            "• <code>{endpoint}</code>: {cached} cached, {hits} hits, {misses} misses ({hit_rate:.1f}%), "
+            "{coalesced} coalesced, avg fetch {avg_fetch_ms:.0f}ms\n"
+        ).format(endpoint=endpoint, **stats)
+    for verdicts in (SW_CACHE, SIBYL_CACHE):
+        text += (
+            "\n<b>{name}</b> ({flagged} flagged, {clean} clean cached)\n"
+            "• {hits} hits, {misses} misses ({hit_rate:.1f}%)\n"
+            "• {timeouts} timeouts, {errors} errors, {skipped} skipped\n"
+            "• {fetches} lookups, avg {avg_upstream_ms:.0f}ms, max {max_upstream_ms:.0f}ms\n"
+        ).format(name=verdicts.name, **verdicts.stats())
+    update.effective_message.reply_text(text, parse_mode="html")
+
+
+@kigcmd(command='outbound')
+@dev_plus
+def outbound_stats(update: Update, _: CallbackContext):
+    text = "<b>Outbound scheduler</b>\n"
+    for name, stats in OUTBOUND.stats().items():
+        text += (
+            "• <code>{name}</code>: {calls} calls, {queued} queued, "
+            "avg wait {avg_wait_ms:.0f}ms, max {max_wait_ms:.0f}ms\n"
+        ).format(name=name, **stats)
+    text += "• {} flood waits, {} sends past a swamped chat's limit".format(OUTBOUND.retry_afters, OUTBOUND.gave_up)
+    update.effective_message.reply_text(text, parse_mode="html")
+
+
 __mod_name__ = "Debug"
@@ -7,7 +7,7 @@ from telegram.utils.helpers import escape_markdown
 
 from tg_bot import dispatcher, spamcheck
  
-from .helper_funcs.handlers import CMD_STARTERS, SpamChecker
+from .helper_funcs.handlers import CMD_STARTERS, SpamChecker, parse_command
 from .helper_funcs.misc import is_module_loaded
 from .helper_funcs.alternate import send_message, typing_action
 from .language import gs
@@ -50,49 +50,28 @@ if is_module_loaded(FILENAME):
         def check_update(self, update):
             if not isinstance(update, Update) or not update.effective_message:
                 return
-            message = update.effective_message
-
-            try:
-                user_id = update.effective_user.id
-            except:
-                user_id = None
-
-            if message.text and len(message.text) > 1:
-                fst_word = message.text.split(None, 1)[0]
-                if len(fst_word) > 1 and any(
-                    fst_word.startswith(start) for start in CMD_STARTERS
-                ):
-                    args = message.text.split()[1:]
-                    command = fst_word[1:].split("@")
-                    command.append(message.bot.username)
-
-                    if not (
-                        command[0].lower() in self.command
-                        and command[1].lower() == message.bot.username.lower()
-                    ):
-                        return None
+            parsed = parse_command(update)
 
-                    if SpamChecker.check_user(user_id):
+            if parsed is None or not (parsed.command in self.command and parsed.for_us):
+                return None
+
+            if parsed.ignored:
+                return None
+
+            filter_result = self.filters(update)
+            if filter_result:
+                chat = update.effective_chat
+                user = update.effective_user
+                # disabled, admincmd, user admin
+                if sql.is_command_disabled(chat.id, parsed.command):
+                    # check if command was disabled
+                    is_disabled = parsed.raw_command in ADMIN_CMDS and user_is_admin(update, user.id)
+                    if not is_disabled:
                         return None
 
-                    filter_result = self.filters(update)
-                    if filter_result:
-                        chat = update.effective_chat
-                        user = update.effective_user
-                        # disabled, admincmd, user admin
-                        if sql.is_command_disabled(chat.id, command[0].lower()):
-                            # check if command was disabled
-                            is_disabled = command[
-                                0
-                            ] in ADMIN_CMDS and user_is_admin(update, user.id)
-                            if not is_disabled:
-                                return None
-                            else:
-                                return args, filter_result
-
-                        return args, filter_result
-                    else:
-                        return False
+                return list(parsed.args), filter_result
+            else:
+                return False
 
     class DisableAbleMessageHandler(MessageHandler):
         def __init__(self, pattern, callback, run_async=True, friendly="", **kwargs):
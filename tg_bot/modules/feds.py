@@ -3,9 +3,10 @@ import re
 import json
 import time
 import csv
-import os
 import ast
-from io import BytesIO
+from gzip import GzipFile
+from io import BytesIO, StringIO, TextIOWrapper
+from tempfile import SpooledTemporaryFile, TemporaryFile
 from typing import Optional
 from telegram.ext import CallbackContext
 from telegram.error import BadRequest, TelegramError, Unauthorized
@@ -23,6 +24,9 @@ from telegram.utils.helpers import mention_html, mention_markdown
 
 from .connection import AdminPerms
 from .helper_funcs.admin_status import user_is_admin, bot_is_admin
+from .helper_funcs.admin_status_helpers import BOT_ADMIN_CACHE as B_CACHE
+from .helper_funcs.fanout import FanOut, ABORT, CANCELLED, FAILED
+from .helper_funcs.reputation import REPUTATION, FBANNED
 
 import tg_bot.modules.sql.feds_sql as sql
 from tg_bot import (
@@ -34,8 +38,9 @@ from tg_bot import (
     DEV_USERS,
     log,
     spamcheck,
+    j,
+    FBAN_CONCURRENCY,
 )
-from .sql.users_sql import get_user_com_chats
 
 from .helper_funcs.extraction import (
     extract_user,
@@ -63,6 +68,11 @@ from .helper_funcs.decorators import kigcmd, kigcallback
 
 # TODO: Fix Loads of code duplication
 
+# rows written per INSERT by /importfbans
+FBAN_IMPORT_BATCH = 1000
+# bytes of a /fbanlist export kept in memory before it's moved to a temporary file
+FBAN_EXPORT_SPOOL_SIZE = 1024 * 1024
+
 FBAN_ERRORS = {
     "User is an administrator of the chat",
     "Chat not found",
@@ -364,9 +374,7 @@ def user_join_fed(update, context):
             log.warning("error")
         getuser = sql.search_user_in_fed(fed_id, user_id)
         fed_id = sql.get_fed_id(chat.id)
-        info = sql.get_fed_info(fed_id)
-        get_owner = ast.literal_eval(info["fusers"])["owner"]
-        get_owner = context.bot.get_chat(get_owner).id
+        get_owner = sql.get_fed_owner(fed_id)
         if user_id == get_owner:
             update.effective_message.reply_text(
                 "You do know that the user is the federation owner, right? RIGHT?"
@@ -673,7 +681,6 @@ def fed_ban(update, context):  # sourcery no-metrics
             message.reply_text("Failed to ban from the federation!")
             return
 
-        fed_chats = sql.all_fed_chats(fed_id)
         # Will send to current chat
         context.bot.send_message(
             chat.id,
@@ -736,82 +743,11 @@ def fed_ban(update, context):  # sourcery no-metrics
                     parse_mode="HTML",
                     disable_web_page_preview = True
                 )
-        chats = get_user_com_chats(user_id)
-        for fedschat in (fed_chats and chats):
-            try:
-                # Do not spam all fed chats
-                """
-				context.bot.send_message(chat, "<b>FedBan reason updated</b>" \
-							 "\n<b>Federation:</b> {}" \
-							 "\n<b>Federation Admin:</b> {}" \
-							 "\n<b>User:</b> {}" \
-							 "\n<b>User ID:</b> <code>{}</code>" \
-							 "\n<b>Reason:</b> {}".format(fed_name, mention_html(user.id, user.first_name), user_target, fban_user_id, reason), parse_mode="HTML")
-				"""
-                context.bot.ban_chat_member(fedschat, fban_user_id)
-            except BadRequest as excp:
-                if excp.message in FBAN_ERRORS:
-                    try:
-                        dispatcher.bot.getChat(fedschat)
-                    except Unauthorized:
-                        sql.chat_leave_fed(fedschat)
-                        log.info(
-                            "Chat {} has leave fed {} because I was kicked".format(
-                                fedschat, info["fname"]
-                            )
-                        )
-                        continue
-                elif excp.message == "User_id_invalid":
-                    break
-                else:
-                    log.warning(
-                        "Could not fban on {} because: {}".format(chat, excp.message)
-                    )
-            except TelegramError:
-                pass
-        # Also do not spam all fed admins
-
-        # send_to_list(bot, FEDADMIN,
-        # "<b>FedBan reason updated</b>" \
-        # "\n<b>Federation:</b> {}" \
-        # "\n<b>Federation Admin:</b> {}" \
-        # "\n<b>User:</b> {}" \
-        # "\n<b>User ID:</b> <code>{}</code>" \
-        # "\n<b>Reason:</b> {}".format(fed_name, mention_html(user.id, user.first_name), user_target, fban_user_id, reason),
-        # html=True)
-
-        # Fban for mention_htmlfed subscriber
-        subscriber = list(sql.get_subscriber(fed_id))
-        if len(subscriber) != 0:
-            chats = get_user_com_chats(user_id)
-            for fedsid in (subscriber and chats):
-                all_fedschat = sql.all_fed_chats(fedsid)
-                for fedschat in all_fedschat:
-                    try:
-                        context.bot.ban_chat_member(fedschat, fban_user_id)
-                    except BadRequest as excp:
-                        if excp.message in FBAN_ERRORS:
-                            try:
-                                dispatcher.bot.getChat(fedschat)
-                            except Unauthorized:
-                                targetfed_id = sql.get_fed_id(fedschat)
-                                sql.unsubs_fed(fed_id, targetfed_id)
-                                log.info(
-                                    "Chat {} has unsub fed {} because I was kicked".format(
-                                        fedschat, info["fname"]
-                                    )
-                                )
-                                continue
-                        elif excp.message == "User_id_invalid":
-                            break
-                        else:
-                            log.warning(
-                                "Unable to fban on {} because: {}".format(
-                                    fedschat, excp.message
-                                )
-                            )
-                    except TelegramError:
-                        pass
+        strt_msg = message.reply_text(
+            "Updating the federation ban of {} in the Federation <b>{}</b>.".format(user_target, fed_name),
+            parse_mode=ParseMode.HTML,
+        )
+        start_fban_propagation(strt_msg, fed_id, fed_name, fban_user_id, user_target)
         # send_message(update.effective_message, "Fedban Reason has been updated.")
         return
 
@@ -838,7 +774,6 @@ def fed_ban(update, context):  # sourcery no-metrics
         message.reply_text("Failed to ban from the federation!")
         return
 
-    fed_chats = sql.all_fed_chats(fed_id)
     # Will send to current chat
     context.bot.send_message(
         chat.id,
@@ -901,81 +836,109 @@ def fed_ban(update, context):  # sourcery no-metrics
                 parse_mode="HTML",
                 disable_web_page_preview = True
             )
-    chats_in_fed = 0
-    chats = get_user_com_chats(user_id)
-    for fedschat in (fed_chats and chats):
-        chats_in_fed += 1
+    start_fban_propagation(strt_msg, fed_id, fed_name, fban_user_id, user_target)
+
+
+def bot_cant_ban(chat_id) -> bool:
+    # only what's already cached counts, asking the api about every chat of the fed is what this avoids
+    bot_member = B_CACHE.get(int(chat_id))
+    return bot_member is not None and not getattr(bot_member, "can_restrict_members", False)
+
+
+def start_fban_propagation(progress: Message, fed_id, fed_name, user_id, user_target):
+    """
+    Ban the user in every chat the fed reaches from a background job, progress is edited as it goes
+    """
+    j.run_once(
+        propagate_fban,
+        0,
+        context={
+            "fed_id": fed_id,
+            "fed_name": fed_name,
+            "user_id": user_id,
+            "user_target": user_target,
+            "progress": progress,
+        },
+        name="fban {} in {}".format(user_id, fed_id),
+    )
+
+
+def propagate_fban(context: CallbackContext):
+    job = context.job.context
+    fed_id = job["fed_id"]
+    user_id = job["user_id"]
+    targets = sql.get_fed_reach(fed_id)
+
+    def ban(fedschat) -> str:
+        if bot_cant_ban(fedschat):
+            return "skipped"
         try:
-            # Do not spamming all fed chats
-            """
-			context.bot.send_message(chat, "<b>FedBan reason updated</b>" \
-							"\n<b>Federation:</b> {}" \
-							"\n<b>Federation Admin:</b> {}" \
-							"\n<b>User:</b> {}" \
-							"\n<b>User ID:</b> <code>{}</code>" \
-							"\n<b>Reason:</b> {}".format(fed_name, mention_html(user.id, user.first_name), user_target, fban_user_id, reason), parse_mode="HTML")
-			"""
-            context.bot.ban_chat_member(fedschat, fban_user_id)
+            context.bot.ban_chat_member(fedschat, user_id)
+            return "banned"
         except BadRequest as excp:
-            if excp.message in FBAN_ERRORS:
+            if excp.message == "User_id_invalid":
+                return ABORT
+            if excp.message not in FBAN_ERRORS:
+                log.warning("Could not fban on {} because: {}".format(fedschat, excp.message))
+                return FAILED
+            try:
+                context.bot.getChat(fedschat)
+            except Unauthorized:
                 pass
-            elif excp.message == "User_id_invalid":
-                break
             else:
-                log.warning(
-                    "Could not fban on {} because: {}".format(chat, excp.message)
-                )
-        except TelegramError:
+                return FAILED
+        except Unauthorized:
             pass
+        # the bot was kicked from the chat
+        sql.chat_leave_fed(fedschat)
+        log.info("Chat {} has leave fed {} because I was kicked".format(fedschat, targets[fedschat]))
+        return "left"
+
+    def report(fanout: FanOut):
+        job["progress"].edit_text(
+            "Federation ban of {} in progress: {}/{} chats done.".format(
+                job["user_target"], fanout.done, fanout.total
+            ),
+            parse_mode=ParseMode.HTML,
+        )
 
-        # Also do not spamming all fed admins
-        """
-		send_to_list(bot, FEDADMIN,
-				 "<b>FedBan reason updated</b>" \
-							 "\n<b>Federation:</b> {}" \
-							 "\n<b>Federation Admin:</b> {}" \
-							 "\n<b>User:</b> {}" \
-							 "\n<b>User ID:</b> <code>{}</code>" \
-							 "\n<b>Reason:</b> {}".format(fed_name, mention_html(user.id, user.first_name), user_target, fban_user_id, reason),
-							html=True)
-		"""
-
-        # Fban for fed subscriber
-        subscriber = list(sql.get_subscriber(fed_id))
-        if len(subscriber) != 0:
-            chats = get_user_com_chats(user_id)
-            for fedsid in (subscriber and chats):
-                all_fedschat = sql.all_fed_chats(fedsid)
-                for fedschat in all_fedschat:
-                    try:
-                        context.bot.ban_chat_member(fedschat, fban_user_id)
-                    except BadRequest as excp:
-                        if excp.message in FBAN_ERRORS:
-                            try:
-                                dispatcher.bot.getChat(fedschat)
-                            except Unauthorized:
-                                targetfed_id = sql.get_fed_id(fedschat)
-                                sql.unsubs_fed(fed_id, targetfed_id)
-                                log.info(
-                                    "Chat {} has unsub fed {} because I was kicked".format(
-                                        fedschat, info["fname"]
-                                    )
-                                )
-                                continue
-                        elif excp.message == "User_id_invalid":
-                            break
-                        else:
-                            log.warning(
-                                "Unable to fban on {} because: {}".format(
-                                    fedschat, excp.message
-                                )
-                            )
-                    except TelegramError:
-                        pass
-    if chats_in_fed == 0:
-        strt_msg.edit_text("Fedban affected 0 chats.")
-    elif chats_in_fed > 0:
-        strt_msg.edit_text("Fedban affected {} chats. ".format(chats_in_fed))
+    fanout = FanOut(ban, concurrency=FBAN_CONCURRENCY, on_progress=report)
+    results = fanout.run(targets)
+
+    try:
+        job["progress"].edit_text("Fedban affected {} chats.".format(results["banned"]))
+    except TelegramError:
+        pass
+
+    get_fedlog = sql.get_fed_log(fed_id)
+    if get_fedlog:
+        try:
+            context.bot.send_message(
+                get_fedlog,
+                "<b>FedBan propagation finished</b>"
+                "\n<b>Federation:</b> {}"
+                "\n<b>User:</b> {}"
+                "\n<b>User ID:</b> <code>{}</code>"
+                "\n<b>Banned in:</b> {}/{} chats"
+                "\n<b>Skipped, no ban rights:</b> {}"
+                "\n<b>Bot no longer in chat:</b> {}"
+                "\n<b>Failed:</b> {}"
+                "\n<b>Took:</b> {:.1f}s".format(
+                    job["fed_name"],
+                    job["user_target"],
+                    user_id,
+                    results["banned"],
+                    fanout.total,
+                    results["skipped"],
+                    results["left"],
+                    results[FAILED] + results[ABORT] + results[CANCELLED],
+                    fanout.elapsed,
+                ),
+                parse_mode="HTML",
+                disable_web_page_preview=True,
+            )
+        except TelegramError:
+            pass
 
 
 @typing_action
@@ -1052,7 +1015,6 @@ def unfban(update, context):
         "I'll give {} another chance in this federation".format(fban_user_name)
     )
 
-    chat_list = sql.all_fed_chats(fed_id)
     # Will send to current chat
     context.bot.send_message(
         chat.id,
@@ -1110,7 +1072,8 @@ def unfban(update, context):
                 disable_web_page_preview = True
             )
     unfbanned_in_chats = 0
-    for fedchats in chat_list:
+    # the fed's own chats and those of every fed subscribed to it, directly or not
+    for fedchats in sql.get_fed_reach(fed_id):
         unfbanned_in_chats += 1
         try:
             member = context.bot.get_chat_member(fedchats, user_id)
@@ -1147,38 +1110,6 @@ def unfban(update, context):
     except Exception:
         pass
 
-    # UnFban for fed subscriber
-    subscriber = list(sql.get_subscriber(fed_id))
-    if len(subscriber) != 0:
-        for fedsid in subscriber:
-            all_fedschat = sql.all_fed_chats(fedsid)
-            for fedschat in all_fedschat:
-                try:
-                    context.bot.unban_chat_member(fedchats, user_id)
-                except BadRequest as excp:
-                    if excp.message in FBAN_ERRORS:
-                        try:
-                            dispatcher.bot.getChat(fedschat)
-                        except Unauthorized:
-                            targetfed_id = sql.get_fed_id(fedschat)
-                            sql.unsubs_fed(fed_id, targetfed_id)
-                            log.info(
-                                "Chat {} has unsub fed {} because I was kicked".format(
-                                    fedschat, info["fname"]
-                                )
-                            )
-                            continue
-                    elif excp.message == "User_id_invalid":
-                        break
-                    else:
-                        log.warning(
-                            "Unable to fban on {} because: {}".format(
-                                fedschat, excp.message
-                            )
-                        )
-                except TelegramError:
-                    pass
-
     if unfbanned_in_chats == 0:
         send_message(
             update.effective_message,
@@ -1392,94 +1323,53 @@ def fed_ban_list(update, context):  # sourcery no-metrics
         )
         return
 
-    if args:
-        if args[0] == "json":
-            jam = time.time()
-            new_jam = jam + 1800
-            cek = get_chat(chat.id, chat_data)
-            if cek.get("status"):
-                if jam <= int(cek.get("value")):
-                    waktu = time.strftime(
-                        "%H:%M:%S %d/%m/%Y", time.localtime(cek.get("value"))
-                    )
-                    update.effective_message.reply_text(
-                        "You can backup your data once every 30 minutes!\nYou can back up data again at `{}`".format(
-                            waktu
-                        ),
-                        parse_mode=ParseMode.MARKDOWN,
-                    )
-                    return
-                else:
-                    if user.id not in SUDO_USERS:
-                        put_chat(chat.id, new_jam, chat_data)
-            elif user.id not in SUDO_USERS:
-                put_chat(chat.id, new_jam, chat_data)
-            backups = ""
-            for users in getfban:
-                getuserinfo = sql.get_all_fban_users_target(fed_id, users)
-                json_parser = {
-                    "user_id": users,
-                    "first_name": getuserinfo["first_name"],
-                    "last_name": getuserinfo["last_name"],
-                    "user_name": getuserinfo["user_name"],
-                    "reason": getuserinfo["reason"],
-                }
-                backups += json.dumps(json_parser)
-                backups += "\n"
-            with BytesIO(str.encode(backups)) as output:
-                output.name = "{}_fbanned_users.json".format(dispatcher.bot.username)
-                update.effective_message.reply_document(
-                    document=output,
-                    filename="{}_fbanned_users.json".format(dispatcher.bot.username),
-                    caption="Total {} User are blocked by the Federation {}.".format(
-                        len(getfban), info["fname"]
-                    ),
-                )
-            return
-        elif args[0] == "csv":
-            jam = time.time()
-            new_jam = jam + 1800
-            cek = get_chat(chat.id, chat_data)
-            if cek.get("status"):
-                if jam <= int(cek.get("value")):
-                    waktu = time.strftime(
-                        "%H:%M:%S %d/%m/%Y", time.localtime(cek.get("value"))
-                    )
-                    update.effective_message.reply_text(
-                        "You can back up data once every 30 minutes!\nYou can back up data again at `{}`".format(
-                            waktu
-                        ),
-                        parse_mode=ParseMode.MARKDOWN,
-                    )
-                    return
-                else:
-                    if user.id not in SUDO_USERS:
-                        put_chat(chat.id, new_jam, chat_data)
-            elif user.id not in SUDO_USERS:
-                put_chat(chat.id, new_jam, chat_data)
-            backups = "id,firstname,lastname,username,reason\n"
-            for users in getfban:
-                getuserinfo = sql.get_all_fban_users_target(fed_id, users)
-                backups += (
-                    "{user_id},{first_name},{last_name},{user_name},{reason}".format(
-                        user_id=users,
-                        first_name=getuserinfo["first_name"],
-                        last_name=getuserinfo["last_name"],
-                        user_name=getuserinfo["user_name"],
-                        reason=getuserinfo["reason"],
-                    )
+    if args and args[0] in ("json", "csv"):
+        fileformat = args[0]
+        compress = len(args) > 1 and args[1] in ("gz", "gzip")
+        jam = time.time()
+        new_jam = jam + 1800
+        cek = get_chat(chat.id, chat_data)
+        if cek.get("status"):
+            if jam <= int(cek.get("value")):
+                waktu = time.strftime(
+                    "%H:%M:%S %d/%m/%Y", time.localtime(cek.get("value"))
                 )
-                backups += "\n"
-            with BytesIO(str.encode(backups)) as output:
-                output.name = "{}_fbanned_users.csv".format(dispatcher.bot.username)
-                update.effective_message.reply_document(
-                    document=output,
-                    filename="{}_fbanned_users.csv".format(dispatcher.bot.username),
-                    caption="Total {} User are blocked by Federation {}.".format(
-                        len(getfban), info["fname"]
+                update.effective_message.reply_text(
+                    "You can backup your data once every 30 minutes!\nYou can back up data again at `{}`".format(
+                        waktu
                     ),
+                    parse_mode=ParseMode.MARKDOWN,
                 )
-            return
+                return
+            else:
+                if user.id not in SUDO_USERS:
+                    put_chat(chat.id, new_jam, chat_data)
+        elif user.id not in SUDO_USERS:
+            put_chat(chat.id, new_jam, chat_data)
+        filename = "{}_fbanned_users.{}".format(dispatcher.bot.username, fileformat)
+        if compress:
+            filename += ".gz"
+        # spills over to disk past FBAN_EXPORT_SPOOL_SIZE, so a huge ban list never sits in memory as one string
+        with SpooledTemporaryFile(max_size=FBAN_EXPORT_SPOOL_SIZE) as output:
+            total = 0
+            if compress:
+                with GzipFile(fileobj=output, mode="wb") as gz:
+                    for line in iter_fban_export(fed_id, fileformat):
+                        gz.write(line)
+                        total += 1
+            else:
+                for line in iter_fban_export(fed_id, fileformat):
+                    output.write(line)
+                    total += 1
+            output.seek(0)
+            update.effective_message.reply_document(
+                document=output,
+                filename=filename,
+                caption="Total {} User are blocked by the Federation {}.".format(
+                    total - (fileformat == "csv"), info["fname"]
+                ),
+            )
+        return
 
     text = "<b>{} users have been banned from the federation {}:</b>\n".format(
         len(getfban), info["fname"]
@@ -1701,164 +1591,143 @@ def fed_import_bans(update, context):  # sourcery no-metrics
                 "Try downloading and re-uploading the file, this one seems broken!"
             )
             return
-        fileformat = msg.reply_to_message.document.file_name.split(".")[-1]
-        if fileformat == "json":
-            multi_fed_id = []
-            multi_import_userid = []
-            multi_import_firstname = []
-            multi_import_lastname = []
-            multi_import_username = []
-            multi_import_reason = []
-            with BytesIO() as file:
-                file_info.download(out=file)
-                file.seek(0)
-                reading = file.read().decode("UTF-8")
-                splitting = reading.split("\n")
-                for x in splitting:
-                    if x == "":
-                        continue
-                    try:
-                        data = json.loads(x)
-                    except json.decoder.JSONDecodeError:
-                        failed += 1
-                        continue
-                    try:
-                        import_userid = int(data["user_id"])  # Make sure it int
-                        import_firstname = str(data["first_name"])
-                        import_lastname = str(data["last_name"])
-                        import_username = str(data["user_name"])
-                        import_reason = str(data["reason"])
-                    except ValueError:
-                        failed += 1
-                        continue
-                    # Checking user
-                    if int(import_userid) == context.bot.id:
-                        failed += 1
-                        continue
-                    if is_user_fed_owner(fed_id, import_userid) is True:
-                        failed += 1
-                        continue
-                    if is_user_fed_admin(fed_id, import_userid) is True:
-                        failed += 1
-                        continue
-                    if str(import_userid) == str(OWNER_ID):
-                        failed += 1
-                        continue
-                    if int(import_userid) in SUDO_USERS:
-                        failed += 1
-                        continue
-                    if int(import_userid) in WHITELIST_USERS:
-                        failed += 1
-                        continue
-                    multi_fed_id.append(fed_id)
-                    multi_import_userid.append(str(import_userid))
-                    multi_import_firstname.append(import_firstname)
-                    multi_import_lastname.append(import_lastname)
-                    multi_import_username.append(import_username)
-                    multi_import_reason.append(import_reason)
-                    success += 1
-                sql.multi_fban_user(
-                    multi_fed_id,
-                    multi_import_userid,
-                    multi_import_firstname,
-                    multi_import_lastname,
-                    multi_import_username,
-                    multi_import_reason,
-                )
-            text = "Blocks were successfully imported. {} people are blocked.".format(
-                success
+        extensions = msg.reply_to_message.document.file_name.split(".")
+        compressed = extensions[-1] == "gz"  # /fbanlist json gz
+        fileformat = extensions[-2 if compressed else -1]
+        if fileformat not in ("json", "csv"):
+            send_message(update.effective_message, "This file is not supported.")
+            return
+
+        # nobody that can't be fbanned by hand gets in through an import either
+        protected = {int(x) for x in sql.all_fed_users(fed_id)}
+        protected.update((context.bot.id, int(OWNER_ID)), SUDO_USERS, WHITELIST_USERS)
+
+        progress = msg.reply_text("Importing fedbans...")
+        started = last_edit = time.time()
+        batch = []
+
+        def write_batch():
+            nonlocal success, failed, last_edit
+            user_ids, first_names, last_names, user_names, reasons = zip(*batch)
+            written = sql.multi_fban_user(
+                [fed_id] * len(batch), user_ids, first_names, last_names, user_names, reasons
             )
-            if failed >= 1:
-                text += " {} Failed to import.".format(failed)
-            get_fedlog = sql.get_fed_log(fed_id)
-            if get_fedlog:
-                if ast.literal_eval(get_fedlog):
-                    teks = "Fed *{}* has successfully imported data. {} banned.".format(
-                        getfed["fname"], success
+            if written is False:
+                failed += len(batch)
+            else:
+                success += len(batch)
+            batch.clear()
+            if time.time() - last_edit >= 3:
+                last_edit = time.time()
+                try:
+                    progress.edit_text(
+                        "Importing fedbans... {} imported so far, {} failed.".format(success, failed)
                     )
-                    if failed >= 1:
-                        teks += " {} Failed to import.".format(failed)
-                    context.bot.send_message(get_fedlog, teks, parse_mode="markdown")
-        elif fileformat == "csv":
-            multi_fed_id = []
-            multi_import_userid = []
-            multi_import_firstname = []
-            multi_import_lastname = []
-            multi_import_username = []
-            multi_import_reason = []
-            file_info.download(
-                "fban_{}.csv".format(msg.reply_to_message.document.file_id)
-            )
-            with open(
-                "fban_{}.csv".format(msg.reply_to_message.document.file_id),
-                "r",
-                encoding="utf8",
-            ) as csvFile:
-                reader = csv.reader(csvFile)
-                for data in reader:
-                    try:
-                        import_userid = int(data[0])  # Make sure it int
-                        import_firstname = str(data[1])
-                        import_lastname = str(data[2])
-                        import_username = str(data[3])
-                        import_reason = str(data[4])
-                    except ValueError:
-                        failed += 1
-                        continue
-                    # Checking user
-                    if int(import_userid) == context.bot.id:
-                        failed += 1
-                        continue
-                    if is_user_fed_owner(fed_id, import_userid) is True:
-                        failed += 1
-                        continue
-                    if is_user_fed_admin(fed_id, import_userid) is True:
-                        failed += 1
-                        continue
-                    if str(import_userid) == str(OWNER_ID):
-                        failed += 1
-                        continue
-                    if int(import_userid) in SUDO_USERS:
-                        failed += 1
-                        continue
-                    if int(import_userid) in WHITELIST_USERS:
-                        failed += 1
-                        continue
-                    multi_fed_id.append(fed_id)
-                    multi_import_userid.append(str(import_userid))
-                    multi_import_firstname.append(import_firstname)
-                    multi_import_lastname.append(import_lastname)
-                    multi_import_username.append(import_username)
-                    multi_import_reason.append(import_reason)
-                    success += 1
-                    # t = ThreadWithReturnValue(target=sql.fban_user, args=(fed_id, str(import_userid), import_firstname, import_lastname, import_username, import_reason,))
-                    # t.start()
-                sql.multi_fban_user(
-                    multi_fed_id,
-                    multi_import_userid,
-                    multi_import_firstname,
-                    multi_import_lastname,
-                    multi_import_username,
-                    multi_import_reason,
+                except BadRequest:
+                    pass
+
+        with TemporaryFile() as file:
+            file_info.download(out=file)
+            file.seek(0)
+            for row in iter_fban_import(GzipFile(fileobj=file) if compressed else file, fileformat):
+                if row is None or row[0] in protected:
+                    failed += 1
+                    continue
+                batch.append(row)
+                if len(batch) >= FBAN_IMPORT_BATCH:
+                    write_batch()
+            if batch:
+                write_batch()
+
+        took = max(time.time() - started, 0.001)
+        text = "Blocks were successfully imported. {} people are blocked.".format(success)
+        if failed >= 1:
+            text += " {} Failed to import.".format(failed)
+        text += " ({:.0f} rows/s)".format((success + failed) / took)
+        get_fedlog = sql.get_fed_log(fed_id)
+        if get_fedlog:
+            if ast.literal_eval(get_fedlog):
+                teks = "Fed *{}* has successfully imported data. {} banned.".format(
+                    getfed["fname"], success
                 )
-            csvFile.close()
-            os.remove("fban_{}.csv".format(msg.reply_to_message.document.file_id))
-            text = "Files were imported successfully. {} people banned.".format(success)
-            if failed >= 1:
-                text += " {} Failed to import.".format(failed)
-            get_fedlog = sql.get_fed_log(fed_id)
-            if get_fedlog:
-                if ast.literal_eval(get_fedlog):
-                    teks = "Fed *{}* has successfully imported data. {} banned.".format(
-                        getfed["fname"], success
-                    )
-                    if failed >= 1:
-                        teks += " {} Failed to import.".format(failed)
-                    context.bot.send_message(get_fedlog, teks, parse_mode="markdown")
+                if failed >= 1:
+                    teks += " {} Failed to import.".format(failed)
+                context.bot.send_message(get_fedlog, teks, parse_mode="markdown")
+        try:
+            progress.edit_text(text)
+        except BadRequest:
+            send_message(update.effective_message, text)
+
+
+def iter_fban_export(fed_id, fileformat):
+    """
+    Yield the ban list of a fed one encoded line at a time, json lines or csv with a header,
+    in the formats iter_fban_import reads back
+    """
+    if fileformat == "csv":
+        yield b"id,firstname,lastname,username,reason\n"
+    row = StringIO()
+    writer = csv.writer(row, lineterminator="\n")
+    # a copy of the ids, the set itself changes under us while new fbans come in
+    for users in list(sql.get_all_fban_users(fed_id)):
+        getuserinfo = sql.get_all_fban_users_target(fed_id, users)
+        if not getuserinfo:  # unbanned since the copy was taken
+            continue
+        if fileformat == "csv":
+            writer.writerow(
+                (
+                    users,
+                    getuserinfo["first_name"],
+                    getuserinfo["last_name"],
+                    getuserinfo["user_name"],
+                    getuserinfo["reason"],
+                )
+            )
+            line = row.getvalue()
+            row.seek(0)
+            row.truncate()
         else:
-            send_message(update.effective_message, "This file is not supported.")
-            return
-        send_message(update.effective_message, text)
+            line = json.dumps(
+                {
+                    "user_id": users,
+                    "first_name": getuserinfo["first_name"],
+                    "last_name": getuserinfo["last_name"],
+                    "user_name": getuserinfo["user_name"],
+                    "reason": getuserinfo["reason"],
+                }
+            ) + "\n"
+        yield line.encode()
+
+
+def iter_fban_import(file, fileformat):
+    """
+    Yield (user_id, first_name, last_name, user_name, reason) for every row of a json or csv
+    /fbanlist export, or None for a row that can't be read. The file is read one line at a time.
+    """
+    text = TextIOWrapper(file, encoding="utf8", newline="")
+    if fileformat == "csv":
+        for data in csv.reader(text):
+            if not data or data[0] == "id":  # the header fed_ban_list writes
+                continue
+            try:
+                yield int(data[0]), str(data[1]), str(data[2]), str(data[3]), str(data[4])
+            except (ValueError, IndexError):
+                yield None
+    else:
+        for line in text:
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+                yield (
+                    int(data["user_id"]),
+                    str(data["first_name"]),
+                    str(data["last_name"]),
+                    str(data["user_name"]),
+                    str(data["reason"]),
+                )
+            except (ValueError, KeyError, TypeError):
+                yield None
 
 
 @kigcallback(pattern=r"rmfed_")
@@ -2113,6 +1982,15 @@ def subs_feds(update, context):
                 update.effective_message, "Please enter a valid federation id."
             )
             return
+        if sql.subscription_creates_cycle(args[0], fed_id):
+            send_message(
+                update.effective_message,
+                "Federation `{}` already gets the fedbans of `{}`, subscribing to it would loop them back.".format(
+                    getfed["fname"], fedinfo["fname"]
+                ),
+                parse_mode="markdown",
+            )
+            return
         subfed = sql.subs_fed(args[0], fed_id)
         if subfed:
             send_message(
@@ -2295,20 +2173,21 @@ def is_user_fed_admin(fed_id, user_id):
 
 
 def is_user_fed_owner(fed_id, user_id):
-    getsql = sql.get_fed_info(fed_id)
-    if getsql is False:
+    getfedowner = sql.get_fed_owner(fed_id)
+    if getfedowner is False:
         return False
-    getfedowner = ast.literal_eval(getsql["fusers"])
-    if getfedowner == None or getfedowner == False:
-        return False
-    getfedowner = getfedowner["owner"]
-    if str(user_id) == getfedowner or int(user_id) == OWNER_ID:
+    if int(user_id) == getfedowner or int(user_id) == OWNER_ID:
         return True
     else:
         return False
 
 
-def welcome_fed(ctx: CallbackContext, msg: Message, chat: Chat, user_id: int):
+def welcome_fed(ctx: CallbackContext, msg: Message, chat: Chat, user_id: int, flags: Optional[int] = None):
+    # users banned in no fed at all are the common case, they cost one probe of the index
+    if flags is None:
+        flags = REPUTATION.flags(user_id)
+    if not flags & FBANNED:
+        return
 
     fed_id = sql.get_fed_id(chat.id)
     if not fed_id:
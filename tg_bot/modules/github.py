@@ -5,7 +5,6 @@ from typing import Optional, List
 import tg_bot.modules.helper_funcs.git_api as api
 import tg_bot.modules.sql.github_sql as sql
 
-from .sql.clear_cmd_sql import get_clearcmd
 from tg_bot import dispatcher, spamcheck
 from .helper_funcs.misc import delete
 from .disable import DisableAbleCommandHandler
@@ -222,11 +221,10 @@ def getVer(update: Update, context: CallbackContext):
 
 
 def deletion(update: Update, context: CallbackContext, delmsg):
-    chat = update.effective_chat
-    cleartime = get_clearcmd(chat.id, "github")
+    cleartime = context.chat_config.clearcmd.get("github")
 
     if cleartime:
-        context.dispatcher.run_async(delete, delmsg, cleartime.time)
+        context.dispatcher.run_async(delete, delmsg, cleartime)
 
 
 
@@ -4,7 +4,6 @@
 
 from functools import wraps
 from typing import Optional
-from threading import RLock
 
 from telegram import Chat, Update, ChatMember
 from telegram.ext import CallbackContext as Ctx, CallbackQueryHandler as CBHandler
@@ -116,22 +115,8 @@ def user_is_admin(update: Update,
 	return member.status in ["administrator", "creator"]  # check if user is admin
 
 
-RLOCK = RLock()
-
-
-def get_mem_from_cache(user_id: int, chat_id: int) -> ChatMember:
-	with RLOCK:
-		try:
-			for i in A_CACHE[chat_id]:
-				if i.user.id == user_id:
-					return i
-
-		except KeyError:
-			admins = dispatcher.bot.getChatAdministrators(chat_id)
-			A_CACHE[chat_id] = admins
-			for i in admins:
-				if i.user.id == user_id:
-					return i
+def get_mem_from_cache(user_id: int, chat_id: int) -> Optional[ChatMember]:
+	return A_CACHE.get_member(chat_id, user_id)
 
 
 # decorator, can be used as @bot_admin_check() to check user is admin
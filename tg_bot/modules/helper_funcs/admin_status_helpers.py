@@ -3,18 +3,148 @@
 # copyright 2022
 # this module contains various helper functions/classes to help with the admin status module
 
+from concurrent.futures import Future
 from enum import Enum
+from threading import Lock
+from time import monotonic
+from typing import Callable, Dict, List, Optional
+
 from cachetools import TTLCache
 
-from telegram import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, ParseMode, Message, Update, message
+from telegram import CallbackQuery, ChatMember, InlineKeyboardMarkup, InlineKeyboardButton, ParseMode, Message, Update, message
+
+from tg_bot import OWNER_ID, SYS_ADMIN, DEV_USERS, MOD_USERS, SUDO_USERS, SUPPORT_USERS, WHITELIST_USERS, ADMIN_CACHE_SIZE, API_CACHE, dispatcher
 
-from tg_bot import OWNER_ID, SYS_ADMIN, DEV_USERS, MOD_USERS, SUDO_USERS, SUPPORT_USERS, WHITELIST_USERS
 
-# stores admin in memory for 10 min.
-ADMINS_CACHE = TTLCache(maxsize = 512, ttl = 60 * 30)
+class AdminCache:
+	"""
+	admins of every chat as {user_id: ChatMember}, with at most one getChatAdministrators call
+	in flight per chat; concurrent misses for the same chat wait for that call instead of
+	making their own, and misses in other chats are never blocked by it
+	"""
 
-# stores bot admin status in memory for 10 min.
-BOT_ADMIN_CACHE = TTLCache(maxsize = 512, ttl = 60 * 30)
+	def __init__(self, fetch: Callable[[int], List[ChatMember]], maxsize: int, ttl: int):
+		self._fetch = fetch
+		self._cache = TTLCache(maxsize = maxsize, ttl = ttl)
+		self._inflight: Dict[int, Future] = {}
+		self._lock = Lock()  # only ever held around dict operations, never around api calls
+		self.hits = 0
+		self.misses = 0
+		self.coalesced = 0
+		self.fetches = 0
+		self.fetch_time = 0.0
+		self.max_fetch_time = 0.0
+
+	def get(self, chat_id: int) -> Dict[int, ChatMember]:
+		with self._lock:
+			try:
+				admins = self._cache[chat_id]
+			except KeyError:
+				self.misses += 1
+			else:
+				self.hits += 1
+				return admins
+		return self.refresh(chat_id)
+
+	def peek(self, chat_id: int) -> Optional[Dict[int, ChatMember]]:
+		"""
+		cached admins of a chat, or None on a miss without fetching them
+		"""
+		with self._lock:
+			admins = self._cache.get(chat_id)
+			if admins is not None:
+				self.hits += 1
+			return admins
+
+	def get_member(self, chat_id: int, user_id: int) -> Optional[ChatMember]:
+		return self.get(chat_id).get(user_id)
+
+	def refresh(self, chat_id: int) -> Dict[int, ChatMember]:
+		"""
+		fetch the admins of a chat now, or join the fetch that is already running for it
+		"""
+		with self._lock:
+			flight = self._inflight.get(chat_id)
+			leader = flight is None
+			if leader:
+				flight = self._inflight[chat_id] = Future()
+			else:
+				self.coalesced += 1
+		if not leader:
+			return flight.result()
+
+		start = monotonic()
+		try:
+			admins = {member.user.id: member for member in self._fetch(chat_id)}
+		except Exception as e:
+			with self._lock:
+				del self._inflight[chat_id]
+			flight.set_exception(e)
+			raise
+		elapsed = monotonic() - start
+		with self._lock:
+			self._cache[chat_id] = admins
+			del self._inflight[chat_id]
+			self.fetches += 1
+			self.fetch_time += elapsed
+			self.max_fetch_time = max(self.max_fetch_time, elapsed)
+		flight.set_result(admins)
+		return admins
+
+	def set(self, chat_id: int, admins: List[ChatMember]):
+		with self._lock:
+			self._cache[chat_id] = {member.user.id: member for member in admins}
+
+	def update_member(self, chat_id: int, member: ChatMember):
+		"""
+		apply a chat_member update to a chat's cached admins, chats that aren't cached are left alone
+		"""
+		with self._lock:
+			admins = self._cache.get(chat_id)
+			if admins is None:
+				return
+			# copy on write, callers may still be iterating the old dict
+			admins = dict(admins)
+			if member.status in ("administrator", "creator"):
+				admins[member.user.id] = member
+			else:
+				admins.pop(member.user.id, None)
+			self._cache[chat_id] = admins
+
+	def pop(self, chat_id: int):
+		with self._lock:
+			self._cache.pop(chat_id, None)
+
+	def __contains__(self, chat_id: int) -> bool:
+		with self._lock:
+			return chat_id in self._cache
+
+	def __len__(self) -> int:
+		return len(self._cache)
+
+	def stats(self) -> dict:
+		return {
+			"chats": len(self._cache),
+			"hits": self.hits,
+			"misses": self.misses,
+			"coalesced": self.coalesced,
+			"fetches": self.fetches,
+			"avg_fetch_ms": self.fetch_time / self.fetches * 1000 if self.fetches else 0,
+			"max_fetch_ms": self.max_fetch_time * 1000,
+		}
+
+
+def fetch_chat_admins(chat_id: int) -> List[ChatMember]:
+	# this cache has its own ttl and refreshes, so always ask the api instead of API_CACHE
+	with API_CACHE.fresh():
+		return dispatcher.bot.getChatAdministrators(chat_id)
+
+
+# stores admins in memory for 30 min, or until a chat_member update changes them.
+ADMINS_CACHE = AdminCache(fetch_chat_admins, maxsize = ADMIN_CACHE_SIZE, ttl = 60 * 30)
+
+# stores bot admin status in memory for 30 min.
+BOT_ADMIN_CACHE = TTLCache(maxsize = ADMIN_CACHE_SIZE, ttl = 60 * 30)
 
 DEV_USERS = DEV_USERS
 
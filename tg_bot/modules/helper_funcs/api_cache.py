@@ -0,0 +1,203 @@
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from time import monotonic
+from typing import Callable, Dict, Hashable, Tuple
+
+from cachetools import TTLCache
+
+# read methods whose answers are cached, with the fields of a call that make up its key
+CACHED_METHODS = {
+    "getChat": ("chat_id",),
+    "getChatMember": ("chat_id", "user_id"),
+    "getChatAdministrators": ("chat_id",),
+}
+
+# calls of the bot itself that change a member, the member's cached entry is dropped once they went through
+MEMBER_METHODS = {
+    "banChatMember", "kickChatMember", "unbanChatMember", "restrictChatMember", "promoteChatMember",
+    "setChatAdministratorCustomTitle", "approveChatJoinRequest", "declineChatJoinRequest",
+}
+# the ones of those that can change who the admins are
+ADMIN_METHODS = {"promoteChatMember", "setChatAdministratorCustomTitle"}
+# calls that change what getChat returns for the chat
+CHAT_METHODS = {
+    "setChatTitle", "setChatDescription", "setChatPhoto", "deleteChatPhoto", "setChatPermissions",
+    "pinChatMessage", "unpinChatMessage", "unpinAllChatMessages", "setChatStickerSet",
+    "deleteChatStickerSet", "exportChatInviteLink",
+}
+
+
+def _key_part(value) -> Hashable:
+    # chat ids come in as ints, numeric strings or @usernames
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return str(value).lower()
+
+
+class ApiReadCache:
+    """
+    Read-through cache of what getChat, getChatMember and getChatAdministrators answered, kept
+    as the raw json so every caller still gets fresh telegram objects built from it.
+
+    Every method has its own TTL and size bound. Concurrent misses for the same call wait for
+    the one request that's already out instead of making their own. Entries are dropped when a
+    chat_member or my_chat_member update, a migration or a call of the bot itself changes them,
+    a fetch that was in flight while its entry got dropped isn't stored. Errors aren't cached.
+    Chats asked for by @username are only keyed by that, they just expire.
+    """
+
+    def __init__(self, methods: Dict[str, Tuple[int, int]]):
+        """
+        methods maps each method in CACHED_METHODS to (ttl, maxsize)
+        """
+        self._caches: Dict[str, TTLCache] = {
+            endpoint: TTLCache(maxsize=maxsize, ttl=ttl) for endpoint, (ttl, maxsize) in methods.items()
+        }
+        # (endpoint, key) -> [future, still valid]
+        self._inflight: Dict[Tuple[str, Hashable], list] = {}
+        self._lock = threading.Lock()  # never held around api calls
+        self._local = threading.local()
+        self.hits = {endpoint: 0 for endpoint in self._caches}
+        self.misses = {endpoint: 0 for endpoint in self._caches}
+        self.coalesced = {endpoint: 0 for endpoint in self._caches}
+        self.fetches = {endpoint: 0 for endpoint in self._caches}
+        self.fetch_time = {endpoint: 0.0 for endpoint in self._caches}
+        self.invalidations = 0
+
+    @contextmanager
+    def fresh(self):
+        """
+        Every cached read made by this thread inside the block goes to the api, the answer
+        still replaces what was cached
+        """
+        previous = getattr(self._local, "fresh", False)
+        self._local.fresh = True
+        try:
+            yield
+        finally:
+            self._local.fresh = previous
+
+    def _key(self, endpoint: str, data: dict) -> Hashable:
+        fields = CACHED_METHODS[endpoint]
+        if len(fields) == 1:
+            return _key_part(data.get(fields[0]))
+        return tuple(_key_part(data.get(field)) for field in fields)
+
+    def call(self, endpoint: str, data, post: Callable):
+        cache = self._caches.get(endpoint)
+        if cache is None:
+            result = post()
+            self._after_write(endpoint, data or {})
+            return result
+
+        key = self._key(endpoint, data or {})
+        fresh = getattr(self._local, "fresh", False)
+        with self._lock:
+            if not fresh:
+                try:
+                    result = cache[key]
+                except KeyError:
+                    pass
+                else:
+                    self.hits[endpoint] += 1
+                    return result
+            self.misses[endpoint] += 1
+            flight = self._inflight.get((endpoint, key))
+            leader = flight is None or fresh
+            if leader:
+                # a fresh read doesn't join an older flight, but later misses can join it
+                flight = self._inflight[(endpoint, key)] = [Future(), True]
+            else:
+                self.coalesced[endpoint] += 1
+        if not leader:
+            return flight[0].result()
+
+        start = monotonic()
+        try:
+            result = post()
+        except Exception as e:
+            with self._lock:
+                if self._inflight.get((endpoint, key)) is flight:
+                    del self._inflight[(endpoint, key)]
+            flight[0].set_exception(e)
+            raise
+        elapsed = monotonic() - start
+        with self._lock:
+            if self._inflight.get((endpoint, key)) is flight:
+                del self._inflight[(endpoint, key)]
+            if flight[1]:
+                cache[key] = result
+            self.fetches[endpoint] += 1
+            self.fetch_time[endpoint] += elapsed
+        flight[0].set_result(result)
+        return result
+
+    def _drop(self, endpoint: str, key: Hashable):
+        # callers hold the lock
+        if self._caches[endpoint].pop(key, None) is not None:
+            self.invalidations += 1
+        flight = self._inflight.pop((endpoint, key), None)
+        if flight:
+            flight[1] = False
+
+    def _after_write(self, endpoint: str, data: dict):
+        if endpoint in MEMBER_METHODS:
+            self.member_changed(data.get("chat_id"), data.get("user_id"), admins=endpoint in ADMIN_METHODS)
+        elif endpoint in CHAT_METHODS:
+            with self._lock:
+                self._drop("getChat", _key_part(data.get("chat_id")))
+        elif endpoint == "leaveChat":
+            self.forget_chat(data.get("chat_id"))
+
+    def member_changed(self, chat_id, user_id, admins: bool = False):
+        """
+        Drop what's cached about a member of a chat, and the chat's admins if they changed
+        """
+        chat_id = _key_part(chat_id)
+        with self._lock:
+            self._drop("getChatMember", (chat_id, _key_part(user_id)))
+            if admins:
+                self._drop("getChatAdministrators", chat_id)
+
+    def forget_chat(self, chat_id):
+        """
+        Drop everything cached about a chat, for when the bot's own status in it changes or it migrates
+        """
+        chat_id = _key_part(chat_id)
+        with self._lock:
+            self._drop("getChat", chat_id)
+            self._drop("getChatAdministrators", chat_id)
+            for key in [key for key in self._caches["getChatMember"] if key[0] == chat_id]:
+                self._drop("getChatMember", key)
+            for endpoint, key in [x for x in self._inflight if x[0] == "getChatMember" and x[1][0] == chat_id]:
+                self._drop(endpoint, key)
+
+    def clear(self):
+        with self._lock:
+            for cache in self._caches.values():
+                cache.clear()
+            for flight in self._inflight.values():
+                flight[1] = False
+            self._inflight.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                endpoint: {
+                    "cached": len(cache),
+                    "hits": self.hits[endpoint],
+                    "misses": self.misses[endpoint],
+                    "coalesced": self.coalesced[endpoint],
+                    "hit_rate": (
+                        self.hits[endpoint] / (self.hits[endpoint] + self.misses[endpoint]) * 100
+                        if self.hits[endpoint] + self.misses[endpoint] else 0
+                    ),
+                    "fetches": self.fetches[endpoint],
+                    "avg_fetch_ms": (
+                        self.fetch_time[endpoint] / self.fetches[endpoint] * 1000 if self.fetches[endpoint] else 0
+                    ),
+                }
+                for endpoint, cache in self._caches.items()
+            }
@@ -0,0 +1,147 @@
+import threading
+from typing import Callable, Dict, Optional, Tuple
+
+from cachetools import LRUCache
+from telegram import Update
+from telegram.ext import CallbackContext
+
+# chats kept in memory, the least recently used snapshot is dropped after that
+CHAT_CONFIG_CACHE_SIZE = 4096
+
+
+class ChatConfig:
+    """
+    Snapshot of the per-chat settings that the moderation handlers read on every message.
+
+    Each setting family (antichannel, warn settings, welcome prefs, ...) is loaded from its
+    sql module the first time it's read and kept until a setter of that module invalidates it.
+    """
+
+    __slots__ = ("chat_id", "_cache", "_values", "_versions")
+
+    def __init__(self, chat_id: int, cache: "ChatConfigCache"):
+        self.chat_id = chat_id
+        self._cache = cache
+        self._values = {}
+        self._versions = {}
+
+    def get(self, family: str):
+        try:
+            value = self._values[family]
+        except KeyError:
+            pass
+        else:
+            self._cache.hits[family] += 1
+            return value
+
+        loader = self._cache.loader(family)
+        self._cache.misses[family] += 1
+        version = self._versions.get(family, 0)
+        value = loader(self.chat_id)
+        with self._cache.lock:
+            # a setter ran while this was loading, so the value may already be stale
+            if self._versions.get(family, 0) == version:
+                self._values[family] = value
+        return value
+
+    def invalidate(self, family: str):
+        with self._cache.lock:
+            self._versions[family] = self._versions.get(family, 0) + 1
+            self._values.pop(family, None)
+
+    def __getattr__(self, family: str):
+        if family.startswith("_"):
+            raise AttributeError(family)
+        try:
+            return self.get(family)
+        except KeyError:
+            raise AttributeError("no chat config family named {}".format(family)) from None
+
+    def __repr__(self):
+        return "<ChatConfig {} ({})>".format(self.chat_id, ", ".join(self._values))
+
+
+class ChatConfigCache:
+    """
+    LRU of ChatConfig snapshots, plus the loaders the sql modules register for their family
+    """
+
+    def __init__(self, maxsize: int = CHAT_CONFIG_CACHE_SIZE):
+        self._configs = LRUCache(maxsize=maxsize)
+        self._loaders: Dict[str, Callable] = {}
+        self.lock = threading.RLock()
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    def register(self, family: str, loader: Callable):
+        """
+        loader gets the chat id and returns the value handlers will see for this family
+        """
+        self._loaders[family] = loader
+        self.hits.setdefault(family, 0)
+        self.misses.setdefault(family, 0)
+
+    def loader(self, family: str) -> Callable:
+        return self._loaders[family]
+
+    def get(self, chat_id) -> ChatConfig:
+        chat_id = int(chat_id)
+        with self.lock:
+            try:
+                return self._configs[chat_id]
+            except KeyError:
+                config = self._configs[chat_id] = ChatConfig(chat_id, self)
+                return config
+
+    def invalidate(self, chat_id, *families: str):
+        """
+        Drop the given families (all of them if none are given) of a chat, setters call this
+        after they commit
+        """
+        with self.lock:
+            config = self._configs.get(int(chat_id))
+            if config is None:
+                return
+            for family in families or self._loaders:
+                config.invalidate(family)
+
+    def migrate(self, old_chat_id, new_chat_id):
+        self.invalidate(old_chat_id)
+        self.invalidate(new_chat_id)
+
+    def __len__(self):
+        return len(self._configs)
+
+    def stats(self) -> Dict[str, Tuple[int, int]]:
+        return {family: (self.hits[family], self.misses[family]) for family in self._loaders}
+
+
+CHAT_CONFIGS = ChatConfigCache()
+
+
+class ChatConfigContext(CallbackContext):
+    """
+    CallbackContext with the ChatConfig of the update's chat, every handler of one update
+    shares the same context so the snapshot is looked up once per update
+    """
+
+    _config_chat_id: Optional[int] = None
+    _chat_config: Optional[ChatConfig] = None
+
+    @classmethod
+    def from_update(cls, update: object, dispatcher) -> "ChatConfigContext":
+        self = super().from_update(update, dispatcher)
+        if isinstance(update, Update) and update.effective_chat:
+            self._config_chat_id = update.effective_chat.id
+        return self
+
+    @property
+    def chat_config(self) -> Optional[ChatConfig]:
+        if self._chat_config is None and self._config_chat_id is not None:
+            self._chat_config = CHAT_CONFIGS.get(self._config_chat_id)
+        return self._chat_config
+
+
+# clearcmd is read by the modules whose commands it clears, none of which owns its sql module;
+# registering it here keeps it there even when clear_cmd itself isn't loaded
+from tg_bot.modules.sql import clear_cmd_sql
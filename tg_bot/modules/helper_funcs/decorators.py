@@ -5,7 +5,13 @@ from telegram.ext import CallbackQueryHandler, InlineQueryHandler
 from telegram.ext.filters import BaseFilter, Filters
 from tg_bot import dispatcher as d, log, telethn, OWNER_ID
 from typing import Optional, Union, List
-from tg_bot.modules.helper_funcs.handlers import CustomCommandHandler as CommandHandler, CustomMessageHandler as MessageHandler, SpamChecker
+from tg_bot.modules.helper_funcs.handlers import (
+    CustomCommandHandler as CommandHandler,
+    CustomMessageHandler as MessageHandler,
+    SpamChecker,
+    add_command_handler,
+    add_callback_handler,
+)
 from telethon import events
 import traceback, html, requests
 class KigyoTelegramHandler:
@@ -24,23 +30,27 @@ class KigyoTelegramHandler:
         def _command(func):
             try:
                 if can_disable:
-                    self._dispatcher.add_handler(
+                    add_command_handler(
+                        self._dispatcher,
                         DisableAbleCommandHandler(command, func, filters=filters, run_async=run_async,
                                                   pass_args=pass_args, admin_ok=admin_ok), group
                     )
                 else:
-                    self._dispatcher.add_handler(
+                    add_command_handler(
+                        self._dispatcher,
                         CommandHandler(command, func, filters=filters, run_async=run_async, pass_args=pass_args), group
                     )
                 log.debug(f"[KIGCMD] Loaded handler {command} for function {func.__name__} in group {group}")
             except TypeError:
                 if can_disable:
-                    self._dispatcher.add_handler(
+                    add_command_handler(
+                        self._dispatcher,
                         DisableAbleCommandHandler(command, func, filters=filters, run_async=run_async,
                                                   pass_args=pass_args, admin_ok=admin_ok, pass_chat_data=pass_chat_data)
                     )
                 else:
-                    self._dispatcher.add_handler(
+                    add_command_handler(
+                        self._dispatcher,
                         CommandHandler(command, func, filters=filters, run_async=run_async, pass_args=pass_args,
                                        pass_chat_data=pass_chat_data)
                     )
@@ -84,7 +94,7 @@ class KigyoTelegramHandler:
 
     def callbackquery(self, pattern: str = None, run_async: bool = True):
         def _callbackquery(func):
-            self._dispatcher.add_handler(CallbackQueryHandler(pattern=pattern, callback=func, run_async=run_async))
+            add_callback_handler(self._dispatcher, CallbackQueryHandler(pattern=pattern, callback=func, run_async=run_async))
             log.debug(f'[KIGCALLBACK] Loaded callbackquery handler with pattern {pattern} for function {func.__name__}')
             return func
 
@@ -0,0 +1,95 @@
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from time import monotonic, sleep
+from typing import Callable, Iterable, Optional
+
+from telegram.error import RetryAfter
+
+from tg_bot import log
+
+# outcome an action returns to stop the whole run, e.g. when the target user id turned out to be invalid
+ABORT = "abort"
+# outcome of the chats that weren't tried because the run was aborted
+CANCELLED = "cancelled"
+# outcome of a chat that was still rate limited after all retries, or raised
+FAILED = "failed"
+
+
+class FanOut:
+    """
+    Runs one Bot API action per chat on a few threads at once.
+
+    The action gets a chat id and returns a short outcome ("banned", "skipped", ...), the
+    outcomes are counted in `results`. A RetryAfter pauses every worker for as long as
+    Telegram asked, since the limit is per bot and not per chat, and the same chat is then
+    tried again up to `retries` times.
+
+    on_progress is called with the FanOut from the thread that called run, at most once
+    every progress_interval seconds.
+    """
+
+    def __init__(self, action: Callable[[int], str], concurrency: int = 8, retries: int = 3,
+                 on_progress: Optional[Callable[["FanOut"], None]] = None, progress_interval: float = 5.0):
+        self.action = action
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval
+        self.results = Counter()
+        self.total = 0
+        self.done = 0
+        self.rate_limited = 0
+        self.started = 0.0
+        self._stop = threading.Event()
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        return monotonic() - self.started
+
+    def run(self, chat_ids: Iterable[int]) -> Counter:
+        chat_ids = list(chat_ids)
+        self.total = len(chat_ids)
+        self.started = monotonic()
+        last_report = self.started
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="fanout") as pool:
+            for future in as_completed([pool.submit(self._run_one, chat_id) for chat_id in chat_ids]):
+                self.results[future.result()] += 1
+                self.done += 1
+                if self.on_progress and monotonic() - last_report >= self.progress_interval:
+                    last_report = monotonic()
+                    self._report()
+        return self.results
+
+    def _report(self):
+        try:
+            self.on_progress(self)
+        except Exception:
+            log.exception("fan out progress callback failed")
+
+    def _wait_flood(self):
+        delay = self._resume_at - monotonic()
+        if delay > 0:
+            sleep(delay)
+
+    def _run_one(self, chat_id: int) -> str:
+        for _ in range(self.retries + 1):
+            if self._stop.is_set():
+                return CANCELLED
+            self._wait_flood()
+            try:
+                outcome = self.action(chat_id)
+            except RetryAfter as e:
+                with self._lock:
+                    self.rate_limited += 1
+                    self._resume_at = max(self._resume_at, monotonic() + e.retry_after)
+                continue
+            except Exception:
+                log.exception("fan out action failed in %s", chat_id)
+                return FAILED
+            if outcome == ABORT:
+                self._stop.set()
+            return outcome
+        return FAILED
@@ -1,5 +1,11 @@
+import re
+import threading
+from typing import Optional
+
 import telegram.ext as tg
 from telegram import Update
+from telegram.ext import Handler
+from telegram.ext.dispatcher import DEFAULT_GROUP
 from telegram.ext.filters import Filters
 from telegram.ext.messagehandler import MessageHandler
 from tg_bot import DEV_USERS, MOD_USERS, OWNER_ID, SUDO_USERS, SYS_ADMIN, WHITELIST_USERS, SUPPORT_USERS
@@ -18,6 +24,7 @@ except:
     CUSTOM_CMD = False
 
 CMD_STARTERS = CUSTOM_CMD or ["/", "!"]
+_CMD_STARTERS = tuple(CMD_STARTERS)
 
 
 class AntiSpam:
@@ -59,6 +66,255 @@ SpamChecker = AntiSpam()
 MessageHandlerChecker = AntiSpam()
 
 
+class ParsedCommand:
+    """
+    Command prefix, name and @botname of a message, split once per update
+    """
+    __slots__ = ("prefix", "raw_command", "command", "bot_username", "args", "user_id", "for_us", "_ignored")
+
+    def __init__(self, prefix, raw_command, bot_username, args, user_id, for_us):
+        self.prefix = prefix
+        self.raw_command = raw_command
+        self.command = raw_command.lower()
+        self.bot_username = bot_username
+        self.args = args
+        self.user_id = user_id
+        self.for_us = for_us
+        self._ignored = None
+
+    @property
+    def ignored(self) -> bool:
+        # SpamChecker only needs to run once per update, no matter how many handlers share the command
+        if self._ignored is None:
+            self._ignored = SpamChecker.check_user(self.user_id)
+        return self._ignored
+
+
+_PARSE_CACHE = threading.local()
+
+
+def parse_command(update) -> Optional[ParsedCommand]:
+    """
+    Return the ParsedCommand for an update, or None if it isn't a command.
+    The dispatcher checks every handler of an update from the same thread, so
+    the last result is kept per thread and reused for as long as the update is the same object.
+    """
+    cache = _PARSE_CACHE
+    if getattr(cache, "update", None) is update:
+        return cache.parsed
+
+    parsed = None
+    message = update.effective_message if isinstance(update, Update) else None
+    if message and message.text and len(message.text) > 1:
+        fst_word = message.text.split(None, 1)[0]
+        if len(fst_word) > 1 and fst_word.startswith(_CMD_STARTERS):
+            command = fst_word[1:].split("@")
+            command.append(message.bot.username)  # in case the command was sent without a username
+            try:
+                user_id = update.effective_user.id
+            except:
+                user_id = None
+            bot_username = command[1].lower()
+            parsed = ParsedCommand(
+                fst_word[0],
+                command[0],
+                bot_username,
+                message.text.split()[1:],
+                user_id,
+                bot_username == message.bot.username.lower(),
+            )
+
+    cache.update = update
+    cache.parsed = parsed
+    return parsed
+
+
+class CommandRouter(Handler):
+    """
+    Holds a run of consecutive command handlers of one dispatcher group and
+    picks the candidates by command name instead of asking every handler in turn.
+    Handlers sharing a command are still checked in the order they were added,
+    so the first match wins exactly like it would in the plain group.
+    """
+
+    def __init__(self):
+        super().__init__(self._unused_callback)
+        self.handlers = []
+        self.commands = {}
+
+    @staticmethod
+    def _unused_callback(update, context):
+        pass
+
+    def add(self, handler):
+        self.handlers.append(handler)
+        for cmd in handler.command:
+            self.commands.setdefault(cmd.lower(), []).append(handler)
+
+    def remove(self, handler):
+        self.handlers.remove(handler)
+        for cmd in handler.command:
+            handlers = self.commands.get(cmd.lower(), [])
+            if handler in handlers:
+                handlers.remove(handler)
+            if not handlers:
+                self.commands.pop(cmd.lower(), None)
+
+    def check_update(self, update):
+        if not isinstance(update, Update):
+            return None
+        parsed = parse_command(update)
+        if parsed is None:
+            return None
+        for handler in self.commands.get(parsed.command, ()):
+            check = handler.check_update(update)
+            if check is not None and check is not False:
+                return handler, check
+        return None
+
+    def handle_update(self, update, dispatcher, check_result, context=None):
+        handler, check = check_result
+        return handler.handle_update(update, dispatcher, check, context)
+
+
+_REGEX_META = frozenset(".^$*+?{}[]\\|()")
+
+
+def _literal_prefix(pattern) -> str:
+    """
+    Leading literal text every match of a callback pattern has to start with,
+    empty if the pattern can't be reduced to one
+    """
+    if isinstance(pattern, re.Pattern):
+        if pattern.flags & re.IGNORECASE:
+            return ""
+        pattern = pattern.pattern
+    if not isinstance(pattern, str):
+        return ""
+    if _has_top_level_alternation(pattern):
+        # "foo_|bar_" also matches data starting with bar_
+        return ""
+    if pattern.startswith("^"):
+        pattern = pattern[1:]
+    prefix = []
+    for char in pattern:
+        if char in _REGEX_META:
+            if char == "(":
+                # could be an inline flag like (?i) or hold an alternation, don't guess
+                return ""
+            # a quantifier makes the char before it optional
+            if char in "*?{" and prefix:
+                prefix.pop()
+            break
+        prefix.append(char)
+    return "".join(prefix)
+
+
+def _has_top_level_alternation(pattern: str) -> bool:
+    """
+    Whether the pattern has a | outside of any group or character class
+    """
+    depth = 0
+    in_class = False
+    escaped = False
+    for i, char in enumerate(pattern):
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif in_class:
+            # a ] right after [ or [^ is a literal one
+            if char == "]" and pattern[i - 1] != "[" and pattern[i - 2:i] != "[^":
+                in_class = False
+        elif char == "[":
+            in_class = True
+        elif char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            return True
+    return False
+
+
+class CallbackQueryRouter(Handler):
+    """
+    Same as CommandRouter, for a run of CallbackQueryHandlers; handlers are
+    indexed by the literal prefix of their pattern and looked up by the callback data.
+    """
+
+    def __init__(self):
+        super().__init__(CommandRouter._unused_callback)
+        self.handlers = []
+        self.prefixes = {}
+        self.prefix_lengths = set()
+        self._order = {}
+        self._added = 0
+
+    def add(self, handler):
+        self.handlers.append(handler)
+        self._order[id(handler)] = self._added
+        self._added += 1
+        prefix = _literal_prefix(handler.pattern)
+        self.prefixes.setdefault(prefix, []).append(handler)
+        self.prefix_lengths.add(len(prefix))
+
+    def remove(self, handler):
+        self.handlers.remove(handler)
+        self._order.pop(id(handler), None)
+        prefix = _literal_prefix(handler.pattern)
+        handlers = self.prefixes.get(prefix, [])
+        if handler in handlers:
+            handlers.remove(handler)
+        if not handlers:
+            self.prefixes.pop(prefix, None)
+            self.prefix_lengths = {len(p) for p in self.prefixes}
+
+    def _candidates(self, data):
+        if not isinstance(data, str):
+            return self.handlers
+        candidates = []
+        for length in self.prefix_lengths:
+            if length <= len(data):
+                candidates.extend(self.prefixes.get(data[:length], ()))
+        if len(candidates) > 1:
+            candidates.sort(key=lambda h: self._order[id(h)])
+        return candidates
+
+    def check_update(self, update):
+        if not isinstance(update, Update) or not update.callback_query:
+            return None
+        for handler in self._candidates(update.callback_query.data):
+            check = handler.check_update(update)
+            if check is not None and check is not False:
+                return handler, check
+        return None
+
+    def handle_update(self, update, dispatcher, check_result, context=None):
+        handler, check = check_result
+        return handler.handle_update(update, dispatcher, check, context)
+
+
+def _add_routed_handler(dispatcher, handler, group, router_cls):
+    # only extend a router that is the last handler of the group, anything
+    # added in between has to keep its place in the checking order
+    handlers = dispatcher.handlers.get(group)
+    if handlers and isinstance(handlers[-1], router_cls):
+        handlers[-1].add(handler)
+        return
+    router = router_cls()
+    router.add(handler)
+    dispatcher.add_handler(router, group)
+
+
+def add_command_handler(dispatcher, handler, group=DEFAULT_GROUP):
+    _add_routed_handler(dispatcher, handler, group, CommandRouter)
+
+
+def add_callback_handler(dispatcher, handler, group=DEFAULT_GROUP):
+    _add_routed_handler(dispatcher, handler, group, CallbackQueryRouter)
+
+
 class CustomCommandHandler(tg.CommandHandler):
     def __init__(self, command, callback, run_async=True, **kwargs):
         if "admin_ok" in kwargs:
@@ -68,39 +324,19 @@ class CustomCommandHandler(tg.CommandHandler):
     def check_update(self, update):
         if not isinstance(update, Update) or not update.effective_message:
             return
-        message = update.effective_message
-
-        try:
-            user_id = update.effective_user.id
-        except:
-            user_id = None
-
-        if message.text and len(message.text) > 1:
-            fst_word = message.text.split(None, 1)[0]
-            if len(fst_word) > 1 and any(
-                fst_word.startswith(start) for start in CMD_STARTERS
-            ):
-                args = message.text.split()[1:]
-                command = fst_word[1:].split("@")
-                command.append(
-                    message.bot.username
-                )  # in case the command was sent without a username
-
-                if not (
-                    command[0].lower() in self.command
-                    and command[1].lower() == message.bot.username.lower()
-                ):
-                    return None
+        parsed = parse_command(update)
 
-                if SpamChecker.check_user(user_id):
-                    return None
+        if parsed is None or not (parsed.command in self.command and parsed.for_us):
+            return None
 
-                filter_result = self.filters(update)
-                if filter_result:
-                    return args, filter_result
-                else:
-                    return False
+        if parsed.ignored:
+            return None
 
+        filter_result = self.filters(update)
+        if filter_result:
+            return list(parsed.args), filter_result
+        else:
+            return False
 
 
 class CustomMessageHandler(MessageHandler):
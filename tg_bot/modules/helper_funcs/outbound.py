@@ -0,0 +1,240 @@
+import heapq
+import itertools
+import threading
+from contextlib import contextmanager
+from time import monotonic, sleep
+from typing import Callable, Dict, Optional
+
+from cachetools import LRUCache
+from telegram.error import RetryAfter
+from telegram.ext import ExtBot
+from telegram.utils.helpers import DEFAULT_NONE
+
+from tg_bot import log
+from tg_bot.modules.helper_funcs.api_cache import ApiReadCache
+
+# priority classes, lower goes first when calls queue up for the global limit
+MODERATION = 0
+REPLY = 1
+BULK = 2
+
+PRIORITY_NAMES = {MODERATION: "moderation", REPLY: "reply", BULK: "bulk"}
+
+# methods that post something in a chat, they count against the chat's own limit too
+SEND_METHODS = {
+    "sendMessage", "sendPhoto", "sendAudio", "sendDocument", "sendVideo", "sendAnimation",
+    "sendVoice", "sendVideoNote", "sendMediaGroup", "sendLocation", "sendVenue", "sendContact",
+    "sendPoll", "sendDice", "sendSticker", "sendInvoice", "sendGame", "copyMessage", "forwardMessage",
+    "editMessageText", "editMessageCaption", "editMessageMedia", "editMessageReplyMarkup",
+}
+# methods that act on members or messages, they jump ahead of chatter
+MODERATION_METHODS = {
+    "banChatMember", "kickChatMember", "unbanChatMember", "restrictChatMember", "promoteChatMember",
+    "banChatSenderChat", "unbanChatSenderChat", "deleteMessage", "approveChatJoinRequest",
+    "declineChatJoinRequest", "setChatPermissions", "pinChatMessage", "unpinChatMessage",
+}
+
+
+class TokenBucket:
+    """
+    `rate` calls per second with bursts of up to `burst`. Tokens can go negative, a caller
+    that takes one while there's none gets told how long to wait, so callers racing for the
+    same bucket end up spaced out instead of all waking at once.
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "stamp")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def delay(self, now: float) -> float:
+        """
+        How long until a token is there, without taking it
+        """
+        self._refill(now)
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def reserve(self, now: float) -> float:
+        """
+        Take a token and return how long to wait before using it
+        """
+        self._refill(now)
+        self.tokens -= 1
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def pause(self, now: float, seconds: float):
+        # Telegram asked to back off, nothing is handed out until then
+        self._refill(now)
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+class OutboundScheduler:
+    """
+    Paces every Bot API call that sends something, so the bot stays under Telegram's global
+    and per-chat limits instead of running into RetryAfter.
+
+    Calls that post in a chat first wait for that chat's bucket, then every paced call waits
+    for the global bucket, where queued calls are served by priority class: moderation
+    actions, then replies, then bulk jobs like broadcasts. Reads (getChat, getChatMember, ...)
+    aren't paced. A RetryAfter pauses the chat's bucket, or the global one for calls without
+    a chat, and the call is tried again as long as the wait is at most max_wait.
+    """
+
+    def __init__(self, global_rate: float = 30, group_rate: float = 20 / 60, private_rate: float = 1,
+                 chat_burst: int = 5, max_wait: float = 10, retries: int = 3, max_chats: int = 10000):
+        self.group_rate = group_rate
+        self.private_rate = private_rate
+        self.chat_burst = chat_burst
+        self.max_wait = max_wait
+        self.retries = retries
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats: Dict[int, TokenBucket] = LRUCache(maxsize=max_chats)
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self._local = threading.local()
+        self.calls = {p: 0 for p in PRIORITY_NAMES}
+        self.waiting = {p: 0 for p in PRIORITY_NAMES}
+        self.wait_time = {p: 0.0 for p in PRIORITY_NAMES}
+        self.max_wait_time = {p: 0.0 for p in PRIORITY_NAMES}
+        self.retry_afters = 0
+        self.gave_up = 0
+
+    @contextmanager
+    def priority(self, priority: int):
+        """
+        Send every call made by this thread inside the block with the given priority
+        """
+        previous = getattr(self._local, "priority", None)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def _classify(self, endpoint: str) -> Optional[int]:
+        if endpoint in MODERATION_METHODS:
+            return MODERATION
+        if endpoint not in SEND_METHODS:
+            return None
+        override = getattr(self._local, "priority", None)
+        return REPLY if override is None else override
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            rate = self.private_rate if chat_id > 0 else self.group_rate
+            bucket = self._chats[chat_id] = TokenBucket(rate, self.chat_burst)
+        return bucket
+
+    def _chat_turn(self, chat_id: int):
+        with self._cond:
+            bucket = self._chat_bucket(chat_id)
+            wait = bucket.reserve(monotonic())
+            if wait > self.max_wait:
+                # this chat is swamped, don't tie up a worker for longer, Telegram will say if it minds
+                bucket.tokens += 1
+                self.gave_up += 1
+                return
+        if wait > 0:
+            sleep(wait)
+
+    def _global_turn(self, priority: int):
+        with self._cond:
+            entry = (priority, next(self._seq))
+            heapq.heappush(self._queue, entry)
+            self.waiting[priority] += 1
+            try:
+                while True:
+                    if self._queue[0] == entry:
+                        wait = self._global.delay(monotonic())
+                        if wait <= 0:
+                            self._global.reserve(monotonic())
+                            heapq.heappop(self._queue)
+                            return
+                        self._cond.wait(wait)
+                    else:
+                        self._cond.wait()
+            finally:
+                if entry in self._queue:
+                    # interrupted while queued, don't leave everyone behind waiting on it
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                self.waiting[priority] -= 1
+                self._cond.notify_all()
+
+    def _pause(self, chat_id: Optional[int], seconds: float):
+        with self._cond:
+            bucket = self._chat_bucket(chat_id) if chat_id is not None else self._global
+            bucket.pause(monotonic(), seconds)
+            self.retry_afters += 1
+
+    def call(self, endpoint: str, chat_id, send: Callable):
+        priority = self._classify(endpoint)
+        if priority is None:
+            return send()
+        try:
+            chat_id = int(chat_id) if chat_id is not None else None
+        except (TypeError, ValueError):
+            # an @username, it still gets the global pacing
+            chat_id = None
+
+        for attempt in range(self.retries + 1):
+            start = monotonic()
+            if chat_id is not None and endpoint in SEND_METHODS:
+                self._chat_turn(chat_id)
+            self._global_turn(priority)
+            waited = monotonic() - start
+            self.calls[priority] += 1
+            self.wait_time[priority] += waited
+            self.max_wait_time[priority] = max(self.max_wait_time[priority], waited)
+            try:
+                return send()
+            except RetryAfter as e:
+                # only sends wait on a chat's bucket, other calls back off globally
+                self._pause(chat_id if endpoint in SEND_METHODS else None, e.retry_after)
+                if e.retry_after > self.max_wait or attempt == self.retries:
+                    raise
+                log.warning("%s in %s hit a flood limit, retrying in %ss", endpoint, chat_id, e.retry_after)
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "calls": self.calls[p],
+                "queued": self.waiting[p],
+                "avg_wait_ms": self.wait_time[p] / self.calls[p] * 1000 if self.calls[p] else 0,
+                "max_wait_ms": self.max_wait_time[p] * 1000,
+            }
+            for p, name in PRIORITY_NAMES.items()
+        }
+
+
+class ScheduledBot(ExtBot):
+    """
+    ExtBot whose requests all go through an OutboundScheduler, and through an ApiReadCache
+    when one is given, handlers keep calling context.bot.send_message and friends as before
+    """
+
+    def __init__(self, *args, scheduler: OutboundScheduler, cache: Optional[ApiReadCache] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.scheduler = scheduler
+        self.cache = cache
+
+    def _post(self, endpoint: str, data=None, timeout=DEFAULT_NONE, api_kwargs=None):
+        chat_id = (data or {}).get("chat_id")
+
+        def post():
+            return self.scheduler.call(
+                endpoint, chat_id, lambda: super(ScheduledBot, self)._post(endpoint, data, timeout, api_kwargs)
+            )
+
+        if self.cache is None:
+            return post()
+        return self.cache.call(endpoint, data, post)
@@ -0,0 +1,205 @@
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Set
+
+
+class RateTracker:
+    """
+    How many events each key (a user, a chat) had over the last `window` seconds.
+
+    Every key keeps the counts of the current fixed window and of the one before, the rate is
+    the current count plus the previous one weighted by how much of it still overlaps the
+    sliding window. That's a few ints per key and O(1) per event. At most maxsize keys are
+    kept, the least recently active one is dropped first.
+    """
+
+    def __init__(self, limit: int, window: float, maxsize: int = 100000):
+        self.limit = limit
+        self.window = window
+        self.maxsize = maxsize
+        # key -> [window index, previous count, current count, last event]
+        self._keys: "OrderedDict[Hashable, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.events = 0
+        self.evicted = 0
+
+    def _rate(self, entry: list, now: float) -> float:
+        index = int(now // self.window)
+        if index == entry[0]:
+            previous, current = entry[1], entry[2]
+        elif index == entry[0] + 1:
+            previous, current = entry[2], 0
+        else:
+            return 0
+        return previous * (1 - (now % self.window) / self.window) + current
+
+    def hit(self, key: Hashable, now: float, event: Any = None) -> float:
+        """
+        Count one event for key and return its rate. An event equal to the last one counted
+        for the key isn't counted again, so a message that runs through several handlers
+        counts once.
+        """
+        index = int(now // self.window)
+        with self._lock:
+            entry = self._keys.get(key)
+            if entry is None:
+                entry = self._keys[key] = [index, 0, 0, None]
+                if len(self._keys) > self.maxsize:
+                    self._keys.popitem(last=False)
+                    self.evicted += 1
+            else:
+                self._keys.move_to_end(key)
+            if event is None or event != entry[3]:
+                if index == entry[0] + 1:
+                    entry[1], entry[2] = entry[2], 0
+                elif index != entry[0]:
+                    entry[1], entry[2] = 0, 0
+                entry[0] = index
+                entry[2] += 1
+                entry[3] = event
+                self.events += 1
+            return self._rate(entry, now)
+
+    def rate(self, key: Hashable, now: float) -> float:
+        with self._lock:
+            entry = self._keys.get(key)
+            return self._rate(entry, now) if entry else 0
+
+    def over(self, rate: float) -> bool:
+        # a limit of 0 turns the check off
+        return bool(self.limit) and rate >= self.limit
+
+    def forget(self, key: Hashable):
+        with self._lock:
+            self._keys.pop(key, None)
+
+    def reset(self):
+        with self._lock:
+            self._keys.clear()
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class RecentEvents:
+    """
+    The times of the last few events of each key (a user in a chat), to tell whether a key had
+    `count` events within `seconds`.
+
+    Every key is a ring buffer exactly as long as the count it's checked against, so the check is
+    O(1). A key that has been idle for longer than its window can't trip anything anymore, those
+    are dropped from the least recently active end as events come in, and at most maxsize are kept.
+    """
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        # key -> [ring buffer of event times, time the key goes idle]
+        self._keys: "OrderedDict[Hashable, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def hit(self, key: Hashable, now: float, count: int, seconds: float) -> bool:
+        """
+        Record an event for key, True if it was the count-th within seconds. The key starts
+        over after that, so the next trip needs another count events.
+        """
+        with self._lock:
+            entry = self._keys.get(key)
+            if entry is None or entry[0].maxlen != count:
+                entry = self._keys[key] = [deque(maxlen=count), 0.0]
+            self._keys.move_to_end(key)
+            times = entry[0]
+            times.append(now)
+            entry[1] = now + seconds
+            self._evict(now)
+            if len(times) == count and now - times[0] <= seconds:
+                times.clear()
+                return True
+            return False
+
+    def _evict(self, now: float):
+        keys = self._keys
+        while keys:
+            key = next(iter(keys))
+            if len(keys) <= self.maxsize and keys[key][1] >= now:
+                return
+            del keys[key]
+            self.evicted += 1
+
+    def forget(self, predicate: Callable[[Hashable], bool]):
+        with self._lock:
+            for key in [key for key in self._keys if predicate(key)]:
+                del self._keys[key]
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class TimerWheel:
+    """
+    Keys that expire a while after they were added, like users the bot ignores for ten minutes.
+
+    Deadlines are bucketed by `resolution` seconds and whatever call comes first after a bucket's
+    time sweeps it, so there's no timer per key. on_expire is called with each expired key.
+    """
+
+    def __init__(self, resolution: float = 1.0, on_expire: Optional[Callable[[Hashable], None]] = None):
+        self.resolution = resolution
+        self.on_expire = on_expire
+        self._deadlines: Dict[Hashable, float] = {}
+        self._buckets: Dict[int, Set[Hashable]] = {}
+        self._cursor: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def add(self, key: Hashable, delay: float, now: float):
+        """
+        Add key, or move its deadline if it's already there
+        """
+        deadline = now + delay
+        tick = int(deadline // self.resolution)
+        with self._lock:
+            old = self._deadlines.get(key)
+            if old is not None:
+                self._buckets.get(int(old // self.resolution), set()).discard(key)
+            self._deadlines[key] = deadline
+            self._buckets.setdefault(tick, set()).add(key)
+            if self._cursor is None:
+                self._cursor = int(now // self.resolution)
+
+    def discard(self, key: Hashable):
+        with self._lock:
+            deadline = self._deadlines.pop(key, None)
+            if deadline is not None:
+                self._buckets.get(int(deadline // self.resolution), set()).discard(key)
+
+    def advance(self, now: float):
+        """
+        Drop every key whose deadline has passed
+        """
+        tick = int(now // self.resolution)
+        expired = []
+        with self._lock:
+            if self._cursor is None or tick < self._cursor:
+                return
+            if tick - self._cursor > len(self._buckets):
+                # idle for long, going through the buckets is cheaper than every tick in between
+                ticks = sorted(t for t in self._buckets if t < tick)
+            else:
+                ticks = range(self._cursor, tick)
+            for t in ticks:
+                for key in self._buckets.pop(t, ()):
+                    del self._deadlines[key]
+                    expired.append(key)
+            self._cursor = tick
+        if self.on_expire:
+            for key in expired:
+                self.on_expire(key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._deadlines
+
+    def __iter__(self) -> Iterator[Hashable]:
+        return iter(list(self._deadlines))
+
+    def __len__(self):
+        return len(self._deadlines)
@@ -1,32 +1,38 @@
+import asyncio
+from typing import Dict
+
+from telegram import ChatMember
+
 from tg_bot.modules.helper_funcs.telethn import HIGHER_AUTH, telethn
+from tg_bot.modules.helper_funcs.admin_status import get_bot_member
+from tg_bot.modules.helper_funcs.admin_status_helpers import ADMINS_CACHE
 from tg_bot import SUPPORT_USERS, WHITELIST_USERS
-from telethon.tl.types import ChannelParticipantsAdmins
+
+
+async def get_chat_admins(chat_id: int) -> Dict[int, ChatMember]:
+    """
+    Admins of a chat from the ADMINS_CACHE the ptb handlers use. A miss is fetched in the
+    default executor so the event loop isn't blocked, and it joins any fetch already running
+    for that chat, whichever client started it.
+    """
+    admins = ADMINS_CACHE.peek(chat_id)
+    if admins is None:
+        admins = await asyncio.get_running_loop().run_in_executor(None, ADMINS_CACHE.get, chat_id)
+    return admins
 
 
 async def user_is_ban_protected(user_id: int, message):
-    status = False
     if message.is_private or user_id in (HIGHER_AUTH + SUPPORT_USERS + WHITELIST_USERS):
         return True
 
-    async for user in telethn.iter_participants(
-            message.chat_id, filter=ChannelParticipantsAdmins):
-        if user_id == user.id:
-            status = True
-            break
-    return status
+    return user_id in await get_chat_admins(message.chat_id)
 
 
 async def user_is_admin(user_id: int, message):
-    status = False
-    if message.is_private:
+    if message.is_private or user_id in HIGHER_AUTH:
         return True
 
-    async for user in telethn.iter_participants(
-            message.chat_id, filter=ChannelParticipantsAdmins):
-        if user_id == user.id or user_id in HIGHER_AUTH:
-            status = True
-            break
-    return status
+    return user_id in await get_chat_admins(message.chat_id)
 
 async def user_can_purge(user_id: int, message):
     status = False
@@ -51,24 +57,16 @@ async def user_can_ban(user_id: int, message):
 
 
 async def is_user_admin(user_id: int, chat_id):
-    status = False
-    async for user in telethn.iter_participants(
-            chat_id, filter=ChannelParticipantsAdmins):
-        if user_id == user.id or user_id in HIGHER_AUTH:
-            status = True
-            break
-    return status
+    if user_id in HIGHER_AUTH:
+        return True
+
+    return user_id in await get_chat_admins(chat_id)
 
 
 async def kigyo_is_admin(chat_id: int):
-    status = False
-    kigyo = await telethn.get_me()
-    async for user in telethn.iter_participants(
-            chat_id, filter=ChannelParticipantsAdmins):
-        if kigyo.id == user.id:
-            status = True
-            break
-    return status
+    # getChatAdministrators leaves bots out, so this comes from the shared bot member cache
+    kigyo = await asyncio.get_running_loop().run_in_executor(None, get_bot_member, chat_id)
+    return kigyo.status == "administrator"
 
 
 async def is_user_in_chat(chat_id: int, user_id: int):
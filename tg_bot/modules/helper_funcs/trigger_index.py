@@ -0,0 +1,108 @@
+import re
+import threading
+from typing import Dict, Iterable, List, Optional
+
+
+def trigger_priority(trigger: str):
+    # longest trigger first, then alphabetical; the order filters and warn filters have always been checked in
+    return -len(trigger), trigger
+
+
+class TriggerIndex:
+    """
+    Keeps the keyword triggers of every chat and matches a message against all of them
+    with one compiled pattern per chat, instead of one re.search per trigger.
+
+    A trigger matches when it is surrounded by the start/end of the text or a non-word char,
+    which is what `( |^|[^\\w])` + trigger + `( |$|[^\\w])` did before. Every trigger gets its
+    own group, so the matched trigger is known from `lastindex` without another lookup, and
+    the alternation is ordered by trigger_priority so the returned trigger is the same one the
+    old loop would have hit first.
+
+    Only the chat that changed gets recompiled, and only on its next match.
+    """
+
+    def __init__(self):
+        self._triggers: Dict[str, List[str]] = {}
+        self._compiled: Dict[str, Optional[tuple]] = {}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _compile(triggers: List[str]) -> re.Pattern:
+        alternation = "|".join("({})".format(re.escape(trigger)) for trigger in triggers)
+        # zero-width lookahead, so overlapping candidates at every position are seen by finditer
+        return re.compile(r"(?=(?<!\w)(?:" + alternation + r")(?!\w))", flags=re.IGNORECASE)
+
+    def set(self, chat_id, triggers: Iterable[str]):
+        with self._lock:
+            self._triggers[str(chat_id)] = sorted(set(triggers), key=trigger_priority)
+            self._compiled.pop(str(chat_id), None)
+
+    def add(self, chat_id, trigger: str):
+        with self._lock:
+            triggers = self._triggers.get(str(chat_id), [])
+            if trigger in triggers:
+                return
+            self._triggers[str(chat_id)] = sorted(triggers + [trigger], key=trigger_priority)
+            self._compiled.pop(str(chat_id), None)
+
+    def remove(self, chat_id, trigger: str):
+        with self._lock:
+            triggers = self._triggers.get(str(chat_id))
+            if not triggers or trigger not in triggers:
+                return
+            triggers = [t for t in triggers if t != trigger]
+            if triggers:
+                self._triggers[str(chat_id)] = triggers
+            else:
+                del self._triggers[str(chat_id)]
+            self._compiled.pop(str(chat_id), None)
+
+    def clear(self, chat_id):
+        with self._lock:
+            self._triggers.pop(str(chat_id), None)
+            self._compiled.pop(str(chat_id), None)
+
+    def migrate(self, old_chat_id, new_chat_id):
+        with self._lock:
+            triggers = self._triggers.pop(str(old_chat_id), None)
+            self._compiled.pop(str(old_chat_id), None)
+            if triggers:
+                self._triggers[str(new_chat_id)] = triggers
+                self._compiled.pop(str(new_chat_id), None)
+
+    def triggers(self, chat_id) -> List[str]:
+        return self._triggers.get(str(chat_id), [])
+
+    def _pattern(self, chat_id: str):
+        try:
+            return self._compiled[chat_id]
+        except KeyError:
+            pass
+        with self._lock:
+            if chat_id in self._compiled:
+                return self._compiled[chat_id]
+            triggers = self._triggers.get(chat_id)
+            pattern = (self._compile(triggers), triggers) if triggers else None
+            self._compiled[chat_id] = pattern
+            return pattern
+
+    def match(self, chat_id, text: str) -> Optional[str]:
+        """
+        Return the highest priority trigger of the chat found in text, or None
+        """
+        if not text:
+            return None
+        compiled = self._pattern(str(chat_id))
+        if not compiled:
+            return None
+        pattern, triggers = compiled
+
+        best = None
+        for m in pattern.finditer(text):
+            # groups are numbered in priority order, the first one can't be beaten
+            if best is None or m.lastindex < best:
+                best = m.lastindex
+                if best == 1:
+                    break
+        return triggers[best - 1] if best else None
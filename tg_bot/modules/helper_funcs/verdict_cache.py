@@ -0,0 +1,148 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from time import monotonic
+from typing import Any, Callable, Dict, Optional
+
+from cachetools import TTLCache
+
+from tg_bot import (
+    log,
+    sw,
+    sibylClient,
+    SW_BAN_TTL,
+    SW_CLEAN_TTL,
+    SW_TIMEOUT,
+    SIBYL_BAN_TTL,
+    SIBYL_CLEAN_TTL,
+    SIBYL_TIMEOUT,
+)
+
+
+class VerdictCache:
+    """
+    Bounded cache of what an external ban list (SpamWatch, Sibyl) says about a user id.
+    Flagged and clean users have their own TTL, so a clean user is looked up again much sooner
+    than a known spammer.
+
+    Lookups run on a small pool of their own, callers wait at most `timeout` seconds and get
+    None for a lookup that hasn't answered by then. The verdict still lands in the cache when
+    it arrives, so the user's next message is checked against it.
+    """
+
+    def __init__(self, name: str, lookup: Optional[Callable[[int], Any]], flagged: Callable[[Any], bool],
+                 flagged_ttl: int, clean_ttl: int, timeout: float,
+                 maxsize: int = 50000, workers: int = 4, max_pending: int = 64):
+        self.name = name
+        self.lookup = lookup
+        self.flagged = flagged
+        self.timeout = timeout
+        self._flagged = TTLCache(maxsize=maxsize, ttl=flagged_ttl)
+        self._clean = TTLCache(maxsize=maxsize, ttl=clean_ttl)
+        self._inflight: Dict[int, Future] = {}
+        self._max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self.hits = 0
+        self.misses = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.skipped = 0
+        self.fetches = 0
+        self.upstream_time = 0.0
+        self.max_upstream_time = 0.0
+
+    def get(self, user_id: int, timeout: Optional[float] = None):
+        """
+        Return the verdict for a user, or None if it didn't come in time or the lookup failed.
+        timeout defaults to the one the cache was configured with.
+        """
+        if self.lookup is None:
+            return None
+        user_id = int(user_id)
+        with self._lock:
+            for cache in (self._flagged, self._clean):
+                try:
+                    verdict = cache[user_id]
+                except KeyError:
+                    continue
+                self.hits += 1
+                return verdict
+            self.misses += 1
+            flight = self._inflight.get(user_id)
+            if flight is None:
+                if len(self._inflight) >= self._max_pending:
+                    # the upstream is slow or down, don't queue up lookups nobody will wait for
+                    self.skipped += 1
+                    return None
+                flight = self._inflight[user_id] = self._pool.submit(self._fetch, user_id)
+
+        try:
+            return flight.result(timeout=self.timeout if timeout is None else timeout)
+        except TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            return None
+        except Exception:
+            # already logged and counted by _fetch
+            return None
+
+    def forget(self, user_id: int):
+        with self._lock:
+            self._flagged.pop(int(user_id), None)
+            self._clean.pop(int(user_id), None)
+
+    def _fetch(self, user_id: int):
+        start = monotonic()
+        try:
+            verdict = self.lookup(user_id)
+        except Exception as e:
+            log.warning(f" {self.name} Error: {e}")
+            with self._lock:
+                self.errors += 1
+                del self._inflight[user_id]
+            raise
+
+        elapsed = monotonic() - start
+        with self._lock:
+            if self.flagged(verdict):
+                self._flagged[user_id] = verdict
+            else:
+                self._clean[user_id] = verdict
+            del self._inflight[user_id]
+            self.fetches += 1
+            self.upstream_time += elapsed
+            self.max_upstream_time = max(self.max_upstream_time, elapsed)
+        return verdict
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "flagged": len(self._flagged),
+            "clean": len(self._clean),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups * 100 if lookups else 0,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "fetches": self.fetches,
+            "avg_upstream_ms": self.upstream_time / self.fetches * 1000 if self.fetches else 0,
+            "max_upstream_ms": self.max_upstream_time * 1000,
+        }
+
+
+# the Ban of a user, or None when spamwatch doesn't know them
+SW_CACHE = VerdictCache(
+    "SpamWatch",
+    (lambda user_id: sw.get_ban(user_id) or None) if sw else None,
+    lambda ban: ban is not None,
+    flagged_ttl=SW_BAN_TTL, clean_ttl=SW_CLEAN_TTL, timeout=SW_TIMEOUT,
+)
+
+# the sibyl info of a user, check .banned
+SIBYL_CACHE = VerdictCache(
+    "Sibyl",
+    sibylClient.get_info if sibylClient else None,
+    lambda data: bool(data.banned),
+    flagged_ttl=SIBYL_BAN_TTL, clean_ttl=SIBYL_CLEAN_TTL, timeout=SIBYL_TIMEOUT,
+)
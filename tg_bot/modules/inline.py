@@ -22,9 +22,10 @@ from tg_bot import (
     DEV_USERS,
     WHITELIST_USERS,
     SYS_ADMIN,
-    sw, log
+    log
 )
 from .helper_funcs.misc import article
+from .helper_funcs.verdict_cache import SW_CACHE
 from .helper_funcs.decorators import kiginline
 from tg_bot.__main__ import USER_INFO
 
@@ -175,8 +176,8 @@ def inlineinfo(query: str, update: Update, context: CallbackContext) -> None:
         + MOD_USERS
         ):
         try:
-            spamwtc = sw.get_ban(int(user.id))
-            if sw.get_ban(int(user.id)):
+            spamwtc = SW_CACHE.get(int(user.id), timeout=5)
+            if spamwtc:
                 text += "<b>\nSpamWatch:\n</b>"
                 text += "ㅤ<b>This person is banned in Spamwatch!</b>"
                 text += f"\nㅤ<b>Reason:</b> <pre>{spamwtc.reason}</pre>"
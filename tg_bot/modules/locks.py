@@ -3,7 +3,7 @@ import ast
 from telegram import Message, Chat, ParseMode, MessageEntity, message
 from telegram import TelegramError, ChatPermissions
 from telegram.error import BadRequest
-from telegram.ext import Filters
+from telegram.ext import Filters, MessageFilter
 from telegram.utils.helpers import mention_html
 from .helper_funcs.chat_status import connection_status
 from .helper_funcs.decorators import kigcmd, kigmsg
@@ -105,6 +105,15 @@ PERM_GROUP = -8
 REST_GROUP = -12
 
 
+class _ChatHasLocks(MessageFilter):
+    # chats without any lock skip del_lockables before the admin check runs
+    def filter(self, message: Message):
+        return bool(sql.get_lock_mask(message.chat.id))
+
+
+chat_has_locks = _ChatHasLocks()
+
+
 # NOT ASYNC
 def restr_members(
     bot, chat_id, members, messages=False, media=False, other=False, previews=False
@@ -289,17 +298,22 @@ def unlock(update, context) -> str:  # sourcery no-metrics
 
     return ""
 
-@kigmsg((Filters.all & Filters.chat_type.groups), group=PERM_GROUP)
+@kigmsg((Filters.chat_type.groups & chat_has_locks), group=PERM_GROUP)
 @user_not_admin_check
 def del_lockables(update, context):  # sourcery no-metrics
     chat = update.effective_chat  # type: Optional[Chat]
     message = update.effective_message  # type: Optional[Message]
     user = message.sender_chat or update.effective_user
+    lock_mask = sql.get_lock_mask(chat.id)
+    if not lock_mask:
+        return
     if is_approved(chat.id, user.id):
         return
     for lockable, filter in LOCK_TYPES.items():
+        if not lock_mask & sql.LOCK_BITS[lockable]:
+            continue
         if lockable == "rtl":
-            if sql.is_locked(chat.id, lockable) and bot_is_admin(chat, AdminPerms.CAN_DELETE_MESSAGES):
+            if bot_is_admin(chat, AdminPerms.CAN_DELETE_MESSAGES):
                 if message.caption:
                     check = ad.detect_alphabet(u"{}".format(message.caption))
                     if "ARABIC" in check:
@@ -325,8 +339,7 @@ def del_lockables(update, context):  # sourcery no-metrics
             continue
         if lockable == "button":
             if (
-                sql.is_locked(chat.id, lockable)
-                and bot_is_admin(chat, AdminPerms.CAN_DELETE_MESSAGES)
+                bot_is_admin(chat, AdminPerms.CAN_DELETE_MESSAGES)
                 and message.reply_markup
                 and message.reply_markup.inline_keyboard
             ):
@@ -341,8 +354,7 @@ def del_lockables(update, context):  # sourcery no-metrics
             continue
         if lockable == "inline":
             if (
-                sql.is_locked(chat.id, lockable)
-                and bot_is_admin(chat, AdminPerms.CAN_DELETE_MESSAGES)
+                bot_is_admin(chat, AdminPerms.CAN_DELETE_MESSAGES)
                 and message
                 and message.via_bot
             ):
@@ -357,7 +369,6 @@ def del_lockables(update, context):  # sourcery no-metrics
             continue
         if (
             filter(update)
-            and sql.is_locked(chat.id, lockable)
             and bot_is_admin(chat, AdminPerms.CAN_DELETE_MESSAGES)
         ):
             if lockable == "bots":
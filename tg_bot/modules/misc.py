@@ -2,7 +2,8 @@ import html
 from typing import Union
 
 from telegram.user import User
-from tg_bot.antispam import GLOBAL_USER_DATA, Owner
+from tg_bot.antispam import Owner
+import tg_bot.antispam as antispam
 import time
 import git
 import requests
@@ -23,7 +24,6 @@ from tg_bot import (
     WHITELIST_USERS,
     INFOPIC,
     spamcheck,
-    sw,
     StartTime,
     SYS_ADMIN,
 )
@@ -31,6 +31,7 @@ from tg_bot.__main__ import STATS, USER_INFO, TOKEN
 from .sql import SESSION
 from .helper_funcs.chat_status import dev_plus, sudo_plus
 from .helper_funcs.extraction import extract_user
+from .helper_funcs.verdict_cache import SW_CACHE
 import tg_bot.modules.sql.users_sql as sql
 from .language import gs
 from telegram import __version__ as ptbver, InlineKeyboardMarkup, InlineKeyboardButton
@@ -130,8 +131,8 @@ def gifid(update: Update, _):
 
 @kigcmd(command='print', pass_args=True, filters=Filters.user(SYS_ADMIN) | Filters.user(OWNER_ID))
 def printdata(update: Update, context: CallbackContext):  # sourcery no-metrics
-    print(GLOBAL_USER_DATA)
-    gd = str(GLOBAL_USER_DATA)
+    gd = str(antispam.stats())
+    print(gd)
     dispatcher.bot.sendMessage(Owner, "`{}`".format(gd), parse_mode="markdown")
 
 
@@ -139,12 +140,11 @@ def printdata(update: Update, context: CallbackContext):  # sourcery no-metrics
 def resetglobaldata(update: Update, context: CallbackContext):
     bot = context.bot
     from .eval import log_input, send
-    global GLOBAL_USER_DATA
     log_input(update)
-    gd = str(GLOBAL_USER_DATA)
+    gd = str(antispam.stats())
     dispatcher.bot.sendMessage(Owner, "`{}`".format(gd), parse_mode="markdown")
     try:
-        GLOBAL_USER_DATA = {}
+        antispam.reset()
     except Exception as e:
         dispatcher.bot.sendMessage(Owner, "global error\n`{}`".format(str(e)), parse_mode="markdown")
     send("done", bot, update)
@@ -312,8 +312,8 @@ def get_user_info(user, chat, full_info=False):
                 pass #text += ""
         else:
             try:
-                spamwtc = sw.get_ban(int(user.id))
-                if sw.get_ban(int(user.id)):
+                spamwtc = SW_CACHE.get(int(user.id), timeout=5)
+                if spamwtc:
                     text += "<b>\nSpamWatch:\n</b>"
                     text += "ㅤ<b>This person is banned in Spamwatch!</b>"
                     text += f"\nㅤ<b>Reason:</b> <pre>{spamwtc.reason}</pre>"
@@ -66,12 +66,12 @@ def report(update: Update, context: CallbackContext) -> str:
     chat = update.effective_chat
     user = update.effective_user
     
-    log_setting = logsql.get_chat_setting(chat.id)
+    log_setting = context.chat_config.log_settings
     if not log_setting:
         logsql.set_chat_setting(logsql.LogChannelSettings(chat.id, True, True, True, True, True))
-        log_setting = logsql.get_chat_setting(chat.id)
+        log_setting = context.chat_config.log_settings
 
-    if chat and message.reply_to_message and sql.chat_should_report(chat.id):
+    if chat and message.reply_to_message and context.chat_config.report:
         reported_user = message.reply_to_message.from_user
 
         if user.id == reported_user.id:
@@ -86,7 +86,7 @@ def report(update: Update, context: CallbackContext) -> str:
             message.reply_text("Uh? You reporting a Super user?")
             return ""
 
-        admin_list = [i.user.id for i in A_CACHE[chat.id] if not (i.user.is_bot or i.is_anonymous)]
+        admin_list = [i.user.id for i in A_CACHE.get(chat.id).values() if not (i.user.is_bot or i.is_anonymous)]
 
         if reported_user.id in admin_list:
             message.reply_text("Why are you reporting an admin?")
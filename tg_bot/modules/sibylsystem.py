@@ -1,6 +1,8 @@
+import threading
 from enum import Enum
 from typing import Optional
 
+from cachetools import TTLCache
 from SibylSystem import GeneralException
 from telegram import Bot, Chat, Message, MessageEntity, Update, InlineKeyboardButton, InlineKeyboardMarkup, User
 from telegram.error import BadRequest
@@ -10,10 +12,11 @@ from telegram.parsemode import ParseMode
 from telegram.utils import helpers
 from telegram.utils.helpers import mention_html
 
-from .helper_funcs.admin_status import user_admin_check, bot_admin_check, AdminPerms, user_is_admin, bot_is_admin
+from .helper_funcs.admin_status import user_admin_check, bot_admin_check, AdminPerms, user_is_admin, bot_is_admin, get_mem_from_cache
 from .helper_funcs.chat_status import connection_status
 from .helper_funcs.decorators import kigcmd, kigmsg, kigcallback as kigcb
 from .helper_funcs.extraction import extract_user
+from .helper_funcs.verdict_cache import SIBYL_CACHE
 from .log_channel import loggable
 from .sql.sibylsystem_sql import (
     SIBYLBAN_SETTINGS,
@@ -24,7 +27,7 @@ from .sql.sibylsystem_sql import (
     toggle_sibyl_mode,
 )
 from .sql.users_sql import get_user_com_chats
-from .. import dispatcher, sibylClient, log
+from .. import dispatcher, sibylClient, log, SIBYL_CLEAN_TTL
 
 log.info("For support reach out to @PublicSafetyBureau on Telegram | Powered by @Kaizoku")
 
@@ -39,6 +42,22 @@ def get_sibyl_setting(chat_id):
     return log_stat, act
 
 
+# (chat_id, user_id) -> the sibyl mode the user was last let through under, while the chat
+# stays in that mode they aren't looked up again until the marker expires
+SIBYL_VETTED = TTLCache(maxsize=100000, ttl=SIBYL_CLEAN_TTL)
+SIBYL_VETTED_LOCK = threading.Lock()
+
+
+def is_vetted(chat_id: int, user_id: int, act: int) -> bool:
+    with SIBYL_VETTED_LOCK:
+        return SIBYL_VETTED.get((chat_id, user_id)) == act
+
+
+def mark_vetted(chat_id: int, user_id: int, act: int):
+    with SIBYL_VETTED_LOCK:
+        SIBYL_VETTED[(chat_id, user_id)] = act
+
+
 @kigmsg(Filters.chat_type.groups, group=101)
 # @bot_admin_check(AdminPerms.CAN_RESTRICT_MEMBERS)
 @loggable
@@ -52,22 +71,24 @@ def sibyl_ban(update: Update, context: CallbackContext) -> Optional[str]:
     if not does_chat_sibylban(chat.id):
         return
 
-    mem = chat.get_member(user.id)
-    if mem.status not in ["member", "left"]:
+    log_stat, act = get_sibyl_setting(chat.id)
+    if is_vetted(chat.id, user.id, act):
+        return
+
+    # admins are never acted on, the shared admin cache answers that without an api call
+    if get_mem_from_cache(user.id, chat.id):
+        mark_vetted(chat.id, user.id, act)
         return
 
     if sibylClient:
-        log_stat, act = get_sibyl_setting(chat.id)
-        try:
-            data = sibylClient.get_info(user.id)
-        except GeneralException:
+        data = SIBYL_CACHE.get(user.id)
+        if data is None:  # timed out or failed, the next message tries again
             return
 
-        except BaseException as e:
-            log.error(e)
-            return
+        if not (data.banned and act in {1, 2}):
+            mark_vetted(chat.id, user.id, act)
 
-        if data.banned and act in {1, 2}:
+        else:
             try:
                 bot.ban_chat_member(chat_id=chat.id, user_id=user.id)
             except BadRequest:
@@ -114,13 +135,9 @@ def sibyl_ban_alert(update: Update, context: CallbackContext) -> Optional[str]:
             return
 
         for user in users:
-            try:
-                data = sibylClient.get_info(user.id)
-            except GeneralException:
-                return
-            except BaseException as e:
-                log.error(e)
-                return
+            data = SIBYL_CACHE.get(user.id)
+            if data is None:
+                continue
 
             if data.banned:
                 txt = '''{} has a <a href="https://t.me/SibylSystem/3">Crime Coefficient</a> of {}\n'''.format(
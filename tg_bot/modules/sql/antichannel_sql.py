@@ -4,6 +4,7 @@ from sqlalchemy import Boolean
 from sqlalchemy.sql.sqltypes import String
 from sqlalchemy import Column
 
+from tg_bot.modules.helper_funcs.chat_config import CHAT_CONFIGS
 from tg_bot.modules.sql import BASE, SESSION
 
 
@@ -34,6 +35,7 @@ def enable_antichannel(chat_id: int):
         chat.setting = True
         SESSION.add(chat)
         SESSION.commit()
+        CHAT_CONFIGS.invalidate(chat_id, "antichannel")
 
 
 def disable_antichannel(chat_id: int):
@@ -45,14 +47,18 @@ def disable_antichannel(chat_id: int):
         chat.setting = False
         SESSION.add(chat)
         SESSION.commit()
+        CHAT_CONFIGS.invalidate(chat_id, "antichannel")
 
 
 def antichannel_status(chat_id: int) -> bool:
     with ANTICHANNEL_SETTING_LOCK:
-        d = SESSION.query(AntiChannelSettings).get(str(chat_id))
-        if not d:
-            return False
-        return d.setting
+        try:
+            d = SESSION.query(AntiChannelSettings).get(str(chat_id))
+            if not d:
+                return False
+            return d.setting
+        finally:
+            SESSION.close()
 
 
 def migrate_chat(old_chat_id, new_chat_id):
@@ -63,3 +69,7 @@ def migrate_chat(old_chat_id, new_chat_id):
             SESSION.add(chat)
 
         SESSION.commit()
+        CHAT_CONFIGS.migrate(old_chat_id, new_chat_id)
+
+
+CHAT_CONFIGS.register("antichannel", antichannel_status)
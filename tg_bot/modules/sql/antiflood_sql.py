@@ -1,7 +1,11 @@
 import threading
+import time
+from typing import Optional
 
 from sqlalchemy import String, Column, Integer, UnicodeText, BigInteger
 
+from tg_bot.modules.helper_funcs.chat_config import CHAT_CONFIGS
+from tg_bot.modules.helper_funcs.rate_tracker import RecentEvents
 from tg_bot.modules.sql import SESSION, BASE
 
 DEF_COUNT = 0
@@ -38,13 +42,33 @@ class FloodSettings(BASE):
         return "<{} will executing {} for flood.>".format(self.chat_id, self.flood_type)
 
 
+class FloodTimer(BASE):
+    __tablename__ = "antiflood_timer"
+    chat_id = Column(String(14), primary_key=True)
+    count = Column(Integer, nullable=False)
+    seconds = Column(Integer, nullable=False)
+
+    def __init__(self, chat_id, count, seconds):
+        self.chat_id = str(chat_id)
+        self.count = count
+        self.seconds = seconds
+
+    def __repr__(self):
+        return "<flood timer for {}: {} in {}s>".format(self.chat_id, self.count, self.seconds)
+
+
 FloodControl.__table__.create(checkfirst=True)
 FloodSettings.__table__.create(checkfirst=True)
+FloodTimer.__table__.create(checkfirst=True)
 
 INSERTION_FLOOD_LOCK = threading.RLock()
 INSERTION_FLOOD_SETTINGS_LOCK = threading.RLock()
 
 CHAT_FLOOD = {}
+# chat_id -> (count, seconds), flood is count messages of one user within seconds
+CHAT_FLOOD_TIMER = {}
+# message times per (chat_id, user_id), only for chats with a flood timer
+RECENT_MESSAGES = RecentEvents()
 
 
 def set_flood(chat_id, amount):
@@ -62,7 +86,47 @@ def set_flood(chat_id, amount):
         SESSION.commit()
 
 
-def update_flood(chat_id: str, user_id) -> bool:
+def set_flood_timer(chat_id, count, seconds):
+    """
+    Flood is also count messages of one user within seconds, a count of 0 turns that off
+    """
+    with INSERTION_FLOOD_LOCK:
+        timer = SESSION.query(FloodTimer).get(str(chat_id))
+        if not count:
+            if timer:
+                SESSION.delete(timer)
+            CHAT_FLOOD_TIMER.pop(str(chat_id), None)
+        else:
+            if not timer:
+                timer = FloodTimer(chat_id, count, seconds)
+            timer.count = count
+            timer.seconds = seconds
+            SESSION.add(timer)
+            CHAT_FLOOD_TIMER[str(chat_id)] = (count, seconds)
+        SESSION.commit()
+        RECENT_MESSAGES.forget(lambda key: key[0] == str(chat_id))
+
+
+def get_flood_timer(chat_id):
+    return CHAT_FLOOD_TIMER.get(str(chat_id), (0, 0))
+
+
+def update_flood(chat_id: str, user_id, now: Optional[float] = None) -> bool:
+    """
+    Count a message of user_id, True if it's flooding. user_id None (an admin talking) only
+    breaks a run of consecutive messages.
+    """
+    timer = CHAT_FLOOD_TIMER.get(str(chat_id))
+    timed_flood = False
+    if timer and user_id is not None:
+        count, seconds = timer
+        timed_flood = RECENT_MESSAGES.hit(
+            (str(chat_id), user_id), time.time() if now is None else now, count, seconds
+        )
+    return __update_consecutive_flood(chat_id, user_id) or timed_flood
+
+
+def __update_consecutive_flood(chat_id, user_id) -> bool:
     if str(chat_id) in CHAT_FLOOD:
         curr_user_id, count, limit = CHAT_FLOOD.get(str(chat_id), DEF_OBJ)
 
@@ -106,6 +170,7 @@ def set_flood_strength(chat_id, flood_type, value):
 
         SESSION.add(curr_setting)
         SESSION.commit()
+        CHAT_CONFIGS.invalidate(chat_id, "flood_setting")
 
 
 def get_flood_setting(chat_id):
@@ -126,9 +191,15 @@ def migrate_chat(old_chat_id, new_chat_id):
         if flood:
             CHAT_FLOOD[str(new_chat_id)] = CHAT_FLOOD.get(str(old_chat_id), DEF_OBJ)
             flood.chat_id = str(new_chat_id)
-            SESSION.commit()
-
-        SESSION.close()
+        timer = SESSION.query(FloodTimer).get(str(old_chat_id))
+        if timer:
+            CHAT_FLOOD_TIMER[str(new_chat_id)] = CHAT_FLOOD_TIMER.pop(str(old_chat_id))
+            timer.chat_id = str(new_chat_id)
+        setting = SESSION.query(FloodSettings).get(str(old_chat_id))
+        if setting:
+            setting.chat_id = str(new_chat_id)
+        SESSION.commit()
+        CHAT_CONFIGS.migrate(old_chat_id, new_chat_id)
 
 
 def __load_flood_settings():
@@ -140,4 +211,14 @@ def __load_flood_settings():
         SESSION.close()
 
 
+def __load_flood_timers():
+    global CHAT_FLOOD_TIMER
+    try:
+        CHAT_FLOOD_TIMER = {x.chat_id: (x.count, x.seconds) for x in SESSION.query(FloodTimer).all()}
+    finally:
+        SESSION.close()
+
+
+CHAT_CONFIGS.register("flood_setting", get_flood_setting)
 __load_flood_settings()
+__load_flood_timers()
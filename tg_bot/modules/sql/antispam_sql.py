@@ -1,8 +1,10 @@
 import threading
+import time
 
-from sqlalchemy import Column, UnicodeText, String, Boolean
+from sqlalchemy import Column, UnicodeText, String, Boolean, Integer
 from sqlalchemy.sql.sqltypes import BigInteger
 
+from tg_bot.modules.helper_funcs.reputation import REPUTATION, GBANNED
 from tg_bot.modules.sql import BASE, SESSION
 
 
@@ -37,12 +39,60 @@ class GbanSettings(BASE):
         return "<Gban setting {} ({})>".format(self.chat_id, self.setting)
 
 
+class GbanPropagation(BASE):
+    """
+    A gban or ungban still being carried out in the user's chats, chats[:done] are finished
+    """
+    __tablename__ = "gban_propagation"
+    user_id = Column(BigInteger, primary_key=True)
+    action = Column(String(6), nullable=False)
+    # ms timestamp, tells a propagation apart from the one that replaced it
+    started = Column(BigInteger, nullable=False)
+    chats = Column(UnicodeText, nullable=False)
+    done = Column(Integer, default=0, nullable=False)
+    affected = Column(Integer, default=0, nullable=False)
+    failed = Column(Integer, default=0, nullable=False)
+    log_message = Column(UnicodeText)
+    progress_chat = Column(BigInteger)
+    progress_message = Column(BigInteger)
+
+    def __init__(self, user_id, action, chats, log_message=None, progress_chat=None, progress_message=None):
+        self.user_id = user_id
+        self.action = action
+        self.started = int(time.time() * 1000)
+        self.chats = " ".join(str(x) for x in chats)
+        self.done = 0
+        self.affected = 0
+        self.failed = 0
+        self.log_message = log_message
+        self.progress_chat = progress_chat
+        self.progress_message = progress_message
+
+    def __repr__(self):
+        return "<Gban propagation {} of {} ({} done)>".format(self.action, self.user_id, self.done)
+
+    def to_dict(self):
+        return {
+            "user_id": self.user_id,
+            "action": self.action,
+            "started": self.started,
+            "chats": [int(x) for x in self.chats.split()],
+            "done": self.done,
+            "affected": self.affected,
+            "failed": self.failed,
+            "log_message": self.log_message,
+            "progress_chat": self.progress_chat,
+            "progress_message": self.progress_message,
+        }
+
+
 GloballyBannedUsers.__table__.create(checkfirst=True)
 GbanSettings.__table__.create(checkfirst=True)
+GbanPropagation.__table__.create(checkfirst=True)
 
 GBANNED_USERS_LOCK = threading.RLock()
 GBAN_SETTING_LOCK = threading.RLock()
-GBANNED_LIST = set()
+GBAN_PROPAGATION_LOCK = threading.RLock()
 GBANSTAT_LIST = set()
 
 
@@ -57,7 +107,7 @@ def gban_user(user_id, name, reason=None):
 
         SESSION.merge(user)
         SESSION.commit()
-        __load_gbanned_userid_list()
+        REPUTATION.flag(user_id, GBANNED)
 
 
 def update_gban_reason(user_id, name, reason=None):
@@ -81,11 +131,11 @@ def ungban_user(user_id):
             SESSION.delete(user)
 
         SESSION.commit()
-        __load_gbanned_userid_list()
+        REPUTATION.unflag(user_id, GBANNED)
 
 
 def is_user_gbanned(user_id):
-    return user_id in GBANNED_LIST
+    return REPUTATION.has(user_id, GBANNED)
 
 
 def get_gbanned_user(user_id):
@@ -132,13 +182,63 @@ def does_chat_gban(chat_id):
 
 
 def num_gbanned_users():
-    return len(GBANNED_LIST)
+    return REPUTATION.count(GBANNED)
+
+
+def start_gban_propagation(user_id, action, chats, log_message=None, progress_chat=None, progress_message=None):
+    """
+    Record a new propagation, replacing whatever propagation the user still had running.
+    Returns its started stamp, checkpoints have to present it.
+    """
+    with GBAN_PROPAGATION_LOCK:
+        job = GbanPropagation(user_id, action, chats, log_message, progress_chat, progress_message)
+        SESSION.merge(job)
+        SESSION.commit()
+        return job.started
+
+
+def get_gban_propagation(user_id):
+    try:
+        job = SESSION.query(GbanPropagation).get(user_id)
+        return job.to_dict() if job else None
+    finally:
+        SESSION.close()
+
+
+def checkpoint_gban_propagation(user_id, started, done, affected, failed):
+    """
+    Save how far a propagation got, returns False if it was replaced or finished meanwhile
+    """
+    with GBAN_PROPAGATION_LOCK:
+        job = SESSION.query(GbanPropagation).get(user_id)
+        if not job or job.started != started:
+            SESSION.close()
+            return False
+        job.done = done
+        job.affected = affected
+        job.failed = failed
+        SESSION.commit()
+        return True
+
+
+def finish_gban_propagation(user_id, started):
+    with GBAN_PROPAGATION_LOCK:
+        job = SESSION.query(GbanPropagation).get(user_id)
+        if job and job.started == started:
+            SESSION.delete(job)
+        SESSION.commit()
+
+
+def get_pending_gban_propagations():
+    try:
+        return [x.user_id for x in SESSION.query(GbanPropagation.user_id).all()]
+    finally:
+        SESSION.close()
 
 
 def __load_gbanned_userid_list():
-    global GBANNED_LIST
     try:
-        GBANNED_LIST = {x.user_id for x in SESSION.query(GloballyBannedUsers).all()}
+        REPUTATION.load(GBANNED, (x.user_id for x in SESSION.query(GloballyBannedUsers.user_id)))
     finally:
         SESSION.close()
 
@@ -1,3 +1,4 @@
+import sys
 import threading
 
 from sqlalchemy import Column, String, UnicodeText, Integer, func, distinct
@@ -23,19 +24,20 @@ Approvals.__table__.create(checkfirst=True)
 
 APPROVE_INSERTION_LOCK = threading.RLock()
 
+# chat_id -> set of approved user ids, checked on every message by the moderation modules
+CHAT_APPROVALS = {}
+
 
 def approve(chat_id, user_id):
     with APPROVE_INSERTION_LOCK:
         approve_user = Approvals(str(chat_id), user_id)
         SESSION.add(approve_user)
         SESSION.commit()
+        CHAT_APPROVALS.setdefault(str(chat_id), set()).add(int(user_id))
 
 
 def is_approved(chat_id, user_id):
-    try:
-        return SESSION.query(Approvals).get((str(chat_id), user_id))
-    finally:
-        SESSION.close()
+    return int(user_id) in CHAT_APPROVALS.get(str(chat_id), ())
 
 
 def disapprove(chat_id, user_id):
@@ -44,6 +46,11 @@ def disapprove(chat_id, user_id):
         if disapprove_user:
             SESSION.delete(disapprove_user)
             SESSION.commit()
+            approved = CHAT_APPROVALS.get(str(chat_id))
+            if approved is not None:
+                approved.discard(int(user_id))
+                if not approved:
+                    del CHAT_APPROVALS[str(chat_id)]
             return True
         else:
             SESSION.close()
@@ -57,3 +64,38 @@ def list_approved(chat_id):
                 Approvals.user_id.asc()).all())
     finally:
         SESSION.close()
+
+
+def migrate_chat(old_chat_id, new_chat_id):
+    with APPROVE_INSERTION_LOCK:
+        approvals = SESSION.query(Approvals).filter(Approvals.chat_id == str(old_chat_id)).all()
+        for approval in approvals:
+            approval.chat_id = str(new_chat_id)
+        SESSION.commit()
+        if str(old_chat_id) in CHAT_APPROVALS:
+            CHAT_APPROVALS.setdefault(str(new_chat_id), set()).update(CHAT_APPROVALS.pop(str(old_chat_id)))
+
+
+def num_approved():
+    return sum(len(users) for users in CHAT_APPROVALS.values())
+
+
+def cache_size() -> int:
+    """
+    Approximate bytes held by CHAT_APPROVALS
+    """
+    size = sys.getsizeof(CHAT_APPROVALS)
+    for chat_id, users in CHAT_APPROVALS.copy().items():
+        size += sys.getsizeof(chat_id) + sys.getsizeof(users) + sum(sys.getsizeof(u) for u in users)
+    return size
+
+
+def __load_approvals():
+    try:
+        for approval in SESSION.query(Approvals).all():
+            CHAT_APPROVALS.setdefault(approval.chat_id, set()).add(int(approval.user_id))
+    finally:
+        SESSION.close()
+
+
+__load_approvals()
@@ -2,6 +2,8 @@ import threading
 
 from sqlalchemy import func, distinct, Column, String, UnicodeText, Integer
 
+from tg_bot.modules.helper_funcs.chat_config import CHAT_CONFIGS
+from tg_bot.modules.helper_funcs.trigger_index import TriggerIndex
 from tg_bot.modules.sql import SESSION, BASE
 
 
@@ -53,21 +55,30 @@ BLACKLIST_SETTINGS_INSERTION_LOCK = threading.RLock()
 
 CHAT_BLACKLISTS = {}
 CHAT_SETTINGS_BLACKLISTS = {}
+BLACKLIST_INDEX = TriggerIndex()
 
+# matching is one compiled pattern per chat, so this only guards against abuse
+MAX_BLACKLIST_TRIGGERS = 1000
 
-def add_to_blacklist(chat_id, trigger, action) -> bool:
+
+def add_to_blacklist(chat_id, trigger, action=0) -> bool:
     with BLACKLIST_FILTER_INSERTION_LOCK:
         global CHAT_BLACKLISTS
-        if len(CHAT_BLACKLISTS.get(str(chat_id), set())) >= 100:
+        chatbl = CHAT_BLACKLISTS.get(str(chat_id), set())
+        # re-adding a trigger only replaces its action
+        stale = {bl for bl in chatbl if bl[0] == trigger}
+        if not stale and len(chatbl) >= MAX_BLACKLIST_TRIGGERS:
             return False
         blacklist_filt = BlackListFilters(str(chat_id), trigger, action)
 
         SESSION.merge(blacklist_filt)  # merge to avoid duplicate key issues
         SESSION.commit()
-        if CHAT_BLACKLISTS.get(str(chat_id), set()) == set():
+        if chatbl == set():
             CHAT_BLACKLISTS[str(chat_id)] = {(trigger, action)}
         else:
-            CHAT_BLACKLISTS.get(str(chat_id), set()).add((trigger, action))
+            chatbl.difference_update(stale)
+            chatbl.add((trigger, action))
+        BLACKLIST_INDEX.add(chat_id, trigger)
         return True
 
 
@@ -79,6 +90,7 @@ def rm_from_blacklist(chat_id, trigger):
             bl = set(filter(lambda x: x[0] == trigger, chatbl)).pop()
             if bl in CHAT_BLACKLISTS.get(str(chat_id), set()):  # sanity check
                 CHAT_BLACKLISTS.get(str(chat_id), set()).remove(bl)
+            BLACKLIST_INDEX.remove(chat_id, trigger)
 
             SESSION.delete(blacklist_filt)
             SESSION.commit()
@@ -91,6 +103,19 @@ def get_chat_blacklist(chat_id):
     return CHAT_BLACKLISTS.get(str(chat_id), set())
 
 
+def match_blacklist(chat_id, text):
+    """
+    Return the (trigger, action) of the blacklist trigger found in text, or None
+    """
+    trigger = BLACKLIST_INDEX.match(chat_id, text)
+    if trigger is None:
+        return None
+    for bl in CHAT_BLACKLISTS.get(str(chat_id), set()).copy():
+        if bl[0] == trigger:
+            return bl
+    return None
+
+
 def num_blacklist_filters():
     try:
         return SESSION.query(BlackListFilters).count()
@@ -143,6 +168,7 @@ def set_blacklist_strength(chat_id, blacklist_type, value):
 
         SESSION.add(curr_setting)
         SESSION.commit()
+        CHAT_CONFIGS.invalidate(chat_id, "blacklist_settings")
 
 
 def get_blacklist_setting(chat_id):
@@ -169,6 +195,8 @@ def __load_chat_blacklists():
             CHAT_BLACKLISTS[x.chat_id] += [(x.trigger, x.trig_act)]
 
         CHAT_BLACKLISTS = {x: set(y) for x, y in CHAT_BLACKLISTS.items()}
+        for chat_id, chatbl in CHAT_BLACKLISTS.items():
+            BLACKLIST_INDEX.set(chat_id, (bl[0] for bl in chatbl))
 
     finally:
         SESSION.close()
@@ -198,7 +226,12 @@ def migrate_chat(old_chat_id, new_chat_id):
         for filt in chat_filters:
             filt.chat_id = str(new_chat_id)
         SESSION.commit()
+        if str(old_chat_id) in CHAT_BLACKLISTS:
+            CHAT_BLACKLISTS[str(new_chat_id)] = CHAT_BLACKLISTS.pop(str(old_chat_id))
+        BLACKLIST_INDEX.migrate(old_chat_id, new_chat_id)
+        CHAT_CONFIGS.migrate(old_chat_id, new_chat_id)
 
 
+CHAT_CONFIGS.register("blacklist_settings", get_blacklist_setting)
 __load_chat_blacklists()
 __load_chat_settings_blacklists()
@@ -2,6 +2,7 @@ import threading
 
 from sqlalchemy import Column, String, UnicodeText
 
+from tg_bot.modules.helper_funcs.reputation import REPUTATION, BLACKLISTED
 from tg_bot.modules.sql import BASE, SESSION
 
 
@@ -31,7 +32,8 @@ def blacklist_user(user_id, reason=None):
 
         SESSION.add(user)
         SESSION.commit()
-        __load_blacklist_userid_list()
+        BLACKLIST_USERS.add(int(user_id))
+        REPUTATION.flag(user_id, BLACKLISTED)
 
 
 def unblacklist_user(user_id):
@@ -41,7 +43,8 @@ def unblacklist_user(user_id):
             SESSION.delete(user)
 
         SESSION.commit()
-        __load_blacklist_userid_list()
+        BLACKLIST_USERS.discard(int(user_id))
+        REPUTATION.unflag(user_id, BLACKLISTED)
 
 
 def get_reason(user_id):
@@ -55,13 +58,14 @@ def get_reason(user_id):
 
 
 def is_user_blacklisted(user_id):
-    return user_id in BLACKLIST_USERS
+    return REPUTATION.has(user_id, BLACKLISTED)
 
 
 def __load_blacklist_userid_list():
     global BLACKLIST_USERS
     try:
         BLACKLIST_USERS = {int(x.user_id) for x in SESSION.query(BlacklistUsers).all()}
+        REPUTATION.load(BLACKLISTED, BLACKLIST_USERS)
     finally:
         SESSION.close()
 
@@ -1,6 +1,7 @@
 # from AstrakoBot
 import threading
 
+from tg_bot.modules.helper_funcs.chat_config import CHAT_CONFIGS
 from tg_bot.modules.sql import BASE, SESSION
 from sqlalchemy import Integer, String, Boolean, Column, UnicodeText
 
@@ -39,6 +40,21 @@ def get_clearcmd(chat_id, cmd):
         SESSION.close()
 
 
+def get_clearcmd_times(chat_id):
+    """
+    Return {cmd: time} of every clearcmd set in the chat
+    """
+    try:
+        return {
+            cmd: time
+            for cmd, time in SESSION.query(ClearCmd.cmd, ClearCmd.time).filter(
+                ClearCmd.chat_id == str(chat_id)
+            )
+        }
+    finally:
+        SESSION.close()
+
+
 def set_clearcmd(chat_id, cmd, time):
     with CLEAR_CMD_LOCK:
         clear_cmd = SESSION.query(ClearCmd).get((str(chat_id), cmd))
@@ -48,6 +64,7 @@ def set_clearcmd(chat_id, cmd, time):
         clear_cmd.time = time
         SESSION.add(clear_cmd)
         SESSION.commit()
+        CHAT_CONFIGS.invalidate(chat_id, "clearcmd")
 
 
 def del_clearcmd(chat_id, cmd):
@@ -56,6 +73,7 @@ def del_clearcmd(chat_id, cmd):
         if del_cmd:
             SESSION.delete(del_cmd)
             SESSION.commit()
+            CHAT_CONFIGS.invalidate(chat_id, "clearcmd")
             return True
         else:
             SESSION.close()
@@ -69,6 +87,7 @@ def del_allclearcmd(chat_id):
             for cmd in del_cmd:
                 SESSION.delete(cmd)
                 SESSION.commit()
+            CHAT_CONFIGS.invalidate(chat_id, "clearcmd")
             return True
         else:
             SESSION.close()
@@ -85,4 +104,8 @@ def migrate_chat(old_chat_id, new_chat_id):
         for filt in chat_filters:
             filt.chat_id = str(new_chat_id)
         SESSION.commit()
+        CHAT_CONFIGS.migrate(old_chat_id, new_chat_id)
+
+
+CHAT_CONFIGS.register("clearcmd", get_clearcmd_times)
 
@@ -3,6 +3,7 @@ import threading
 from sqlalchemy import Column, String, UnicodeText, Boolean, Integer, distinct, func
 
 from tg_bot.modules.helper_funcs.msg_types import Types
+from tg_bot.modules.helper_funcs.trigger_index import TriggerIndex
 from tg_bot.modules.sql import BASE, SESSION
 
 
@@ -122,6 +123,7 @@ Buttons.__table__.create(checkfirst=True)
 CUST_FILT_LOCK = threading.RLock()
 BUTTON_LOCK = threading.RLock()
 CHAT_FILTERS = {}
+FILTERS_INDEX = TriggerIndex()
 
 
 def get_all_filters():
@@ -179,6 +181,7 @@ def add_filter(
                 CHAT_FILTERS.get(str(chat_id), []) + [keyword],
                 key=lambda x: (-len(x), x),
             )
+        FILTERS_INDEX.add(chat_id, keyword)
 
         SESSION.add(filt)
         SESSION.commit()
@@ -227,6 +230,7 @@ def new_add_filter(chat_id, keyword, reply_text, file_type, file_id, buttons):
                 CHAT_FILTERS.get(str(chat_id), []) + [keyword],
                 key=lambda x: (-len(x), x),
             )
+        FILTERS_INDEX.add(chat_id, keyword)
 
         SESSION.add(filt)
         SESSION.commit()
@@ -242,6 +246,7 @@ def remove_filter(chat_id, keyword):
         if filt:
             if keyword in CHAT_FILTERS.get(str(chat_id), []):  # Sanity check
                 CHAT_FILTERS.get(str(chat_id), []).remove(keyword)
+            FILTERS_INDEX.remove(chat_id, keyword)
 
             with BUTTON_LOCK:
                 prev_buttons = (
@@ -264,6 +269,10 @@ def get_chat_triggers(chat_id):
     return CHAT_FILTERS.get(str(chat_id), set())
 
 
+def match_chat_trigger(chat_id, text):
+    return FILTERS_INDEX.match(chat_id, text)
+
+
 def get_chat_filters(chat_id):
     try:
         return (
@@ -332,6 +341,8 @@ def __load_chat_filters():
             x: sorted(set(y), key=lambda i: (-len(i), i))
             for x, y in CHAT_FILTERS.items()
         }
+        for chat_id, keywords in CHAT_FILTERS.items():
+            FILTERS_INDEX.set(chat_id, keywords)
 
     finally:
         SESSION.close()
@@ -388,7 +399,8 @@ def migrate_chat(old_chat_id, new_chat_id):
             CHAT_FILTERS[str(new_chat_id)] = CHAT_FILTERS[str(old_chat_id)]
         except KeyError:
             pass
-        del CHAT_FILTERS[str(old_chat_id)]
+        CHAT_FILTERS.pop(str(old_chat_id), None)
+        FILTERS_INDEX.migrate(old_chat_id, new_chat_id)
 
         with BUTTON_LOCK:
             chat_buttons = (
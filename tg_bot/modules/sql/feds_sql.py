@@ -1,10 +1,13 @@
 import threading
 import ast
+import sys
 from sqlalchemy import Column, String, UnicodeText, Integer, Boolean
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.sql.sqltypes import BigInteger
 from telegram.error import BadRequest, Unauthorized
 
-from tg_bot import dispatcher
+from tg_bot import dispatcher, log
+from tg_bot.modules.helper_funcs.reputation import REPUTATION, FBANNED
 from tg_bot.modules.sql import SESSION, BASE
 
 
@@ -105,15 +108,30 @@ FEDERATION_BYNAME = {}
 FEDERATION_BYOWNER = {}
 FEDERATION_BYFEDID = {}
 
+# fed_id -> (owner id, [admin ids]), the "fusers" string of the fed parsed once when it's set
+FEDERATION_USERS = {}
+# user_id -> fed_ids the user owns / is an admin of
+USER_OWNED_FEDS = {}
+USER_ADMIN_FEDS = {}
+
 FEDERATION_CHATS = {}
 FEDERATION_CHATS_BYID = {}
 
+# fed_id -> {str(user_id): ban info}, and fed_id -> {int(user_id)}
+# both are updated in place by the setters below, never rebuilt after startup
 FEDERATION_BANNED_FULL = {}
 FEDERATION_BANNED_USERID = {}
+# int(user_id) -> ((fed_id, reason, time), ...) for every fed that banned the user
+USER_FBANS = {}
 
 FEDERATION_NOTIFICATION = {}
+# fed_id -> feds subscribed to it, and fed_id -> feds it subscribes to
 FEDS_SUBSCRIBER = {}
 MYFEDS_SUBSCRIBER = {}
+# fed_id -> {chat_id: fed_id of that chat} for every chat a ban in the fed reaches: its own chats and
+# those of every fed subscribed to it, directly or through other feds. Built on first use and dropped
+# for the fed and everything upstream of it whenever its chats or subscriptions change
+FEDERATION_REACH = {}
 
 
 def get_fed_info(fed_id):
@@ -142,54 +160,68 @@ def get_fed_name(chat_id):
 def get_user_fban(fed_id, user_id):
     if not FEDERATION_BANNED_FULL.get(fed_id):
         return False, False, False
-    user_info = FEDERATION_BANNED_FULL[fed_id].get(user_id)
+    user_info = FEDERATION_BANNED_FULL[fed_id].get(str(user_id))
     if not user_info:
         return None, None, None
     return user_info["first_name"], user_info["reason"], user_info["time"]
 
 
+def __parse_fed_users(fed_users):
+    fed_users = ast.literal_eval(fed_users)
+    return int(fed_users["owner"]), ast.literal_eval(fed_users["members"])
+
+
+def __index_fed_users(fed_id, fed_users):
+    __unindex_fed_users(fed_id)
+    owner, members = __parse_fed_users(fed_users)
+    FEDERATION_USERS[fed_id] = (owner, members)
+    USER_OWNED_FEDS.setdefault(owner, set()).add(fed_id)
+    for member in members:
+        USER_ADMIN_FEDS.setdefault(int(member), set()).add(fed_id)
+
+
+def __unindex_fed_users(fed_id):
+    fed_users = FEDERATION_USERS.pop(fed_id, None)
+    if fed_users is None:
+        return
+    owner, members = fed_users
+    for index, user_id in [(USER_OWNED_FEDS, owner)] + [(USER_ADMIN_FEDS, int(m)) for m in members]:
+        feds = index.get(user_id)
+        if feds is not None:
+            feds.discard(fed_id)
+            if not feds:
+                del index[user_id]
+
+
+def get_fed_owner(fed_id):
+    fed_users = FEDERATION_USERS.get(str(fed_id))
+    if fed_users is None:
+        return False
+    return fed_users[0]
+
+
 def get_user_admin_fed_name(user_id):
-    user_feds = []
-    for f in FEDERATION_BYFEDID:
-        if int(user_id) in ast.literal_eval(ast.literal_eval(FEDERATION_BYFEDID[f]["fusers"])["members"]):
-            user_feds.append(FEDERATION_BYFEDID[f]["fname"])
-    return user_feds
+    return [FEDERATION_BYFEDID[f]["fname"] for f in USER_ADMIN_FEDS.get(int(user_id), ())]
 
 
 def get_user_owner_fed_name(user_id):
-    user_feds = []
-    for f in FEDERATION_BYFEDID:
-        if int(user_id) == int(ast.literal_eval(FEDERATION_BYFEDID[f]["fusers"])["owner"]):
-            user_feds.append(FEDERATION_BYFEDID[f]["fname"])
-    return user_feds
+    return [FEDERATION_BYFEDID[f]["fname"] for f in USER_OWNED_FEDS.get(int(user_id), ())]
 
 
 def get_user_admin_fed_full(user_id):
-    user_feds = []
-    for f in FEDERATION_BYFEDID:
-        if int(user_id) in ast.literal_eval(ast.literal_eval(FEDERATION_BYFEDID[f]["fusers"])["members"]):
-            user_feds.append({"fed_id": f, "fed": FEDERATION_BYFEDID[f]})
-    return user_feds
+    return [{"fed_id": f, "fed": FEDERATION_BYFEDID[f]} for f in USER_ADMIN_FEDS.get(int(user_id), ())]
 
 
 def get_user_owner_fed_full(user_id):
-    user_feds = []
-    for f in FEDERATION_BYFEDID:
-        if int(user_id) == int(ast.literal_eval(FEDERATION_BYFEDID[f]["fusers"])["owner"]):
-            user_feds.append({"fed_id": f, "fed": FEDERATION_BYFEDID[f]})
-    return user_feds
+    return [{"fed_id": f, "fed": FEDERATION_BYFEDID[f]} for f in USER_OWNED_FEDS.get(int(user_id), ())]
 
 
 def get_user_fbanlist(user_id):
-    banlist = FEDERATION_BANNED_FULL
-    user_name = ""
-    fedname = []
-    for x in banlist:
-        if banlist[x].get(user_id):
-            if user_name == "":
-                user_name = banlist[x][user_id].get("first_name")
-            fedname.append([x, banlist[x][user_id].get("reason")])
-    return user_name, fedname
+    bans = USER_FBANS.get(int(user_id), ())
+    if not bans:
+        return "", []
+    user_name = FEDERATION_BANNED_FULL[bans[0][0]][str(user_id)].get("first_name")
+    return user_name, [[fed_id, reason] for fed_id, reason, _ in bans]
 
 
 def new_fed(owner_id, fed_name, fed_id):
@@ -226,6 +258,7 @@ def new_fed(owner_id, fed_name, fed_id):
             "flog": None,
             "fusers": str({"owner": str(owner_id), "members": "[]"}),
         }
+        __index_fed_users(str(fed_id), str({"owner": str(owner_id), "members": "[]"}))
         return fed
 
 
@@ -240,9 +273,11 @@ def del_fed(fed_id):
         owner_id = getfed["owner"]
         fed_name = getfed["fname"]
         # Delete from cache
+        __invalidate_reach(fed_id)
         FEDERATION_BYOWNER.pop(owner_id)
         FEDERATION_BYFEDID.pop(fed_id)
         FEDERATION_BYNAME.pop(fed_name)
+        __unindex_fed_users(fed_id)
         if FEDERATION_CHATS_BYID.get(fed_id):
             for x in FEDERATION_CHATS_BYID[fed_id]:
                 delchats = SESSION.query(ChatF).get(str(x))
@@ -255,6 +290,7 @@ def del_fed(fed_id):
         getall = FEDERATION_BANNED_USERID.get(fed_id)
         if getall:
             for x in getall:
+                __unindex_user_fban(fed_id, x)
                 banlist = SESSION.query(BansF).get((fed_id, str(x)))
                 if banlist:
                     SESSION.delete(banlist)
@@ -297,6 +333,7 @@ def chat_join_fed(fed_id, chat_name, chat_id):
             FEDERATION_CHATS_BYID[fed_id] = []
         FEDERATION_CHATS_BYID[fed_id].append(str(chat_id))
         SESSION.commit()
+        __invalidate_reach(fed_id)
         return r
 
 
@@ -308,14 +345,7 @@ def search_fed_by_name(fed_name):
 
 
 def search_user_in_fed(fed_id, user_id):
-    getfed = FEDERATION_BYFEDID.get(fed_id)
-    if getfed == None:
-        return False
-    getfed = ast.literal_eval(getfed["fusers"])["members"]
-    if user_id in ast.literal_eval(getfed):
-        return True
-    else:
-        return False
+    return fed_id in USER_ADMIN_FEDS.get(int(user_id), ())
 
 
 def user_demote_fed(fed_id, user_id):
@@ -329,10 +359,10 @@ def user_demote_fed(fed_id, user_id):
         fed_log = getfed["flog"]
         # Temp set
         try:
-            members = ast.literal_eval(ast.literal_eval(getfed["fusers"])["members"])
-        except ValueError:
+            members = list(FEDERATION_USERS[str(fed_id)][1])
+            members.remove(user_id)
+        except (KeyError, ValueError):
             return False
-        members.remove(user_id)
         # Set user
         FEDERATION_BYOWNER[str(owner_id)]["fusers"] = str(
             {"owner": str(owner_id), "members": str(members)}
@@ -354,6 +384,7 @@ def user_demote_fed(fed_id, user_id):
         )
         SESSION.merge(fed)
         SESSION.commit()
+        __index_fed_users(str(fed_id), str({"owner": str(owner_id), "members": str(members)}))
         return True
 
         curr = SESSION.query(UserF).all()
@@ -379,7 +410,7 @@ def user_join_fed(fed_id, user_id):
         fed_rules = getfed["frules"]
         fed_log = getfed["flog"]
         # Temp set
-        members = ast.literal_eval(ast.literal_eval(getfed["fusers"])["members"])
+        members = list(FEDERATION_USERS[str(fed_id)][1])
         members.append(user_id)
         # Set user
         FEDERATION_BYOWNER[str(owner_id)]["fusers"] = str(
@@ -402,6 +433,7 @@ def user_join_fed(fed_id, user_id):
         )
         SESSION.merge(fed)
         SESSION.commit()
+        __index_fed_users(str(fed_id), str({"owner": str(owner_id), "members": str(members)}))
         __load_all_feds_chats()
         return True
 
@@ -417,12 +449,12 @@ def chat_leave_fed(chat_id):
         # Delete from cache
         FEDERATION_CHATS.pop(str(chat_id))
         FEDERATION_CHATS_BYID[str(fed_id)].remove(str(chat_id))
+        __invalidate_reach(fed_id)
         # Delete from db
-        curr = SESSION.query(ChatF).all()
-        for U in curr:
-            if int(U.chat_id) == int(chat_id):
-                SESSION.delete(U)
-                SESSION.commit()
+        curr = SESSION.query(ChatF).get(str(chat_id))
+        if curr:
+            SESSION.delete(curr)
+            SESSION.commit()
         return True
 
 
@@ -436,21 +468,15 @@ def all_fed_chats(fed_id):
 
 
 def all_fed_users(fed_id):
-    with FEDS_LOCK:
-        getfed = FEDERATION_BYFEDID.get(str(fed_id))
-        if getfed == None:
-            return False
-        fed_owner = ast.literal_eval(ast.literal_eval(getfed["fusers"])["owner"])
-        fed_admins = ast.literal_eval(ast.literal_eval(getfed["fusers"])["members"])
-        fed_admins.append(fed_owner)
-        return fed_admins
+    fed_users = FEDERATION_USERS.get(str(fed_id))
+    if fed_users is None:
+        return False
+    fed_owner, fed_admins = fed_users
+    return fed_admins + [fed_owner]
 
 
 def all_fed_members(fed_id):
-    with FEDS_LOCK:
-        getfed = FEDERATION_BYFEDID.get(str(fed_id))
-        fed_admins = ast.literal_eval(ast.literal_eval(getfed["fusers"])["members"])
-        return fed_admins
+    return list(FEDERATION_USERS[str(fed_id)][1])
 
 
 def set_frules(fed_id, rules):
@@ -487,14 +513,41 @@ def get_frules(fed_id):
         return rules
 
 
+def __index_user_fban(fed_id, user_id, reason, time):
+    # a user is banned in a handful of feds at most, a tuple of tuples is the smallest thing to keep that in
+    bans = tuple(ban for ban in USER_FBANS.get(int(user_id), ()) if ban[0] != fed_id)
+    USER_FBANS[int(user_id)] = bans + ((sys.intern(fed_id), reason, time),)
+
+
+def __unindex_user_fban(fed_id, user_id):
+    bans = tuple(ban for ban in USER_FBANS.get(int(user_id), ()) if ban[0] != fed_id)
+    if bans:
+        USER_FBANS[int(user_id)] = bans
+    else:
+        USER_FBANS.pop(int(user_id), None)
+        REPUTATION.unflag(user_id, FBANNED)
+
+
+def __cache_fban(fed_id, user_id, first_name, last_name, user_name, reason, time):
+    __index_user_fban(fed_id, user_id, reason, time)
+    FEDERATION_BANNED_USERID.setdefault(fed_id, set()).add(int(user_id))
+    FEDERATION_BANNED_FULL.setdefault(fed_id, {})[str(user_id)] = {
+        "first_name": first_name,
+        "last_name": last_name,
+        "user_name": user_name,
+        "reason": reason,
+        "time": time,
+    }
+
+
+def __uncache_fban(fed_id, user_id):
+    __unindex_user_fban(fed_id, user_id)
+    FEDERATION_BANNED_USERID.get(fed_id, set()).discard(int(user_id))
+    FEDERATION_BANNED_FULL.get(fed_id, {}).pop(str(user_id), None)
+
+
 def fban_user(fed_id, user_id, first_name, last_name, user_name, reason, time):
     with FEDS_LOCK:
-        r = SESSION.query(BansF).all()
-        for I in r:
-            if I.fed_id == fed_id:
-                if int(I.user_id) == int(user_id):
-                    SESSION.delete(I)
-
         r = BansF(
             str(fed_id),
             str(user_id),
@@ -505,7 +558,8 @@ def fban_user(fed_id, user_id, first_name, last_name, user_name, reason, time):
             time,
         )
 
-        SESSION.add(r)
+        # merge looks the ban up by its (fed_id, user_id) key and updates it, or inserts a new one
+        r = SESSION.merge(r)
         try:
             SESSION.commit()
         except:
@@ -513,7 +567,8 @@ def fban_user(fed_id, user_id, first_name, last_name, user_name, reason, time):
             return False
         finally:
             SESSION.commit()
-        __load_all_feds_banned()
+        __cache_fban(str(fed_id), user_id, first_name, last_name, user_name, reason, time)
+        REPUTATION.flag(user_id, FBANNED)
         return r
 
 
@@ -525,58 +580,64 @@ def multi_fban_user(
     multi_user_name,
     multi_reason,
 ):
-    if True:  # with FEDS_LOCK:
-        counter = 0
-        time = 0
-        for x in range(len(multi_fed_id)):
-            fed_id = multi_fed_id[x]
-            user_id = multi_user_id[x]
-            first_name = multi_first_name[x]
-            last_name = multi_last_name[x]
-            user_name = multi_user_name[x]
-            reason = multi_reason[x]
-            r = SESSION.query(BansF).all()
-            for I in r:
-                if I.fed_id == fed_id:
-                    if int(I.user_id) == int(user_id):
-                        SESSION.delete(I)
-
-            r = BansF(
-                str(fed_id),
-                str(user_id),
-                first_name,
-                last_name,
-                user_name,
-                reason,
-                time,
-            )
+    """
+    Upsert a batch of fbans with one INSERT ... ON CONFLICT in its own transaction, the importer
+    calls this once per batch. Returns how many rows were written, or False if the batch failed
+    """
+    time = 0
+    rows = {}
+    for x in range(len(multi_fed_id)):
+        # ON CONFLICT can't touch the same row twice in one statement, the last one wins like it would one by one
+        rows[(str(multi_fed_id[x]), str(multi_user_id[x]))] = {
+            "fed_id": str(multi_fed_id[x]),
+            "user_id": str(multi_user_id[x]),
+            "first_name": multi_first_name[x],
+            "last_name": multi_last_name[x],
+            "user_name": multi_user_name[x],
+            "reason": multi_reason[x],
+            "time": time,
+        }
+    if not rows:
+        return 0
 
-            SESSION.add(r)
-            counter += 1
-            if str(str(counter)[-2:]) == "00":
-                print(user_id)
-                print(first_name)
-                print(reason)
-                print(counter)
+    with FEDS_LOCK:
+        stmt = insert(BansF.__table__).values(list(rows.values()))
         try:
+            SESSION.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[BansF.fed_id, BansF.user_id],
+                    set_={
+                        column: stmt.excluded[column]
+                        for column in ("first_name", "last_name", "user_name", "reason", "time")
+                    },
+                )
+            )
             SESSION.commit()
-        except:
+        except Exception:
             SESSION.rollback()
+            log.exception("[FEDS] Failed to import a batch of %d fbans", len(rows))
             return False
-        finally:
-            SESSION.commit()
-        __load_all_feds_banned()
-        print("Done")
-        return counter
+        for row in rows.values():
+            __cache_fban(
+                row["fed_id"],
+                row["user_id"],
+                row["first_name"],
+                row["last_name"],
+                row["user_name"],
+                row["reason"],
+                time,
+            )
+        REPUTATION.flag_many(FBANNED, (row["user_id"] for row in rows.values()))
+    return len(rows)
 
 
 def un_fban_user(fed_id, user_id):
     with FEDS_LOCK:
-        r = SESSION.query(BansF).all()
-        for I in r:
-            if I.fed_id == fed_id:
-                if int(I.user_id) == int(user_id):
-                    SESSION.delete(I)
+        I = SESSION.query(BansF).get((str(fed_id), str(user_id)))
+        if not I:
+            SESSION.close()
+            return False
+        SESSION.delete(I)
         try:
             SESSION.commit()
         except:
@@ -584,38 +645,24 @@ def un_fban_user(fed_id, user_id):
             return False
         finally:
             SESSION.commit()
-        __load_all_feds_banned()
+        __uncache_fban(str(fed_id), user_id)
         return I
 
 
 def get_fban_user(fed_id, user_id):
-    list_fbanned = FEDERATION_BANNED_USERID.get(fed_id)
-    if list_fbanned == None:
-        FEDERATION_BANNED_USERID[fed_id] = []
-    if user_id in FEDERATION_BANNED_USERID[fed_id]:
-        r = SESSION.query(BansF).all()
-        reason = None
-        for I in r:
-            if I.fed_id == fed_id:
-                if int(I.user_id) == int(user_id):
-                    reason = I.reason
-                    time = I.time
-        return True, reason, time
-    else:
+    ban = FEDERATION_BANNED_FULL.get(fed_id, {}).get(str(user_id))
+    if ban is None:
         return False, None, None
+    return True, ban["reason"], ban["time"]
 
 
 def get_all_fban_users(fed_id):
-    list_fbanned = FEDERATION_BANNED_USERID.get(fed_id)
-    if list_fbanned == None:
-        FEDERATION_BANNED_USERID[fed_id] = []
-    return FEDERATION_BANNED_USERID[fed_id]
+    return FEDERATION_BANNED_USERID.get(fed_id, set())
 
 
 def get_all_fban_users_target(fed_id, user_id):
     list_fbanned = FEDERATION_BANNED_FULL.get(fed_id)
     if list_fbanned == None:
-        FEDERATION_BANNED_FULL[fed_id] = []
         return False
     getuser = list_fbanned[str(user_id)]
     return getuser
@@ -722,20 +769,72 @@ def set_fed_log(fed_id, chat_id):
         return True
 
 
+def __feds_downstream(fed_id):
+    # fed_id first, then every fed its bans reach through subscriptions; seen guards against cycles
+    feds = [fed_id]
+    seen = {fed_id}
+    for f in feds:
+        for sub in FEDS_SUBSCRIBER.get(f, ()):
+            if sub not in seen:
+                seen.add(sub)
+                feds.append(sub)
+    return feds
+
+
+def __feds_upstream(fed_id):
+    # fed_id and every fed whose bans reach it
+    feds = [fed_id]
+    seen = {fed_id}
+    for f in feds:
+        for sub in MYFEDS_SUBSCRIBER.get(f, ()):
+            if sub not in seen:
+                seen.add(sub)
+                feds.append(sub)
+    return feds
+
+
+def __invalidate_reach(fed_id):
+    with FEDS_SUBSCRIBER_LOCK:
+        for f in __feds_upstream(fed_id):
+            FEDERATION_REACH.pop(f, None)
+
+
+def get_fed_reach(fed_id):
+    """
+    {chat_id: fed_id} of every chat a ban in fed_id has to be applied in, see FEDERATION_REACH
+    """
+    with FEDS_SUBSCRIBER_LOCK:
+        reach = FEDERATION_REACH.get(fed_id)
+        if reach is None:
+            reach = {}
+            # the fed's own chats go last, so a chat that's in several of them is attributed to it
+            for f in reversed(__feds_downstream(fed_id)):
+                for chat_id in FEDERATION_CHATS_BYID.get(f, ()):
+                    reach[chat_id] = f
+            FEDERATION_REACH[fed_id] = reach
+        return reach
+
+
+def subscription_creates_cycle(fed_id, my_fed):
+    # my_fed subscribing to fed_id closes a loop if the bans of my_fed already reach fed_id
+    with FEDS_SUBSCRIBER_LOCK:
+        return fed_id in __feds_downstream(my_fed)
+
+
 def subs_fed(fed_id, my_fed):
     check = get_spec_subs(fed_id, my_fed)
     if check:
         return False
     with FEDS_SUBSCRIBER_LOCK:
+        if subscription_creates_cycle(fed_id, my_fed):
+            return False
         subsfed = FedSubs(fed_id, my_fed)
 
         SESSION.merge(subsfed)  # merge to avoid duplicate key issues
         SESSION.commit()
-        global FEDS_SUBSCRIBER
-        if FEDS_SUBSCRIBER.get(fed_id, set()) == set():
-            FEDS_SUBSCRIBER[fed_id] = {my_fed}
-        else:
-            FEDS_SUBSCRIBER.get(fed_id, set()).add(my_fed)
+        FEDS_SUBSCRIBER.setdefault(fed_id, set()).add(my_fed)
+        MYFEDS_SUBSCRIBER.setdefault(my_fed, set()).add(fed_id)
+        __invalidate_reach(fed_id)
         return True
 
 
@@ -743,8 +842,9 @@ def unsubs_fed(fed_id, my_fed):
     with FEDS_SUBSCRIBER_LOCK:
         getsubs = SESSION.query(FedSubs).get((fed_id, my_fed))
         if getsubs:
-            if my_fed in FEDS_SUBSCRIBER.get(fed_id, set()):  # sanity check
-                FEDS_SUBSCRIBER.get(fed_id, set()).remove(my_fed)
+            __invalidate_reach(fed_id)
+            FEDS_SUBSCRIBER.get(fed_id, set()).discard(my_fed)
+            MYFEDS_SUBSCRIBER.get(my_fed, set()).discard(fed_id)
 
             SESSION.delete(getsubs)
             SESSION.commit()
@@ -759,10 +859,7 @@ def get_all_subs(fed_id):
 
 
 def get_spec_subs(fed_id, fed_target):
-    if FEDS_SUBSCRIBER.get(fed_id, set()) == set():
-        return {}
-    else:
-        return FEDS_SUBSCRIBER.get(fed_id, fed_target)
+    return fed_target in FEDS_SUBSCRIBER.get(fed_id, set())
 
 
 def get_mysubs(my_fed):
@@ -813,12 +910,14 @@ def __load_all_feds():
                 "flog": x.fed_log,
                 "fusers": str(x.fed_users),
             }
+            __index_fed_users(str(x.fed_id), str(x.fed_users))
     finally:
         SESSION.close()
 
 
 def __load_all_feds_chats():
     global FEDERATION_CHATS, FEDERATION_CHATS_BYID
+    FEDERATION_REACH.clear()
     try:
         qall = SESSION.query(ChatF).all()
         FEDERATION_CHATS = {}
@@ -842,27 +941,24 @@ def __load_all_feds_chats():
 
 
 def __load_all_feds_banned():
-    global FEDERATION_BANNED_USERID, FEDERATION_BANNED_FULL
+    global FEDERATION_BANNED_USERID, FEDERATION_BANNED_FULL, USER_FBANS
     try:
         FEDERATION_BANNED_USERID = {}
         FEDERATION_BANNED_FULL = {}
-        qall = SESSION.query(BansF).all()
+        USER_FBANS = {}
+        # streamed in chunks, so the whole table is never held as ORM objects at once
+        qall = SESSION.query(
+            BansF.fed_id,
+            BansF.user_id,
+            BansF.first_name,
+            BansF.last_name,
+            BansF.user_name,
+            BansF.reason,
+            BansF.time,
+        ).yield_per(1000)
         for x in qall:
-            check = FEDERATION_BANNED_USERID.get(x.fed_id)
-            if check == None:
-                FEDERATION_BANNED_USERID[x.fed_id] = []
-            if int(x.user_id) not in FEDERATION_BANNED_USERID[x.fed_id]:
-                FEDERATION_BANNED_USERID[x.fed_id].append(int(x.user_id))
-            check = FEDERATION_BANNED_FULL.get(x.fed_id)
-            if check == None:
-                FEDERATION_BANNED_FULL[x.fed_id] = {}
-            FEDERATION_BANNED_FULL[x.fed_id][x.user_id] = {
-                "first_name": x.first_name,
-                "last_name": x.last_name,
-                "user_name": x.user_name,
-                "reason": x.reason,
-                "time": x.time,
-            }
+            __cache_fban(*x)
+        REPUTATION.load(FBANNED, USER_FBANS)
     finally:
         SESSION.close()
 
@@ -878,27 +974,12 @@ def __load_all_feds_settings():
 
 
 def __load_feds_subscriber():
-    global FEDS_SUBSCRIBER
-    global MYFEDS_SUBSCRIBER
     try:
-        feds = SESSION.query(FedSubs.fed_id).distinct().all()
-        for (fed_id,) in feds:  # remove tuple by ( ,)
-            FEDS_SUBSCRIBER[fed_id] = []
-            MYFEDS_SUBSCRIBER[fed_id] = []
-
         all_fedsubs = SESSION.query(FedSubs).all()
         for x in all_fedsubs:
-            FEDS_SUBSCRIBER[x.fed_id] += [x.fed_subs]
-            try:
-                MYFEDS_SUBSCRIBER[x.fed_subs] += [x.fed_id]
-            except KeyError:
-                getsubs = SESSION.query(FedSubs).get((x.fed_id, x.fed_subs))
-                if getsubs:
-                    SESSION.delete(getsubs)
-                    SESSION.commit()
-
-        FEDS_SUBSCRIBER = {x: set(y) for x, y in FEDS_SUBSCRIBER.items()}
-        MYFEDS_SUBSCRIBER = {x: set(y) for x, y in MYFEDS_SUBSCRIBER.items()}
+            FEDS_SUBSCRIBER.setdefault(x.fed_id, set()).add(x.fed_subs)
+            MYFEDS_SUBSCRIBER.setdefault(x.fed_subs, set()).add(x.fed_id)
+        FEDERATION_REACH.clear()
 
     finally:
         SESSION.close()
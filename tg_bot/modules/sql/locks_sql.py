@@ -112,6 +112,38 @@ Restrictions.__table__.create(checkfirst=True)
 PERM_LOCK = threading.RLock()
 RESTR_LOCK = threading.RLock()
 
+# Permissions and Restrictions rows are kept in memory as one int per chat, a set bit means locked.
+# chats without any lock have no entry, so the per message check is a single dict lookup
+LOCK_FIELDS = (
+    "audio", "voice", "contact", "video", "document", "photo", "sticker", "gif", "url", "bots", "forward",
+    "game", "location", "rtl", "button", "egame", "inline", "apk", "doc", "exe", "jpg", "mp3", "pdf", "txt",
+    "xml", "zip",
+)
+LOCK_BITS = {field: 1 << i for i, field in enumerate(LOCK_FIELDS)}
+
+# restriction type -> Restrictions column
+RESTRICTION_FIELDS = {"messages": "messages", "media": "media", "other": "other", "previews": "preview"}
+RESTRICTION_BITS = {restr: 1 << i for i, restr in enumerate(RESTRICTION_FIELDS)}
+ALL_RESTRICTIONS = sum(RESTRICTION_BITS.values())
+
+CHAT_LOCKS = {}
+CHAT_RESTRICTIONS = {}
+
+
+def __perm_mask(perm) -> int:
+    return sum(bit for field, bit in LOCK_BITS.items() if getattr(perm, field))
+
+
+def __restr_mask(restr) -> int:
+    return sum(bit for restr_type, bit in RESTRICTION_BITS.items() if getattr(restr, RESTRICTION_FIELDS[restr_type]))
+
+
+def __set_mask(cache, chat_id, mask):
+    if mask:
+        cache[str(chat_id)] = mask
+    else:
+        cache.pop(str(chat_id), None)
+
 
 def init_permissions(chat_id, reset=False):
     curr_perm = SESSION.query(Permissions).get(str(chat_id))
@@ -121,6 +153,7 @@ def init_permissions(chat_id, reset=False):
     perm = Permissions(str(chat_id))
     SESSION.add(perm)
     SESSION.commit()
+    CHAT_LOCKS.pop(str(chat_id), None)
     return perm
 
 
@@ -132,6 +165,7 @@ def init_restrictions(chat_id, reset=False):
     restr = Restrictions(str(chat_id))
     SESSION.add(restr)
     SESSION.commit()
+    CHAT_RESTRICTIONS.pop(str(chat_id), None)
     return restr
 
 
@@ -195,8 +229,10 @@ def update_lock(chat_id, lock_type, locked):
             case "zip":
                 curr_perm.zip = locked
 
+        mask = __perm_mask(curr_perm)
         SESSION.add(curr_perm)
         SESSION.commit()
+        __set_mask(CHAT_LOCKS, chat_id, mask)
 
 
 def update_restriction(chat_id, restr_type, locked):
@@ -219,95 +255,25 @@ def update_restriction(chat_id, restr_type, locked):
                 curr_restr.media = locked
                 curr_restr.other = locked
                 curr_restr.preview = locked
+        mask = __restr_mask(curr_restr)
         SESSION.add(curr_restr)
         SESSION.commit()
+        __set_mask(CHAT_RESTRICTIONS, chat_id, mask)
 
 
 def is_locked(chat_id, lock_type):
-    curr_perm = SESSION.query(Permissions).get(str(chat_id))
-    SESSION.close()
-
-    if not curr_perm:
-        return False
-
-    match lock_type:
-        case "sticker":
-            return curr_perm.sticker
-        case "photo":
-            return curr_perm.photo
-        case "audio":
-            return curr_perm.audio
-        case "voice":
-            return curr_perm.voice
-        case "contact":
-            return curr_perm.contact
-        case "video":
-            return curr_perm.video
-        case "document":
-            return curr_perm.document
-        case "gif":
-            return curr_perm.gif
-        case "url":
-            return curr_perm.url
-        case "bots":
-            return curr_perm.bots
-        case "forward":
-            return curr_perm.forward
-        case "game":
-            return curr_perm.game
-        case "location":
-            return curr_perm.location
-        case "rtl":
-            return curr_perm.rtl
-        case "button":
-            return curr_perm.button
-        case "egame":
-            return curr_perm.egame
-        case "inline":
-            return curr_perm.inline
-        case "apk":
-            return curr_perm.apk
-        case "doc":
-            return curr_perm.doc
-        case "exe":
-            return curr_perm.exe
-        case "jpg":
-            return curr_perm.jpg
-        case "mp3":
-            return curr_perm.mp3
-        case "pdf":
-            return curr_perm.pdf
-        case "txt":
-            return curr_perm.txt
-        case "xml":
-            return curr_perm.xml
-        case "zip":
-            return curr_perm.zip
+    return bool(CHAT_LOCKS.get(str(chat_id), 0) & LOCK_BITS.get(lock_type, 0))
+
+
+def get_lock_mask(chat_id) -> int:
+    return CHAT_LOCKS.get(str(chat_id), 0)
 
 
 def is_restr_locked(chat_id, lock_type):
-    curr_restr = SESSION.query(Restrictions).get(str(chat_id))
-    SESSION.close()
-
-    if not curr_restr:
-        return False
-
-    match lock_type:
-        case "messages":
-            return curr_restr.messages
-        case "media":
-            return curr_restr.media
-        case "other":
-            return curr_restr.other
-        case "previews":
-            return curr_restr.preview
-        case "all":
-            return (
-                curr_restr.messages
-                and curr_restr.media
-                and curr_restr.other
-                and curr_restr.preview
-            )
+    mask = CHAT_RESTRICTIONS.get(str(chat_id), 0)
+    if lock_type == "all":
+        return mask == ALL_RESTRICTIONS
+    return bool(mask & RESTRICTION_BITS.get(lock_type, 0))
 
 
 def get_locks(chat_id):
@@ -330,9 +296,24 @@ def migrate_chat(old_chat_id, new_chat_id):
         if perms:
             perms.chat_id = str(new_chat_id)
         SESSION.commit()
+        __set_mask(CHAT_LOCKS, new_chat_id, CHAT_LOCKS.pop(str(old_chat_id), 0))
 
     with RESTR_LOCK:
         rest = SESSION.query(Restrictions).get(str(old_chat_id))
         if rest:
             rest.chat_id = str(new_chat_id)
         SESSION.commit()
+        __set_mask(CHAT_RESTRICTIONS, new_chat_id, CHAT_RESTRICTIONS.pop(str(old_chat_id), 0))
+
+
+def __load_chat_locks():
+    try:
+        for perm in SESSION.query(Permissions).all():
+            __set_mask(CHAT_LOCKS, perm.chat_id, __perm_mask(perm))
+        for restr in SESSION.query(Restrictions).all():
+            __set_mask(CHAT_RESTRICTIONS, restr.chat_id, __restr_mask(restr))
+    finally:
+        SESSION.close()
+
+
+__load_chat_locks()
@@ -3,9 +3,21 @@ import typing
 
 from sqlalchemy import Column, String, func, distinct, BigInteger, Boolean, select
 
+from tg_bot.modules.helper_funcs.chat_config import CHAT_CONFIGS
 from tg_bot.modules.sql import BASE, SESSION
 
 
+class LogSettings(typing.NamedTuple):
+    """
+    Detached copy of a LogChannelSettings row, safe to keep in the chat config cache
+    """
+    log_joins: bool
+    log_leave: bool
+    log_warn: bool
+    log_action: bool
+    log_report: bool
+
+
 class GroupLogs(BASE):
     __tablename__ = "log_channels"
     chat_id = Column(String(14), primary_key=True)
@@ -38,26 +50,31 @@ class LogChannelSettings(BASE):
     def toggle_warn(self) -> bool:
         self.log_warn = not self.log_warn
         SESSION.commit()
+        CHAT_CONFIGS.invalidate(self.chat_id, "log_settings")
         return self.log_warn
 
     def toggle_joins(self) -> bool:
         self.log_joins = not self.log_joins
         SESSION.commit()
+        CHAT_CONFIGS.invalidate(self.chat_id, "log_settings")
         return self.log_joins
 
     def toggle_leave(self) -> bool:
         self.log_leave = not self.log_leave
         SESSION.commit()
+        CHAT_CONFIGS.invalidate(self.chat_id, "log_settings")
         return self.log_leave
 
     def toggle_report(self) -> bool:
         self.log_report = not self.log_report
         SESSION.commit()
+        CHAT_CONFIGS.invalidate(self.chat_id, "log_settings")
         return self.log_report
 
     def toggle_action(self) -> bool:
         self.log_action = not self.log_action
         SESSION.commit()
+        CHAT_CONFIGS.invalidate(self.chat_id, "log_settings")
         return self.log_action
 
 
@@ -74,7 +91,19 @@ def get_chat_setting(chat_id: int) -> typing.Optional[LogChannelSettings]:
         return SESSION.query(LogChannelSettings).get(chat_id)
 
 
+def get_log_settings(chat_id: int) -> typing.Optional[LogSettings]:
+    with LOG_SETTING_LOCK:
+        try:
+            res = SESSION.query(LogChannelSettings).get(chat_id)
+            if not res:
+                return None
+            return LogSettings(res.log_joins, res.log_leave, res.log_warn, res.log_action, res.log_report)
+        finally:
+            SESSION.close()
+
+
 def set_chat_setting(setting: LogChannelSettings):
+    chat_id = setting.chat_id
     with LOGS_INSERTION_LOCK:
         res: LogChannelSettings = SESSION.query(LogChannelSettings).get(setting.chat_id)
         if res:
@@ -86,6 +115,7 @@ def set_chat_setting(setting: LogChannelSettings):
         else:
             SESSION.add(setting)
     SESSION.commit()
+    CHAT_CONFIGS.invalidate(chat_id, "log_settings")
 
 
 def set_chat_log_channel(chat_id, log_channel):
@@ -135,6 +165,7 @@ def migrate_chat(old_chat_id, new_chat_id):
                 CHANNELS[str(new_chat_id)] = CHANNELS.get(str(old_chat_id))
 
         SESSION.commit()
+        CHAT_CONFIGS.migrate(old_chat_id, new_chat_id)
 
 
 def __load_log_channels():
@@ -146,4 +177,5 @@ def __load_log_channels():
         SESSION.close()
 
 
+CHAT_CONFIGS.register("log_settings", get_log_settings)
 __load_log_channels()
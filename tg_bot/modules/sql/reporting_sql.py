@@ -4,6 +4,7 @@ from typing import Union
 from sqlalchemy import Column, String, Boolean
 from sqlalchemy.sql.sqltypes import BigInteger
 
+from tg_bot.modules.helper_funcs.chat_config import CHAT_CONFIGS
 from tg_bot.modules.sql import SESSION, BASE
 
 
@@ -67,6 +68,7 @@ def set_chat_setting(chat_id: Union[int, str], setting: bool):
         chat_setting.should_report = setting
         SESSION.add(chat_setting)
         SESSION.commit()
+        CHAT_CONFIGS.invalidate(chat_id, "report")
 
 
 def set_user_setting(user_id: int, setting: bool):
@@ -90,3 +92,7 @@ def migrate_chat(old_chat_id, new_chat_id):
         for note in chat_notes:
             note.chat_id = str(new_chat_id)
         SESSION.commit()
+        CHAT_CONFIGS.migrate(old_chat_id, new_chat_id)
+
+
+CHAT_CONFIGS.register("report", chat_should_report)
@@ -1,15 +1,23 @@
+import atexit
 import threading
+import time
 
+from cachetools import TTLCache
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.sql.sqltypes import BigInteger
 
-from tg_bot import dispatcher
+from tg_bot import dispatcher, log
 from tg_bot.modules.sql import BASE, SESSION
 from sqlalchemy import (
+    Boolean,
     Column,
     ForeignKey,
+    Integer,
     String,
     UnicodeText,
     UniqueConstraint,
+    cast,
+    exists,
     func,
 )
 
@@ -69,11 +77,88 @@ class ChatMembers(BASE):
         )
 
 
+class Broadcasts(BASE):
+    """
+    A broadcast still being sent, every recipient up to cursor in the current phase has had it
+    """
+    __tablename__ = "broadcasts"
+    id = Column(Integer, primary_key=True)
+    text = Column(UnicodeText, nullable=False)
+    to_groups = Column(Boolean, nullable=False)
+    to_users = Column(Boolean, nullable=False)
+    # "groups" or "users", groups go first
+    phase = Column(String(6), nullable=False)
+    cursor = Column(String(20))
+    sent = Column(Integer, default=0, nullable=False)
+    failed = Column(Integer, default=0, nullable=False)
+    dead = Column(Integer, default=0, nullable=False)
+    # ms timestamp
+    started = Column(BigInteger, nullable=False)
+    progress_chat = Column(BigInteger)
+    progress_message = Column(BigInteger)
+
+    def __init__(self, text, to_groups, to_users, progress_chat=None, progress_message=None):
+        self.text = text
+        self.to_groups = to_groups
+        self.to_users = to_users
+        self.phase = "groups" if to_groups else "users"
+        self.cursor = None
+        self.sent = 0
+        self.failed = 0
+        self.dead = 0
+        self.started = int(time.time() * 1000)
+        self.progress_chat = progress_chat
+        self.progress_message = progress_message
+
+    def __repr__(self):
+        return "<Broadcast {} ({} sent)>".format(self.id, self.sent)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "text": self.text,
+            "to_groups": self.to_groups,
+            "to_users": self.to_users,
+            "phase": self.phase,
+            "cursor": self.cursor,
+            "sent": self.sent,
+            "failed": self.failed,
+            "dead": self.dead,
+            "started": self.started,
+            "progress_chat": self.progress_chat,
+            "progress_message": self.progress_message,
+        }
+
+
+class DeadRecipients(BASE):
+    """
+    Chats the bot was removed from and users that blocked it, found while sending to them
+    """
+    __tablename__ = "dead_recipients"
+    recipient = Column(String(20), primary_key=True)
+    reason = Column(UnicodeText)
+    # ms timestamp
+    since = Column(BigInteger, nullable=False)
+
+    def __init__(self, recipient, reason=None):
+        self.recipient = str(recipient)
+        self.reason = reason
+        self.since = int(time.time() * 1000)
+
+    def __repr__(self):
+        return "<Dead recipient {} ({})>".format(self.recipient, self.reason)
+
+
 Users.__table__.create(checkfirst=True)
 Chats.__table__.create(checkfirst=True)
 ChatMembers.__table__.create(checkfirst=True)
+Broadcasts.__table__.create(checkfirst=True)
+DeadRecipients.__table__.create(checkfirst=True)
 
 INSERTION_LOCK = threading.RLock()
+BROADCAST_LOCK = threading.RLock()
+DEAD_LOCK = threading.RLock()
+DEAD_RECIPIENTS = set()
 
 
 def ensure_bot_in_db():
@@ -118,6 +203,134 @@ def update_user(user_id, username, chat_id=None, chat_name=None):
         SESSION.commit()
 
 
+class UserWriteBuffer:
+    """
+    Write-behind buffer for update_user.
+
+    log_user sees the same (user, username, chat, chat_name) over and over, so tuples seen
+    within `seen_ttl` seconds are dropped right away, the rest are coalesced in memory and
+    written with one bulk INSERT ... ON CONFLICT per table, either by the repeating job in
+    users.py or by whichever thread pushes the buffer past `max_pending`.
+    """
+
+    def __init__(self, max_pending=500, seen_ttl=60 * 10, seen_size=50000):
+        self.max_pending = max_pending
+        self._seen = TTLCache(maxsize=seen_size, ttl=seen_ttl)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._users = {}
+        self._chats = {}
+        self._members = set()
+        self.buffered = 0
+        self.flushed = 0
+        self.deduplicated = 0
+
+    def add(self, user_id, username, chat_id=None, chat_name=None):
+        key = (user_id, username, chat_id, chat_name)
+        with self._lock:
+            if key in self._seen:
+                self.deduplicated += 1
+                return
+            self._seen[key] = True
+            self.buffered += 1
+            self._users[user_id] = username
+            if chat_id and chat_name:
+                self._chats[str(chat_id)] = chat_name
+                self._members.add((str(chat_id), user_id))
+            full = len(self._users) + len(self._members) >= self.max_pending
+
+        if full:
+            self.flush(block=False)
+
+    def flush(self, block=True) -> int:
+        if not self._flush_lock.acquire(blocking=block):
+            return 0  # someone else is already flushing
+        try:
+            with self._lock:
+                users, chats, members = self._users, self._chats, self._members
+                self._users, self._chats, self._members = {}, {}, set()
+            if not users:
+                return 0
+
+            rows = len(users) + len(chats) + len(members)
+            with INSERTION_LOCK:
+                try:
+                    stmt = insert(Users.__table__).values(
+                        [{"user_id": user_id, "username": username} for user_id, username in users.items()]
+                    )
+                    SESSION.execute(
+                        stmt.on_conflict_do_update(
+                            index_elements=[Users.user_id], set_={"username": stmt.excluded.username}
+                        )
+                    )
+                    if chats:
+                        stmt = insert(Chats.__table__).values(
+                            [{"chat_id": chat_id, "chat_name": chat_name} for chat_id, chat_name in chats.items()]
+                        )
+                        SESSION.execute(
+                            stmt.on_conflict_do_update(
+                                index_elements=[Chats.chat_id], set_={"chat_name": stmt.excluded.chat_name}
+                            )
+                        )
+                    if members:
+                        SESSION.execute(
+                            insert(ChatMembers.__table__)
+                            .values([{"chat": chat_id, "user": user_id} for chat_id, user_id in members])
+                            .on_conflict_do_nothing(constraint="_chat_members_uc")
+                        )
+                    SESSION.commit()
+                except Exception:
+                    SESSION.rollback()
+                    with self._lock:
+                        if len(self._users) + len(self._members) + rows <= self.max_pending * 10:
+                            # put the batch back for the next flush, anything queued meanwhile is newer and wins
+                            self._users = {**users, **self._users}
+                            self._chats = {**chats, **self._chats}
+                            self._members |= members
+                        else:
+                            # the database has been failing for a while, don't grow without bound
+                            self._seen.clear()
+                    log.exception("[USERS] Failed to flush %d buffered rows", rows)
+                    return 0
+
+            with self._lock:
+                self.flushed += rows
+            # the bot is back in these, or never really left
+            revived = [chat_id for chat_id in chats if chat_id in DEAD_RECIPIENTS]
+            if revived:
+                unmark_dead(revived)
+            return rows
+        finally:
+            self._flush_lock.release()
+
+    def forget_seen(self):
+        with self._lock:
+            self._seen.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "buffered": self.buffered,
+                "flushed": self.flushed,
+                "deduplicated": self.deduplicated,
+                "pending": len(self._users) + len(self._members),
+            }
+
+
+USER_BUFFER = UserWriteBuffer()
+
+
+def buffer_user(user_id, username, chat_id=None, chat_name=None):
+    USER_BUFFER.add(user_id, username, chat_id, chat_name)
+
+
+def flush_user_buffer() -> int:
+    return USER_BUFFER.flush()
+
+
+atexit.register(flush_user_buffer)
+
+
 def get_userid_by_name(username):
     try:
         return (
@@ -191,6 +404,7 @@ def num_users():
 
 
 def migrate_chat(old_chat_id, new_chat_id):
+    flush_user_buffer()  # pending rows of the old chat have to land before they get moved
     with INSERTION_LOCK:
         chat = SESSION.query(Chats).get(str(old_chat_id))
         if chat:
@@ -215,6 +429,8 @@ ensure_bot_in_db()
 
 
 def del_user(user_id):
+    flush_user_buffer()
+    USER_BUFFER.forget_seen()
     with INSERTION_LOCK:
         curr = SESSION.query(Users).get(user_id)
         if curr:
@@ -229,6 +445,8 @@ def del_user(user_id):
 
 
 def rem_chat(chat_id):
+    flush_user_buffer()
+    USER_BUFFER.forget_seen()
     with INSERTION_LOCK:
         chat = SESSION.query(Chats).get(str(chat_id))
         if chat:
@@ -236,3 +454,126 @@ def rem_chat(chat_id):
             SESSION.commit()
         else:
             SESSION.close()
+    if str(chat_id) in DEAD_RECIPIENTS:
+        unmark_dead([chat_id])
+
+
+def start_broadcast(text, to_groups, to_users, progress_chat=None, progress_message=None):
+    with BROADCAST_LOCK:
+        broadcast = Broadcasts(text, to_groups, to_users, progress_chat, progress_message)
+        SESSION.add(broadcast)
+        SESSION.commit()
+        return broadcast.id
+
+
+def get_broadcast(broadcast_id):
+    try:
+        broadcast = SESSION.query(Broadcasts).get(broadcast_id)
+        return broadcast.to_dict() if broadcast else None
+    finally:
+        SESSION.close()
+
+
+def get_broadcast_recipients(phase, after=None, limit=200):
+    """
+    The next page of chat or user ids after the given one, in id order and without dead
+    recipients, so a broadcast streams through the table instead of loading all of it
+    """
+    column = Chats.chat_id if phase == "groups" else Users.user_id
+    try:
+        query = SESSION.query(column).filter(
+            ~exists().where(DeadRecipients.recipient == cast(column, String))
+        )
+        if after is not None:
+            query = query.filter(column > (after if phase == "groups" else int(after)))
+        return [row[0] for row in query.order_by(column).limit(limit)]
+    finally:
+        SESSION.close()
+
+
+def checkpoint_broadcast(broadcast_id, phase, cursor, sent, failed, dead):
+    """
+    Save how far a broadcast got, returns False if it was cancelled meanwhile
+    """
+    with BROADCAST_LOCK:
+        broadcast = SESSION.query(Broadcasts).get(broadcast_id)
+        if not broadcast:
+            SESSION.close()
+            return False
+        broadcast.phase = phase
+        broadcast.cursor = str(cursor) if cursor is not None else None
+        broadcast.sent = sent
+        broadcast.failed = failed
+        broadcast.dead = dead
+        SESSION.commit()
+        return True
+
+
+def finish_broadcast(broadcast_id):
+    with BROADCAST_LOCK:
+        broadcast = SESSION.query(Broadcasts).get(broadcast_id)
+        if broadcast:
+            SESSION.delete(broadcast)
+        SESSION.commit()
+
+
+def get_pending_broadcasts():
+    try:
+        return [x.id for x in SESSION.query(Broadcasts.id).order_by(Broadcasts.id).all()]
+    finally:
+        SESSION.close()
+
+
+def mark_dead(recipients):
+    """
+    recipients maps a chat or user id to why nothing can be sent there anymore
+    """
+    if not recipients:
+        return
+    since = int(time.time() * 1000)
+    rows = [
+        {"recipient": str(recipient), "reason": reason, "since": since}
+        for recipient, reason in recipients.items()
+    ]
+    with DEAD_LOCK:
+        try:
+            stmt = insert(DeadRecipients.__table__).values(rows)
+            SESSION.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[DeadRecipients.recipient], set_={"reason": stmt.excluded.reason}
+                )
+            )
+            SESSION.commit()
+        except Exception:
+            SESSION.rollback()
+            raise
+        DEAD_RECIPIENTS.update(row["recipient"] for row in rows)
+
+
+def unmark_dead(recipients):
+    recipients = [str(x) for x in recipients]
+    with DEAD_LOCK:
+        SESSION.query(DeadRecipients).filter(
+            DeadRecipients.recipient.in_(recipients)
+        ).delete(synchronize_session=False)
+        SESSION.commit()
+        DEAD_RECIPIENTS.difference_update(recipients)
+
+
+def is_dead(recipient):
+    return str(recipient) in DEAD_RECIPIENTS
+
+
+def num_dead():
+    return len(DEAD_RECIPIENTS)
+
+
+def __load_dead_recipients():
+    global DEAD_RECIPIENTS
+    try:
+        DEAD_RECIPIENTS = {x.recipient for x in SESSION.query(DeadRecipients.recipient)}
+    finally:
+        SESSION.close()
+
+
+__load_dead_recipients()
@@ -2,6 +2,8 @@ import threading
 
 from sqlalchemy.sql.sqltypes import BigInteger
 
+from tg_bot.modules.helper_funcs.chat_config import CHAT_CONFIGS
+from tg_bot.modules.helper_funcs.trigger_index import TriggerIndex
 from tg_bot.modules.sql import BASE, SESSION
 from sqlalchemy import Boolean, Column, Integer, String, UnicodeText, distinct, func
 from sqlalchemy.dialects import postgresql
@@ -73,6 +75,7 @@ WARN_FILTER_INSERTION_LOCK = threading.RLock()
 WARN_SETTINGS_LOCK = threading.RLock()
 
 WARN_FILTERS = {}
+WARN_FILTERS_INDEX = TriggerIndex()
 
 
 def warn_user(user_id, chat_id, reason=None):
@@ -145,6 +148,7 @@ def add_warn_filter(chat_id, keyword, reply):
                 WARN_FILTERS.get(str(chat_id), []) + [keyword],
                 key=lambda x: (-len(x), x),
             )
+        WARN_FILTERS_INDEX.add(chat_id, keyword)
 
         SESSION.merge(warn_filt)  # merge to avoid duplicate key issues
         SESSION.commit()
@@ -156,6 +160,7 @@ def remove_warn_filter(chat_id, keyword):
         if warn_filt:
             if keyword in WARN_FILTERS.get(str(chat_id), []):  # sanity check
                 WARN_FILTERS.get(str(chat_id), []).remove(keyword)
+            WARN_FILTERS_INDEX.remove(chat_id, keyword)
 
             SESSION.delete(warn_filt)
             SESSION.commit()
@@ -168,6 +173,10 @@ def get_chat_warn_triggers(chat_id):
     return WARN_FILTERS.get(str(chat_id), set())
 
 
+def match_warn_trigger(chat_id, text):
+    return WARN_FILTERS_INDEX.match(chat_id, text)
+
+
 def get_chat_warn_filters(chat_id):
     try:
         return (
@@ -194,6 +203,7 @@ def set_warn_limit(chat_id, warn_limit):
 
         SESSION.add(curr_setting)
         SESSION.commit()
+        CHAT_CONFIGS.invalidate(chat_id, "warn_settings")
 
 
 def set_warn_strength(chat_id, soft_warn):
@@ -206,6 +216,7 @@ def set_warn_strength(chat_id, soft_warn):
 
         SESSION.add(curr_setting)
         SESSION.commit()
+        CHAT_CONFIGS.invalidate(chat_id, "warn_settings")
 
 
 def get_warn_setting(chat_id):
@@ -274,6 +285,8 @@ def __load_chat_warn_filters():
             x: sorted(set(y), key=lambda i: (-len(i), i))
             for x, y in WARN_FILTERS.items()
         }
+        for chat_id, keywords in WARN_FILTERS.items():
+            WARN_FILTERS_INDEX.set(chat_id, keywords)
 
     finally:
         SESSION.close()
@@ -299,6 +312,7 @@ def migrate_chat(old_chat_id, new_chat_id):
         SESSION.commit()
         WARN_FILTERS[str(new_chat_id)] = WARN_FILTERS[str(old_chat_id)]
         del WARN_FILTERS[str(old_chat_id)]
+        WARN_FILTERS_INDEX.migrate(old_chat_id, new_chat_id)
 
     with WARN_SETTINGS_LOCK:
         chat_settings = (
@@ -309,6 +323,8 @@ def migrate_chat(old_chat_id, new_chat_id):
         for setting in chat_settings:
             setting.chat_id = str(new_chat_id)
         SESSION.commit()
+        CHAT_CONFIGS.migrate(old_chat_id, new_chat_id)
 
 
+CHAT_CONFIGS.register("warn_settings", get_warn_setting)
 __load_chat_warn_filters()
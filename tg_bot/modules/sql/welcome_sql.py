@@ -4,6 +4,7 @@ from typing import Union
 
 from sqlalchemy.sql.expression import false
 
+from tg_bot.modules.helper_funcs.chat_config import CHAT_CONFIGS
 from tg_bot.modules.helper_funcs.msg_types import Types
 from tg_bot.modules.sql import BASE, SESSION
 from sqlalchemy import BigInteger, Boolean, Column, Integer, String, UnicodeText
@@ -427,6 +428,7 @@ def set_clean_welcome(chat_id, clean_welcome):
 
         SESSION.add(curr)
         SESSION.commit()
+        CHAT_CONFIGS.invalidate(chat_id, "clean_welcome")
 
 
 def get_clean_pref(chat_id):
@@ -449,6 +451,7 @@ def set_welc_preference(chat_id, should_welcome):
 
         SESSION.add(curr)
         SESSION.commit()
+        CHAT_CONFIGS.invalidate(chat_id, "welcome")
 
 
 def set_gdbye_preference(chat_id, should_goodbye):
@@ -461,6 +464,7 @@ def set_gdbye_preference(chat_id, should_goodbye):
 
         SESSION.add(curr)
         SESSION.commit()
+        CHAT_CONFIGS.invalidate(chat_id, "welcome")
 
 
 def set_custom_welcome(
@@ -499,6 +503,7 @@ def set_custom_welcome(
                 SESSION.add(button)
 
         SESSION.commit()
+        CHAT_CONFIGS.invalidate(chat_id, "welcome")
 
 
 def get_custom_welcome(chat_id):
@@ -544,6 +549,7 @@ def set_custom_gdbye(chat_id, custom_goodbye, goodbye_type, buttons=None):
                 SESSION.add(button)
 
         SESSION.commit()
+        CHAT_CONFIGS.invalidate(chat_id, "welcome")
 
 
 def get_custom_gdbye(chat_id):
@@ -626,6 +632,7 @@ def migrate_chat(old_chat_id, new_chat_id):
                 btn.chat_id = str(new_chat_id)
 
         SESSION.commit()
+        CHAT_CONFIGS.migrate(old_chat_id, new_chat_id)
 
 
 def getRaidStatus(chat_id):
@@ -663,5 +670,8 @@ def _ResetRaidOnRestart():
             r.status = False
         SESSION.commit()
 
+CHAT_CONFIGS.register("welcome", get_welc_pref)
+CHAT_CONFIGS.register("clean_welcome", get_clean_pref)
+
 # it uses a cron job to turn off so if the bot restarts and there is a pending raid disable job then raid will stay on
 _ResetRaidOnRestart()
\ No newline at end of file
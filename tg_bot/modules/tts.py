@@ -5,7 +5,6 @@ from typing import List
 from gtts import gTTS
 from telegram import Update, ChatAction, ParseMode
 
-from .sql.clear_cmd_sql import get_clearcmd
 from tg_bot import dispatcher, spamcheck
 from telegram.ext import CallbackContext
 from .helper_funcs.misc import delete
@@ -16,7 +15,6 @@ from .helper_funcs.decorators import kigcmd
 def tts(update: Update, context: CallbackContext):
     args = context.args
     message = update.effective_message
-    chat = update.effective_chat
     delmsg = ""
 
     if message.reply_to_message:
@@ -50,9 +48,9 @@ def tts(update: Update, context: CallbackContext):
         parse_mode = ParseMode.MARKDOWN
         )
 
-    cleartime = get_clearcmd(chat.id, "tts")
+    cleartime = context.chat_config.clearcmd.get("tts")
 
     if cleartime:
-        context.dispatcher.run_async(delete, delmsg, cleartime.time)
+        context.dispatcher.run_async(delete, delmsg, cleartime)
 
 
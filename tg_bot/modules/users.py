@@ -1,18 +1,32 @@
 import contextlib
+import threading
+import time
 from io import BytesIO
-from time import sleep
 
 import tg_bot.modules.sql.users_sql as sql
-from tg_bot import DEV_USERS, log, OWNER_ID, dispatcher, SYS_ADMIN, spamcheck
+from tg_bot import BROADCAST_CONCURRENCY, DEV_USERS, log, OWNER_ID, OUTBOUND, dispatcher, SYS_ADMIN, spamcheck, j
+from .helper_funcs.fanout import FanOut, ABORT, FAILED
+from .helper_funcs.outbound import BULK
 from .helper_funcs.chat_status import dev_plus, sudo_plus
-from .sql.users_sql import get_all_users, update_user
+from .helper_funcs.admin_status import get_bot_member
+from .sql.users_sql import buffer_user
 from telegram import TelegramError, Update, ParseMode
-from telegram.error import BadRequest
+from telegram.error import BadRequest, ChatMigrated, RetryAfter, Unauthorized
 from telegram.ext import CallbackContext, Filters
 from .helper_funcs.decorators import kigcmd, kigmsg
 
 USERS_GROUP = 4
 CHAT_GROUP = 5
+USERS_FLUSH_INTERVAL = 5  # seconds between write-behind flushes of log_user
+BROADCAST_CHECKPOINT_EVERY = 200  # recipients a broadcast goes through between two checkpoints
+
+# nothing will ever be delivered to a chat or user that answers with one of these
+BROADCAST_DEAD_ERRORS = {
+    "Chat not found",
+    "Peer_id_invalid",
+    "Group chat was deactivated",
+    "Channel_private",
+}
 # DEV_AND_MORE = DEV_USERS.append(int(OWNER_ID)).append(int(SYS_ADMIN))
 
 
@@ -48,48 +62,112 @@ def get_user_id(username):
 
 @kigcmd(command='broadcast', filters=Filters.user((SYS_ADMIN|OWNER_ID)))
 def broadcast(update: Update, context: CallbackContext):
-    to_send = update.effective_message.text.split(None, 1)
+    msg = update.effective_message
+    to_send = msg.text.split(None, 1)
 
     if len(to_send) >= 2:
-        to_group = False
-        to_user = False
-        if to_send[0] == "/broadcastgroups":
-            to_group = True
-        if to_send[0] == "/broadcastusers":
-            to_user = True
+        command = to_send[0].split("@")[0].lower()
+        to_group = command != "/broadcastusers"
+        to_user = command != "/broadcastgroups"
+        progress = msg.reply_text("Broadcast queued.")
+        broadcast_id = sql.start_broadcast(to_send[1], to_group, to_user, progress.chat_id, progress.message_id)
+        schedule_broadcast(broadcast_id)
+
+
+def schedule_broadcast(broadcast_id, when: float = 0):
+    j.run_once(send_broadcast, when, context=broadcast_id, name="broadcast {}".format(broadcast_id))
+
+
+def send_broadcast(context: CallbackContext):
+    """
+    Sends a broadcast page by page, checkpointing after every page so a restart resumes it
+    """
+    bot = context.bot
+    broadcast_id = context.job.context
+    job = sql.get_broadcast(broadcast_id)
+    if not job:
+        return
+    phase, cursor = job["phase"], job["cursor"]
+    sent, failed, dead = job["sent"], job["failed"], job["dead"]
+    dead_found = {}
+    lock = threading.Lock()
+
+    def send(recipient) -> str:
+        # FanOut runs this on its own threads, the priority is per thread
+        with OUTBOUND.priority(BULK):
+            try:
+                bot.send_message(
+                    int(recipient),
+                    job["text"],
+                    parse_mode=ParseMode.MARKDOWN,
+                    disable_web_page_preview=True,
+                )
+                return "sent"
+            except RetryAfter:
+                raise
+            except Unauthorized as excp:
+                # blocked by the user, kicked from the group, or a deactivated account
+                reason = excp.message
+            except BadRequest as excp:
+                if excp.message.startswith("Can't parse entities"):
+                    # the text itself is broken, every other recipient would fail the same way
+                    return ABORT
+                if excp.message not in BROADCAST_DEAD_ERRORS:
+                    return FAILED
+                reason = excp.message
+            except ChatMigrated:
+                # the group's new id gets it once the migration reaches the database
+                return FAILED
+            except TelegramError:
+                return FAILED
+        with lock:
+            dead_found[recipient] = reason
+        return "dead"
+
+    def edit_progress(text):
+        if not job["progress_message"]:
+            return
+        try:
+            bot.edit_message_text(text, chat_id=job["progress_chat"], message_id=job["progress_message"])
+        except TelegramError:
+            pass
+
+    def report(fanout: FanOut):
+        edit_progress("Broadcasting to {}: {} sent, {} failed, {} unreachable.".format(
+            phase, sent + fanout.results["sent"], failed + fanout.results[FAILED], dead + len(dead_found)
+        ))
+
+    aborted = False
+    while not aborted:
+        page = sql.get_broadcast_recipients(phase, cursor, BROADCAST_CHECKPOINT_EVERY)
+        if page:
+            dead_found.clear()
+            fanout = FanOut(send, concurrency=BROADCAST_CONCURRENCY, on_progress=report)
+            results = fanout.run(page)
+            aborted = results[ABORT] > 0
+            sql.mark_dead(dead_found)
+            cursor = page[-1]
+            sent += results["sent"]
+            failed += results[FAILED]
+            dead += results["dead"]
+        elif phase == "groups" and job["to_users"]:
+            phase, cursor = "users", None
         else:
-            to_group = to_user = True
-        chats = sql.get_all_chats() or []
-        users = get_all_users()
-        failed = 0
-        failed_user = 0
-        if to_group:
-            for chat in chats:
-                try:
-                    context.bot.sendMessage(
-                        int(chat.chat_id),
-                        to_send[1],
-                        parse_mode=ParseMode.MARKDOWN,
-                        disable_web_page_preview=True,
-                    )
-                    sleep(0.1)
-                except TelegramError:
-                    failed += 1
-        if to_user:
-            for user in users:
-                try:
-                    context.bot.sendMessage(
-                        int(user.user_id),
-                        to_send[1],
-                        parse_mode=ParseMode.MARKDOWN,
-                        disable_web_page_preview=True,
-                    )
-                    sleep(0.1)
-                except TelegramError:
-                    failed_user += 1
-        update.effective_message.reply_text(
-            f"Broadcast complete.\nGroups failed: {failed}.\nUsers failed: {failed_user}."
+            break
+        if not sql.checkpoint_broadcast(broadcast_id, phase, cursor, sent, failed, dead):
+            # cancelled meanwhile
+            return
+
+    sql.finish_broadcast(broadcast_id)
+    edit_progress(
+        "Broadcast {} in {:.1f}s.\nSent: {}.\nFailed: {}.\nUnreachable, skipped from now on: {}.".format(
+            "stopped, the text can't be parsed" if aborted else "complete",
+            time.time() - job["started"] / 1000,
+            sent,
+            failed,
+            dead,
         )
+    )
 
 
 @kigmsg((Filters.all & Filters.chat_type.groups), group=USERS_GROUP)
@@ -97,10 +175,10 @@ def log_user(update: Update, _: CallbackContext):
     chat = update.effective_chat
     msg = update.effective_message
 
-    update_user(msg.from_user.id, msg.from_user.username, chat.id, chat.title)
+    buffer_user(msg.from_user.id, msg.from_user.username, chat.id, chat.title)
 
     if rep := msg.reply_to_message:
-        update_user(
+        buffer_user(
             rep.from_user.id,
             rep.from_user.username,
             chat.id,
@@ -108,7 +186,7 @@ def log_user(update: Update, _: CallbackContext):
         )
 
         if rep.forward_from:
-            update_user(
+            buffer_user(
                 rep.forward_from.id,
                 rep.forward_from.username,
             )
@@ -117,9 +195,9 @@ def log_user(update: Update, _: CallbackContext):
             for entity in rep.entities:
                 if entity.type in ["text_mention", "mention"]:
                     with contextlib.suppress(AttributeError):
-                        update_user(entity.user.id, entity.user.username)
+                        buffer_user(entity.user.id, entity.user.username)
         if rep.sender_chat and not rep.is_automatic_forward:
-            update_user(
+            buffer_user(
                 rep.sender_chat.id,
                 rep.sender_chat.username,
                 chat.id,
@@ -127,24 +205,43 @@ def log_user(update: Update, _: CallbackContext):
             )
 
     if msg.forward_from:
-        update_user(msg.forward_from.id, msg.forward_from.username)
+        buffer_user(msg.forward_from.id, msg.forward_from.username)
 
     if msg.entities:
         for entity in msg.entities:
             if entity.type in ["text_mention", "mention"]:
                 with contextlib.suppress(AttributeError):
-                    update_user(entity.user.id, entity.user.username)
+                    buffer_user(entity.user.id, entity.user.username)
     if msg.sender_chat and not msg.is_automatic_forward:
-        update_user(msg.sender_chat.id, msg.sender_chat.username, chat.id, chat.title)
+        buffer_user(msg.sender_chat.id, msg.sender_chat.username, chat.id, chat.title)
 
     if msg.new_chat_members:
         for user in msg.new_chat_members:
             if user.id == msg.from_user.id:  # we already added that in the first place
                 continue
-            update_user(user.id, user.username, chat.id, chat.title)
+            buffer_user(user.id, user.username, chat.id, chat.title)
 
     if req := update.chat_join_request:
-        update_user(req.from_user.id, req.from_user.username, chat.id, chat.title)
+        buffer_user(req.from_user.id, req.from_user.username, chat.id, chat.title)
+
+
+@kigmsg(Filters.chat_type.private, group=USERS_GROUP)
+def log_private(update: Update, _: CallbackContext):
+    # talking to the bot again means they unblocked it
+    user = update.effective_user
+    if user and sql.is_dead(user.id):
+        sql.unmark_dead([user.id])
+
+
+def flush_users(_: CallbackContext):
+    sql.flush_user_buffer()
+
+
+j.run_repeating(flush_users, interval=USERS_FLUSH_INTERVAL, name="users write-behind flush")
+
+# broadcasts a restart cut short carry on from their last checkpoint
+for pending_broadcast_id in sql.get_pending_broadcasts():
+    schedule_broadcast(pending_broadcast_id, 10)
 
 
 @kigcmd(command='chatlist')
@@ -177,7 +274,9 @@ def chats(update: Update, context: CallbackContext):
 @kigmsg((Filters.all & Filters.chat_type.groups), group=USERS_GROUP)
 def chat_checker(update: Update, context: CallbackContext):
     bot = context.bot
-    if update.effective_message.chat.get_member(bot.id).can_send_messages is False:
+    # served from BOT_ADMIN_CACHE, which botstatchanged keeps current from my_chat_member updates
+    bot_member = get_bot_member(update.effective_message.chat.id)
+    if getattr(bot_member, "can_send_messages", None) is False:
         bot.leaveChat(update.effective_message.chat.id)
 
 
@@ -193,7 +292,13 @@ def chat_checker(update: Update, context: CallbackContext):
 
 
 def __stats__():
-    return f"• {sql.num_users()} users, across {sql.num_chats()} chats"
+    buf = sql.USER_BUFFER.stats()
+    return (
+        f"• {sql.num_users()} users, across {sql.num_chats()} chats\n"
+        f"• {sql.num_dead()} chats and users unreachable for broadcasts\n"
+        f"• users write-behind: {buf['buffered']} buffered, {buf['flushed']} flushed, "
+        f"{buf['deduplicated']} deduplicated, {buf['pending']} pending"
+    )
 
 
 def __migrate__(old_chat_id, new_chat_id):
@@ -12,6 +12,7 @@ from .helper_funcs.extraction import (
     extract_user,
     extract_user_and_text,
 )
+from .helper_funcs.chat_config import CHAT_CONFIGS
 from .helper_funcs.filters import CustomFilters
 from .helper_funcs.misc import split_message
 from .helper_funcs.string_handling import split_quotes
@@ -92,7 +93,7 @@ def warn(
     else:
         warner_tag = "Automated warn filter."
 
-    limit, soft_warn = sql.get_warn_setting(chat.id)
+    limit, soft_warn = CHAT_CONFIGS.get(chat.id).warn_settings
     num_warns, reasons = sql.warn_user(user.id, chat.id, reason)
     if num_warns >= limit:
         sql.reset_warns(user.id, chat.id)
@@ -185,7 +186,7 @@ def swarn(
     else:
         warner_tag = "Automated warn filter."
 
-    limit, soft_warn = sql.get_warn_setting(chat.id)
+    limit, soft_warn = CHAT_CONFIGS.get(chat.id).warn_settings
     num_warns, reasons = sql.warn_user(user.id, chat.id, reason)
     if num_warns >= limit:
         sql.reset_warns(user.id, chat.id)
@@ -288,7 +289,7 @@ def dwarn(
     else:
         warner_tag = "Automated warn filter."
 
-    limit, soft_warn = sql.get_warn_setting(chat.id)
+    limit, soft_warn = CHAT_CONFIGS.get(chat.id).warn_settings
     num_warns, reasons = sql.warn_user(user.id, chat.id, reason)
     if num_warns >= limit:
         sql.reset_warns(user.id, chat.id)
@@ -556,7 +557,7 @@ def warns(update: Update, context: CallbackContext):
 
     if result and result[0] != 0:
         num_warns, reasons = result
-        limit, soft_warn = sql.get_warn_setting(chat.id)
+        limit, soft_warn = context.chat_config.warn_settings
 
         if reasons:
             text = (
@@ -687,17 +688,15 @@ def reply_filter(update: Update, context: CallbackContext) -> Optional[str]:
     if is_approved(chat.id, user.id):
         return
 
-    chat_warn_filters = sql.get_chat_warn_triggers(chat.id)
     to_match = extract_text(message)
     if not to_match:
         return ""
 
-    for keyword in chat_warn_filters:
-        pattern = r"( |^|[^\w])" + re.escape(keyword) + r"( |$|[^\w])"
-        if re.search(pattern, to_match, flags=re.IGNORECASE):
-            user: Optional[User] = update.effective_user
-            warn_filter = sql.get_warn_filter(chat.id, keyword)
-            return warn(user, update, warn_filter.reply, message)
+    keyword = sql.match_warn_trigger(chat.id, to_match)
+    if keyword:
+        user: Optional[User] = update.effective_user
+        warn_filter = sql.get_warn_filter(chat.id, keyword)
+        return warn(user, update, warn_filter.reply, message)
     return ""
 
 @kigcmd(command='warnlimit', filters=Filters.chat_type.groups)
@@ -725,7 +724,7 @@ def set_warn_limit(update: Update, context: CallbackContext) -> str:
         else:
             msg.reply_text("Give me a number as an arg!")
     else:
-        limit, _ = sql.get_warn_setting(chat.id)
+        limit, _ = context.chat_config.warn_settings
 
         msg.reply_text("The current warn limit is {}".format(limit))
     return ""
@@ -764,7 +763,7 @@ def set_warn_strength(update: Update, context: CallbackContext):
         else:
             msg.reply_text("I only understand on/yes/no/off!")
     else:
-        limit, soft_warn = sql.get_warn_setting(chat.id)
+        limit, soft_warn = context.chat_config.warn_settings
         if soft_warn:
             msg.reply_text(
                 "Warns are currently set to *kick* users when they exceed the limits.",
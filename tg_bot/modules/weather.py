@@ -8,7 +8,6 @@ from telegram import Bot, Update, ParseMode
 from telegram.ext import Updater, CommandHandler
 from telegram.ext import CallbackContext, run_async
 from tg_bot import WEATHER_API, dispatcher, spamcheck
-from .sql.clear_cmd_sql import get_clearcmd
 from .helper_funcs.misc import delete
 from .helper_funcs.decorators import kigcmd
 
@@ -26,7 +25,6 @@ def get_tz(con):
 @spamcheck
 def weather(update: Update, context: CallbackContext):
     bot = context.bot
-    chat = update.effective_chat
     message = update.effective_message
     city = message.text[len("/weather ") :]
 
@@ -182,7 +180,7 @@ def weather(update: Update, context: CallbackContext):
         disable_web_page_preview=True,
     )
 
-    cleartime = get_clearcmd(chat.id, "weather")
+    cleartime = context.chat_config.clearcmd.get("weather")
 
     if cleartime:
-        context.dispatcher.run_async(delete, delmsg, cleartime.time)
+        context.dispatcher.run_async(delete, delmsg, cleartime)
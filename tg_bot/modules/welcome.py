@@ -16,10 +16,10 @@ from tg_bot import (
     SUPPORT_USERS,
     WHITELIST_USERS,
     spamcheck,
-    sw,
     dispatcher,
 )
 from .helper_funcs.misc import build_keyboard, revert_buttons
+from .helper_funcs.verdict_cache import SIBYL_CACHE, SW_CACHE
 from .helper_funcs.msg_types import get_welcome_type
 from .helper_funcs.string_handling import (
     escape_invalid_curly_brackets,
@@ -48,9 +48,7 @@ from .helper_funcs.admin_status import (
 )
 import tg_bot.modules.sql.log_channel_sql as logsql
 
-from ..import sibylClient
 from .sql.sibylsystem_sql import does_chat_sibylban
-from SibylSystem import GeneralException
 from .cron_jobs import j
 
 VALID_WELCOME_FORMATTERS = [
@@ -175,11 +173,11 @@ def new_member(update: Update, context: CallbackContext):  # sourcery no-metrics
     bot, job_queue = context.bot, context.job_queue
     chat = update.effective_chat
     user = update.effective_user
-    log_setting = logsql.get_chat_setting(chat.id)
+    log_setting = context.chat_config.log_settings
     if not log_setting:
         logsql.set_chat_setting(logsql.LogChannelSettings(chat.id, True, True, True, True, True))
-        log_setting = logsql.get_chat_setting(chat.id)
-    should_welc, cust_welcome, cust_content, welc_type = sql.get_welc_pref(chat.id)
+        log_setting = context.chat_config.log_settings
+    should_welc, cust_welcome, cust_content, welc_type = context.chat_config.welcome
     welc_mutes = sql.welcome_mutes(chat.id)
     human_checks = sql.get_human_checks(user.id, chat.id)
     raid, _, deftime = sql.getRaidStatus(str(chat.id))
@@ -200,20 +198,11 @@ def new_member(update: Update, context: CallbackContext):  # sourcery no-metrics
             return
         except:
             pass
-    if sw is not None:
-        sw_ban = sw.get_ban(new_mem.id)
-        if sw_ban:
-            return
+    if SW_CACHE.get(new_mem.id):
+        return
 
-    data = None
-    if sibylClient and does_chat_sibylban(chat.id):
-        try:
-            data = sibylClient.get_info(user.id)
-        except GeneralException:
-            pass
-        except BaseException as e:
-            log.error(e)
-            pass
+    if does_chat_sibylban(chat.id):
+        data = SIBYL_CACHE.get(user.id)
         if data and data.banned:
             return   # all modes handle it in different ways
 
@@ -537,7 +526,7 @@ def new_member(update: Update, context: CallbackContext):  # sourcery no-metrics
                 )
         else:
             sent = send(update, res, keyboard, backup_message)
-        prev_welc = sql.get_clean_pref(chat.id)
+        prev_welc = context.chat_config.clean_welcome
         if prev_welc:
             try:
                 bot.delete_message(chat.id, prev_welc)
@@ -618,10 +607,8 @@ def left_member(update: Update, context: CallbackContext):  # sourcery no-metric
         if left_mem:
 
             # Thingy for spamwatched users
-            if sw:
-                sw_ban = sw.get_ban(left_mem.id)
-                if sw_ban:
-                    return
+            if SW_CACHE.get(left_mem.id):
+                return
 
             # Dont say goodbyes to gbanned users
             if is_user_gbanned(left_mem.id):
@@ -719,7 +706,7 @@ def welcome(update: Update, context: CallbackContext):
     # if no args, show current replies.
     if not args or args[0].lower() == "noformat":
         noformat = bool(args and args[0].lower() == "noformat")
-        pref, welcome_m, cust_content, welcome_type = sql.get_welc_pref(chat.id)
+        pref, welcome_m, cust_content, welcome_type = context.chat_config.welcome
         update.effective_message.reply_text(
             f"This chat has it's welcome setting set to: `{pref}`.\n"
             f"*The welcome message (not filling the {{}}) is:*",
@@ -1009,7 +996,7 @@ def clean_welcome(update: Update, context: CallbackContext) -> str:
 
 
     if not args:
-        if clean_pref := sql.get_clean_pref(chat.id):
+        if clean_pref := context.chat_config.clean_welcome:
             update.effective_message.reply_text(
                 "I should be deleting welcome messages up to two days old."
             )
@@ -2,7 +2,6 @@
 import wikipedia, os, glob
 from tg_bot import dispatcher, spamcheck
 from .helper_funcs.misc import delete
-from .sql.clear_cmd_sql import get_clearcmd
 from telegram import ParseMode, Update
 from telegram.ext import CallbackContext, run_async
 from wikipedia.exceptions import DisambiguationError, PageError
@@ -11,7 +10,6 @@ from .helper_funcs.decorators import kigcmd
 @kigcmd(command='wiki', can_disable=True)
 @spamcheck
 def wiki(update: Update, context: CallbackContext):
-    chat = update.effective_chat
     msg = (
         update.effective_message.reply_to_message
         if update.effective_message.reply_to_message
@@ -64,9 +62,9 @@ def wiki(update: Update, context: CallbackContext):
                 result, parse_mode=ParseMode.HTML, disable_web_page_preview=True
             )
 
-    cleartime = get_clearcmd(chat.id, "wiki")
+    cleartime = context.chat_config.clearcmd.get("wiki")
 
     if cleartime:
-        context.dispatcher.run_async(delete, delmsg, cleartime.time)
+        context.dispatcher.run_async(delete, delmsg, cleartime)
 
 